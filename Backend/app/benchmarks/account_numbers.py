@@ -0,0 +1,108 @@
+"""
+Checks the account number allocator under concurrency and times it.
+
+Without a database, several allocators (standing in for worker processes) share
+an in-memory block counter and are hammered from many threads; every number must
+be unique and pass the Luhn check. With DATABASE_URL set, concurrent
+approve_application calls are run against the real sequence and every approval
+must commit with a distinct, valid account number.
+
+Run from Backend/app:
+    python -m benchmarks.account_numbers [approvals] [threads]
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+
+from utils.account_numbers import AccountNumberAllocator, is_valid_account_no
+
+
+def offline(allocations: int, threads: int, workers: int = 4):
+    counter, counter_lock = itertools.count(1), threading.Lock()
+
+    def reserve_block(db):
+        with counter_lock:
+            return next(counter)
+
+    allocators = [AccountNumberAllocator(reserve_block=reserve_block) for _ in range(workers)]
+    numbers, numbers_lock = [], threading.Lock()
+
+    def run(allocator):
+        allocated = [allocator.allocate(None) for _ in range(allocations // threads)]
+        with numbers_lock:
+            numbers.extend(allocated)
+
+    pool = [threading.Thread(target=run, args=(allocators[i % workers],)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    assert len(set(numbers)) == len(numbers), "duplicate account numbers"
+    assert all(is_valid_account_no(number) for number in numbers), "invalid check digit"
+    print(f"offline: {len(numbers)} numbers from {workers} allocators x {threads} threads in {elapsed * 1000:.1f} ms, "
+          f"all unique and valid")
+
+
+def approvals(count: int, threads: int):
+    import uuid
+
+    from benchmarks.batch_approval import cleanup, create_applications
+    from database import SessionLocal
+    from models import Account, Customer, User
+    from routes.applications import approve_application
+    from utils.auth import AuthenticatedUser
+
+    db = SessionLocal()
+    user = User(email=f"bench-{uuid.uuid4()}@example.com", password_hash="-")
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    # None of the applications are leased, so any clerk may approve them
+    clerk = AuthenticatedUser(uuid.uuid4(), "bench-clerk@example.com", "clerk")
+    try:
+        application_nos = create_applications(db, user_id, count)
+        failures, failures_lock = [], threading.Lock()
+
+        def run(chunk):
+            session = SessionLocal()
+            try:
+                for application_no in chunk:
+                    try:
+                        approve_application(application_no, clerk=clerk, db=session)
+                    except Exception as e:
+                        session.rollback()
+                        with failures_lock:
+                            failures.append(e)
+            finally:
+                session.close()
+
+        pool = [threading.Thread(target=run, args=(application_nos[i::threads],)) for i in range(threads)]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        numbers = [row[0] for row in db.query(Account.account_no).join(Customer).filter(Customer.user_id == user_id).all()]
+        assert not failures, f"{len(failures)} approvals failed, first: {failures[0]!r}"
+        assert len(numbers) == count and len(set(numbers)) == count, "missing or duplicate accounts"
+        assert all(is_valid_account_no(number) for number in numbers), "invalid check digit"
+        print(f"database: {count} concurrent approvals over {threads} threads in {elapsed * 1000:.1f} ms, "
+              f"no failed commits, all account numbers unique and valid")
+    finally:
+        cleanup(db, user_id)
+        db.close()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    offline(count * 100, threads)
+    if os.getenv("DATABASE_URL"):
+        approvals(count, threads)
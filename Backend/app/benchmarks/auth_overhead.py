@@ -0,0 +1,80 @@
+"""
+Per-request cost of the bearer token dependency (utils/auth.py) on a protected
+route: no auth at all, auth with cold caches (JWT verified and user/role loaded
+on every request, as an uncached dependency would) and auth with warm caches.
+
+A minimal FastAPI app is driven in-process by httpx. The user lookup is replaced
+by a sleep of DB_MS milliseconds (default 2, roughly one User -> Roles round trip
+to a nearby Postgres) so the run needs no database.
+
+Run from Backend/app (needs fastapi + httpx + python-jose):
+    python -m benchmarks.auth_overhead [requests] [db_ms]
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+import httpx
+from fastapi import Depends, FastAPI
+from jose import jwt
+
+from utils import auth
+
+app = FastAPI()
+
+
+@app.get("/open")
+def open_route():
+    return {"ok": True}
+
+
+@app.get("/protected")
+def protected_route(user: auth.AuthenticatedUser = Depends(auth.get_current_user)):
+    return {"ok": True, "role": user.role}
+
+
+async def run(path: str, token: str, requests: int, cold: bool) -> list:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(requests):
+            if cold:
+                auth._claims_cache.clear()
+                auth.invalidate_all_users()
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+    return latencies
+
+
+async def main(requests: int, db_ms: float):
+    auth.JWT_SECRET_KEY = auth.JWT_SECRET_KEY or "benchmark-secret"
+    auth.JWT_ALGORITHM = auth.JWT_ALGORITHM or "HS256"
+
+    def load_user(user_id):
+        time.sleep(db_ms / 1000)
+        return auth.AuthenticatedUser(user_id, "bench@example.com", "clerk")
+
+    auth.load_user = load_user
+    expires = time.time() + timedelta(hours=1).total_seconds()
+    token = jwt.encode({"sub": str(uuid.uuid4()), "email": "bench@example.com", "exp": expires},
+                       auth.JWT_SECRET_KEY, algorithm=auth.JWT_ALGORITHM)
+
+    baseline = None
+    for label, path, cold in (("no auth          ", "/open", False),
+                              ("auth, cold caches", "/protected", True),
+                              ("auth, warm caches", "/protected", False)):
+        latencies = await run(path, token, requests, cold)
+        median = statistics.median(latencies) * 1000
+        baseline = baseline if baseline is not None else median
+        print(f"{label}: median {median:6.3f} ms, p95 {sorted(latencies)[int(len(latencies) * 0.95)] * 1000:6.3f} ms, "
+              f"overhead {median - baseline:+6.3f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500, float(sys.argv[2]) if len(sys.argv) > 2 else 2.0))
@@ -0,0 +1,93 @@
+"""
+Compares approving N applications one by one through approve_application (the
+clerk page's current flow) with a single POST /applications/batch call.
+
+Both paths call the route functions directly with a real session, so the numbers
+cover the queries, inserts and commits but not HTTP. Applications are created for
+a throwaway user and everything the run inserts is deleted afterwards.
+
+Run from Backend/app against the configured database (DATABASE_URL):
+    python -m benchmarks.batch_approval [applications]
+"""
+import random
+import sys
+import time
+import uuid
+from datetime import date
+
+from database import SessionLocal
+from models import ApplicationTable, Customer, AdharDetails, PanDetails, Account, User
+from pydantic_schemas import BatchDecisionRequest
+from routes.applications import approve_application, decide_applications
+from utils.auth import AuthenticatedUser
+
+
+def create_applications(db, user_id, count: int) -> list:
+    applications = []
+    for i in range(count):
+        applications.append(ApplicationTable(
+            user_id=user_id,
+            firstname="Bench",
+            lastname=f"Applicant{i}",
+            father_name="Bench Parent",
+            address_line="1 Bench Street",
+            city="Mumbai",
+            district="Mumbai",
+            state="Maharashtra",
+            pincode="400001",
+            country="India",
+            adhar_card_no=str(random.randint(10 ** 11, 10 ** 12 - 1)),
+            pan_card_no=f"BNCH{random.randint(10 ** 5, 10 ** 6 - 1)}Z",
+            email=f"bench{i}@example.com",
+            mobile_no="9999999999",
+            dob=date(1990, 1, 1),
+            gender="other",
+            application_status="pending",
+            artifacts_status="stored",
+        ))
+    db.add_all(applications)
+    db.commit()
+    return [application.application_no for application in applications]
+
+
+def cleanup(db, user_id):
+    customer_ids = [row[0] for row in db.query(Customer.customer_id).filter(Customer.user_id == user_id).all()]
+    for model in (Account, PanDetails, AdharDetails):
+        db.query(model).filter(model.customer_id.in_(customer_ids)).delete(synchronize_session=False)
+    db.query(Customer).filter(Customer.user_id == user_id).delete(synchronize_session=False)
+    db.query(ApplicationTable).filter(ApplicationTable.user_id == user_id).delete(synchronize_session=False)
+    db.query(User).filter(User.user_id == user_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def main(count: int):
+    db = SessionLocal()
+    user = User(email=f"bench-{uuid.uuid4()}@example.com", password_hash="-")
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    # None of the applications are leased, so any clerk may decide them
+    clerk = AuthenticatedUser(uuid.uuid4(), "bench-clerk@example.com", "clerk")
+    try:
+        application_nos = create_applications(db, user_id, count)
+        start = time.perf_counter()
+        for application_no in application_nos:
+            approve_application(application_no, clerk=clerk, db=db)
+        single = time.perf_counter() - start
+        print(f"single approvals x{count}: {single * 1000:8.1f} ms ({single / count * 1000:.2f} ms each)")
+
+        application_nos = create_applications(db, user_id, count)
+        start = time.perf_counter()
+        response = decide_applications(BatchDecisionRequest(application_nos=application_nos, action="approve"), clerk, db)
+        batch = time.perf_counter() - start
+        approved = sum(result.status == "approved" for result in response.results)
+        print(f"batch approval    x{count}: {batch * 1000:8.1f} ms ({batch / count * 1000:.2f} ms each), "
+              f"{approved} approved, {single / batch:.1f}x faster")
+    finally:
+        db.rollback()
+        cleanup(db, user_id)
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
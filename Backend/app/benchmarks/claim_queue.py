@@ -0,0 +1,102 @@
+"""
+Drains a queue of pending applications with several concurrent clerks, comparing
+the shared list (`GET /applications?status=pending`, every clerk walks the same
+rows and approves whatever is still pending) with claim/lease (`POST
+/applications/claim`, FOR UPDATE SKIP LOCKED). Reports wall time and how many
+approvals failed because another clerk got there first.
+
+Route functions are called directly with one session per clerk thread. Rows
+created by the run are deleted afterwards.
+
+Run from Backend/app against the configured database (DATABASE_URL):
+    python -m benchmarks.claim_queue [applications] [clerks]
+"""
+import sys
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException
+
+from benchmarks.batch_approval import cleanup, create_applications
+from database import SessionLocal
+from models import User
+from pydantic_schemas import ClaimRequest
+from routes.applications import approve_application, claim_applications, get_applications
+from utils.auth import AuthenticatedUser
+
+
+def shared_list_clerk(clerk, counts, lock):
+    db = SessionLocal()
+    try:
+        for application in get_applications(limit=10000, status="pending", db=db):
+            try:
+                approve_application(application.application_no, clerk=clerk, db=db)
+                outcome = "approved"
+            except Exception:
+                # "Already approved", or a unique violation when two clerks race on one row
+                db.rollback()
+                outcome = "collisions"
+            with lock:
+                counts[outcome] += 1
+    finally:
+        db.close()
+
+
+def claiming_clerk(clerk, counts, lock):
+    db = SessionLocal()
+    try:
+        while True:
+            claimed = claim_applications(ClaimRequest(limit=5), clerk=clerk, db=db).applications
+            if not claimed:
+                break
+            for application in claimed:
+                try:
+                    approve_application(application.application_no, clerk=clerk, db=db)
+                    outcome = "approved"
+                except HTTPException:
+                    db.rollback()
+                    outcome = "collisions"
+                with lock:
+                    counts[outcome] += 1
+    finally:
+        db.close()
+
+
+def drain(worker, count: int, clerks: list, user_id):
+    db = SessionLocal()
+    create_applications(db, user_id, count)
+    db.close()
+
+    counts, lock = {"approved": 0, "collisions": 0}, threading.Lock()
+    threads = [threading.Thread(target=worker, args=(clerk, counts, lock)) for clerk in clerks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, counts
+
+
+def main(count: int, clerks: int):
+    db = SessionLocal()
+    users = [User(email=f"bench-{uuid.uuid4()}@example.com", password_hash="-") for _ in range(clerks + 1)]
+    db.add_all(users)
+    db.commit()
+    # The first user owns the applications, the rest act as clerks
+    user_id, clerk_ids = users[0].user_id, [user.user_id for user in users[1:]]
+    clerk_users = [AuthenticatedUser(user.user_id, user.email, "clerk") for user in users[1:]]
+    try:
+        for label, worker in (("shared list ", shared_list_clerk), ("claim/lease ", claiming_clerk)):
+            elapsed, counts = drain(worker, count, clerk_users, user_id)
+            print(f"{label} {clerks} clerks x {count} applications: {elapsed * 1000:8.1f} ms, "
+                  f"{counts['approved']} approved, {counts['collisions']} collisions")
+    finally:
+        cleanup(db, user_id)
+        db.query(User).filter(User.user_id.in_(clerk_ids)).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200, int(sys.argv[2]) if len(sys.argv) > 2 else 8)
@@ -0,0 +1,80 @@
+"""
+Measures how many correction messages the local parser handles without Gemini.
+
+Run from Backend/app:
+    python -m benchmarks.correction_parser
+"""
+from utils.correction_parser import parse_correction
+
+ADHAR_FRONT = {"name": "Ravi Kumar", "dob": "01/01/1990", "gender": "Male", "adhar_no": "499912345674"}
+ADHAR_BACK = {"address": "12 Main Road", "city": "Pune", "district": "Pune", "state": "Maharashtra", "pincode": "411001"}
+PAN = {"pan_no": "ABCPK1234F", "name": "Ravi Kumar", "father_name": "Raj Kumar", "dob": "01/01/1990"}
+
+# (current data, message, expected updates or None when the LLM should handle it)
+CORPUS = [
+    (ADHAR_FRONT, "dob is 12/03/1990", {"dob": "12/03/1990"}),
+    (ADHAR_FRONT, "dob 12-03-1990", {"dob": "12/03/1990"}),
+    (ADHAR_FRONT, "date of birth should be 1990-03-12", {"dob": "12/03/1990"}),
+    (ADHAR_FRONT, "birthday is 12 march 1990", {"dob": "12/03/1990"}),
+    (ADHAR_FRONT, "change dob to 5th aug 1988", {"dob": "05/08/1988"}),
+    (ADHAR_FRONT, "name is ravi shankar", {"name": "Ravi Shankar"}),
+    (ADHAR_FRONT, "change name to ravi kumar sharma", {"name": "Ravi Kumar Sharma"}),
+    (ADHAR_FRONT, "gender female", {"gender": "Female"}),
+    (ADHAR_FRONT, "sex is f", {"gender": "Female"}),
+    (ADHAR_FRONT, "aadhaar number is 2341 2341 2346", {"adhar_no": "234123412346"}),
+    (ADHAR_FRONT, "adhar no 234123412346", {"adhar_no": "234123412346"}),
+    (ADHAR_FRONT, "gender female and dob 05/03/1991", {"gender": "Female", "dob": "05/03/1991"}),
+    (ADHAR_FRONT, "name ravi, dob 01/02/1989", {"name": "Ravi", "dob": "01/02/1989"}),
+    (ADHAR_FRONT, "aadhaar number 2341 2341 2345", None),  # fails Verhoeff
+    (ADHAR_FRONT, "dob 31/02/1990", None),
+    (ADHAR_FRONT, "name is wrong", None),
+    (ADHAR_FRONT, "my name spelling is wrong, it should be ravee", None),
+    (ADHAR_FRONT, "the year of birth is 1991 not 1990", None),
+    (ADHAR_FRONT, "swap first and last name", None),
+    (ADHAR_BACK, "pincode 560001", {"pincode": "560001"}),
+    (ADHAR_BACK, "pin code is 560001", {"pincode": "560001"}),
+    (ADHAR_BACK, "pin 060001", None),
+    (ADHAR_BACK, "city is bengaluru and state karnataka", {"city": "Bengaluru", "state": "Karnataka"}),
+    (ADHAR_BACK, "district: bangalore urban", {"district": "Bangalore Urban"}),
+    (ADHAR_BACK, "address is 45 mg road, indiranagar", {"address": "45 Mg Road, Indiranagar"}),
+    (ADHAR_BACK, "the house number is 45 not 12", None),
+    # A comma after the address may be inside it, so these go to the LLM
+    (ADHAR_BACK, "address is 45 mg road, village rampur", None),
+    (ADHAR_BACK, "address is near state bank, city centre mall", None),
+    (ADHAR_BACK, "address is 12 gandhi nagar, district office road", None),
+    (ADHAR_BACK, "city nashik, address 12 college road", {"city": "Nashik", "address": "12 College Road"}),
+    (PAN, "pan no abcpe1234f", {"pan_no": "ABCPE1234F"}),
+    (PAN, "pan number is ABCPE1234F", {"pan_no": "ABCPE1234F"}),
+    (PAN, "pan abcde12345", None),
+    (PAN, "father name is ramesh kumar", {"father_name": "Ramesh Kumar"}),
+    (PAN, "father's name ramesh", {"father_name": "Ramesh"}),
+    (PAN, "name is ravi k", {"name": "Ravi K"}),
+    (PAN, "dob 02/02/1992", {"dob": "02/02/1992"}),
+    (PAN, "fix the father name, it has a typo", None),
+]
+
+
+def main():
+    local = correct = wrong = 0
+    for current, message, expected in CORPUS:
+        result = parse_correction(current, message)
+        if result is None:
+            outcome = "llm"
+            ok = expected is None
+        else:
+            local += 1
+            updates = {k: v for k, v in result.items() if current.get(k) != v}
+            ok = expected is not None and updates == expected
+            outcome = "local"
+        correct += ok
+        wrong += not ok
+        print(f"{'ok ' if ok else 'BAD'} {outcome:<6}{message}")
+
+    total = len(CORPUS)
+    expected_local = sum(1 for _, _, e in CORPUS if e is not None)
+    print(f"\nLocal hit rate: {local}/{total} ({local / total:.0%}), "
+          f"{expected_local} parseable in corpus; correct outcomes: {correct}/{total}")
+
+
+if __name__ == "__main__":
+    main()
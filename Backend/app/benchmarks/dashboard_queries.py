@@ -0,0 +1,110 @@
+"""
+Query count and latency of GET /customers/dashboard/{user_id} against building
+the same data naively from the Customer.accounts and Account.transactions
+relationships (one lazy load per account). Fails if the endpoint's query count
+grows with the number of accounts.
+
+Seeds a customer with the given number of accounts and transactions per account,
+calls the route function directly and deletes the rows afterwards.
+
+Run from Backend/app against the configured database (DATABASE_URL):
+    python -m benchmarks.dashboard_queries [accounts] [transactions_per_account]
+"""
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from database import SessionLocal, engine
+from models import Account, Customer, Transactions, User
+from routes.customers import get_dashboard
+from utils.account_numbers import account_numbers
+from utils.auth import AuthenticatedUser
+
+RECENT = 5
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def seed(db, accounts: int, transactions: int):
+    user = User(email=f"bench-{uuid.uuid4()}@example.com", password_hash="-")
+    db.add(user)
+    db.flush()
+    customer = Customer(customer_id=uuid.uuid4(), user_id=user.user_id, firstname="Bench", lastname="Customer")
+    db.add(customer)
+    now = datetime.now(timezone.utc)
+    for _ in range(accounts):
+        account_no = account_numbers.allocate(db)
+        db.add(Account(account_no=account_no, customer_id=customer.customer_id, status_flag="active",
+                       account_type="savings", current_balance=1000.0))
+        db.add_all([
+            Transactions(account_no=account_no, amount=10.0 + i, mode_of_transaction="online", time=now - timedelta(minutes=i))
+            for i in range(transactions)
+        ])
+    db.commit()
+    return user.user_id, customer.customer_id
+
+
+def cleanup(db, user_id, customer_id):
+    account_nos = [row[0] for row in db.query(Account.account_no).filter(Account.customer_id == customer_id).all()]
+    db.query(Transactions).filter(Transactions.account_no.in_(account_nos)).delete(synchronize_session=False)
+    db.query(Account).filter(Account.customer_id == customer_id).delete(synchronize_session=False)
+    db.query(Customer).filter(Customer.customer_id == customer_id).delete(synchronize_session=False)
+    db.query(User).filter(User.user_id == user_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def naive_dashboard(db, user_id):
+    customer = db.query(Customer).filter(Customer.user_id == user_id).first()
+    return [
+        (account.account_no, sorted(account.transactions, key=lambda t: t.time, reverse=True)[:RECENT])
+        for account in customer.accounts
+    ]
+
+
+def measure(build) -> tuple:
+    db = SessionLocal()
+    try:
+        with QueryCounter() as counter:
+            start = time.perf_counter()
+            build(db)
+            elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    return counter.count, elapsed
+
+
+def main(accounts: int, transactions: int):
+    db = SessionLocal()
+    user_id, customer_id = seed(db, accounts, transactions)
+    viewer = AuthenticatedUser(user_id, "bench@example.com", "customer")
+    try:
+        naive_queries, naive_time = measure(lambda session: naive_dashboard(session, user_id))
+        endpoint_queries, endpoint_time = measure(
+            lambda session: get_dashboard(user_id, transactions=RECENT, db=session, current_user=viewer))
+        print(f"{accounts} accounts x {transactions} transactions")
+        print(f"naive lazy loads: {naive_queries:3d} queries, {naive_time * 1000:7.1f} ms")
+        print(f"dashboard       : {endpoint_queries:3d} queries, {endpoint_time * 1000:7.1f} ms")
+        assert endpoint_queries <= 3, f"dashboard ran {endpoint_queries} queries, expected at most 3"
+    finally:
+        cleanup(db, user_id, customer_id)
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10, int(sys.argv[2]) if len(sys.argv) > 2 else 50)
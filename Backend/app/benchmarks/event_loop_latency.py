@@ -0,0 +1,72 @@
+"""
+Measures event-loop responsiveness while live-photo verifications are running,
+the way a /health request would experience it. Compares running verify_live_photo
+inline on the loop (the old behaviour) with the process pool executor.
+
+Run from Backend/app (needs deepface + opencv):
+    python -m benchmarks.event_loop_latency [concurrent_verifications]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from utils import executors
+from utils.verification import verify_live_photo
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "Frontend", "se-frontend", "data")
+PROBE_INTERVAL = 0.01
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    """Schedules a 10ms sleep repeatedly and records how late each wake-up is."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def run_inline(live_bytes: bytes, adhar_bytes: bytes):
+    # Same as calling the blocking function directly from the async route
+    return verify_live_photo(live_bytes, adhar_bytes)
+
+
+async def run_pooled(live_bytes: bytes, adhar_bytes: bytes):
+    return await executors.cpu_executor.run(verify_live_photo, live_bytes, adhar_bytes)
+
+
+async def measure(name: str, verify, concurrency: int, live_bytes: bytes, adhar_bytes: bytes):
+    stop = asyncio.Event()
+    lags: list = []
+    probe_task = asyncio.create_task(probe(stop, lags))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verify(live_bytes, adhar_bytes) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(f"{name:>8}: {concurrency} verifications in {elapsed:.2f}s, verified={sum(r['verified'] for r in results)}, "
+          f"loop lag median={statistics.median(lags_ms):.1f}ms p99={p99:.1f}ms max={lags_ms[-1]:.1f}ms")
+
+
+async def main(concurrency: int):
+    with open(os.path.join(SAMPLE_DIR, "photo.jpeg"), "rb") as f:
+        live_bytes = f.read()
+    with open(os.path.join(SAMPLE_DIR, "aadhar-front.jpeg"), "rb") as f:
+        adhar_bytes = f.read()
+
+    # Warm both paths so model loading isn't measured
+    print("Warming up the process pool...")
+    await asyncio.to_thread(executors.warm_up_process_pool)
+    verify_live_photo(live_bytes, adhar_bytes)
+
+    await measure("inline", run_inline, concurrency, live_bytes, adhar_bytes)
+    await measure("pooled", run_pooled, concurrency, live_bytes, adhar_bytes)
+    executors.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 4))
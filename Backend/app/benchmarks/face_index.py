@@ -0,0 +1,87 @@
+"""
+Search cost of the approved-face index (utils/face_index.py) as it grows, and a
+concurrency check: several threads and several processes (standing in for API
+workers) append to one index directory at the same time, then every stored row
+is compared with the embedding its application was added with.
+
+Uses a throwaway directory, not FACE_INDEX_DIR. Run from Backend/app:
+    python -m benchmarks.face_index [embeddings] [writers]
+"""
+import hashlib
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from utils.face_index import EMBEDDING_DIM, FaceIndex
+
+ADDS_PER_WRITER = 50
+
+
+def embedding_for(application_no: str) -> np.ndarray:
+    # Derived from the key, so the check can recompute what each row should hold
+    seed = int.from_bytes(hashlib.sha256(application_no.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def add_many(index: FaceIndex, prefix: str):
+    for i in range(ADDS_PER_WRITER):
+        application_no = f"{prefix}-{i}"
+        index.add(application_no, application_no, embedding_for(application_no))
+
+
+def add_many_in_process(index_dir: str, prefix: str):
+    add_many(FaceIndex(index_dir), prefix)
+
+
+def check_concurrent_adds(writers: int) -> tuple[int, int]:
+    """Returns (rows, rows whose embedding belongs to another application)."""
+    with tempfile.TemporaryDirectory() as index_dir:
+        # Threads share one FaceIndex, as approvals in one API worker do; each process has its own
+        shared = FaceIndex(index_dir)
+        threads = [threading.Thread(target=add_many, args=(shared, f"thread{w}")) for w in range(writers)]
+        processes = [multiprocessing.get_context("spawn").Process(target=add_many_in_process, args=(index_dir, f"process{w}"))
+                     for w in range(writers)]
+        for worker in threads + processes:
+            worker.start()
+        for worker in threads + processes:
+            worker.join()
+
+        index = FaceIndex(index_dir)
+        index.load()
+        wrong = sum(1 for row, (application_no, _) in zip(index.matrix, index.keys)
+                    if not np.allclose(row, embedding_for(application_no)))
+        return len(index.keys), wrong
+
+
+def main(count: int, writers: int):
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = FaceIndex(index_dir)
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        with open(index.matrix_path, "wb") as f:
+            f.write(matrix.tobytes())
+        with open(index.keys_path, "w") as f:
+            f.writelines(f'["app{i}", "{i}"]\n' for i in range(count))
+        index.load()
+
+        probes = matrix[rng.integers(0, count, 100)]
+        start = time.perf_counter()
+        for probe in probes:
+            index.find_duplicate(probe, "-")
+        print(f"{count} embeddings: {(time.perf_counter() - start) / len(probes) * 1000:.2f} ms per duplicate search")
+
+    rows, wrong = check_concurrent_adds(writers)
+    expected = 2 * writers * ADDS_PER_WRITER
+    print(f"{writers} threads + {writers} processes x {ADDS_PER_WRITER} adds: {rows}/{expected} rows, "
+          f"{wrong} attached to the wrong application")
+    assert rows == expected and wrong == 0, "concurrent adds lost or misattributed embeddings"
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000, int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,166 @@
+"""
+Compares face detector backends and recognition models on a labelled image set.
+
+The dataset is a directory with one sub-directory per person:
+    dataset/
+        person_a/photo.jpeg
+        person_a/aadhar-front.jpeg
+        person_b/...
+Without --dataset the samples in Frontend/se-frontend/data/ are used as one
+person (live photo, Adhar front, PAN card). That only yields genuine pairs, so
+false accept rates need a dataset with at least two people.
+
+For every detector it reports detection latency and hit rate; for every
+detector/model pair it reports model load time, embedding latency, resident
+memory, and the accept rates over a range of cosine distance thresholds.
+
+Run from Backend/app (needs deepface + opencv; missing detector packages are skipped):
+    python -m benchmarks.face_models
+    python -m benchmarks.face_models --dataset ~/faces --detectors opencv,retinaface --models Facenet512,ArcFace
+"""
+import argparse
+import itertools
+import os
+import resource
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+from deepface import DeepFace
+
+from utils.verification import decode_image, COSINE_THRESHOLDS, FACE_DETECTOR_BACKEND, FACE_MODEL_NAME
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "Frontend", "se-frontend", "data")
+SAMPLE_IMAGES = ["photo.jpeg", "aadhar-front.jpeg", "pan-card.jpeg"]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+THRESHOLDS = [round(t, 2) for t in np.arange(0.10, 0.85, 0.05)]
+
+
+def rss_mb() -> float:
+    """Current resident memory; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_dataset(dataset: str | None) -> List[Tuple[str, str, np.ndarray]]:
+    """Returns (person, file name, BGR image) tuples."""
+    if dataset is None:
+        entries = [("sample", name, os.path.join(SAMPLE_DIR, name)) for name in SAMPLE_IMAGES]
+    else:
+        entries = [
+            (person, name, os.path.join(dataset, person, name))
+            for person in sorted(os.listdir(dataset)) if os.path.isdir(os.path.join(dataset, person))
+            for name in sorted(os.listdir(os.path.join(dataset, person))) if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+
+    images = []
+    for person, name, path in entries:
+        with open(path, "rb") as f:
+            image = decode_image(f.read())
+        if image is not None:
+            images.append((person, name, image))
+    return images
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+def bench_detector(detector: str, images) -> Dict[str, float] | None:
+    try:
+        DeepFace.extract_faces(images[0][2], detector_backend=detector, enforce_detection=False)
+    except Exception as e:
+        print(f"  {detector:<12} skipped: {e}")
+        return None
+
+    timings, found = [], 0
+    for _, _, image in images:
+        start = time.perf_counter()
+        faces = DeepFace.extract_faces(image, detector_backend=detector, enforce_detection=False)
+        timings.append(time.perf_counter() - start)
+        # With enforce_detection=False a miss comes back as the whole image with zero confidence
+        found += bool(faces) and faces[0].get("confidence", 1) > 0
+    return {"p50_ms": percentile(timings, 50), "p95_ms": percentile(timings, 95), "hit_rate": found / len(images)}
+
+
+def bench_model(model: str, detector: str, images) -> Dict | None:
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    try:
+        DeepFace.build_model(model)
+    except Exception as e:
+        print(f"  {model:<12} skipped: {e}")
+        return None
+    load_s = time.perf_counter() - start
+
+    embeddings, timings = [], []
+    for person, _, image in images:
+        start = time.perf_counter()
+        representation = DeepFace.represent(image, model_name=model, detector_backend=detector, enforce_detection=False)
+        timings.append(time.perf_counter() - start)
+        vector = np.asarray(representation[0]["embedding"], dtype=np.float32)
+        embeddings.append((person, vector / np.linalg.norm(vector)))
+
+    genuine, impostor = [], []
+    for (person_a, a), (person_b, b) in itertools.combinations(embeddings, 2):
+        distance = 1.0 - float(np.dot(a, b))
+        (genuine if person_a == person_b else impostor).append(distance)
+
+    return {
+        "load_s": load_s,
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+        "rss_delta_mb": rss_mb() - rss_before,
+        "genuine": genuine,
+        "impostor": impostor,
+    }
+
+
+def print_curve(model: str, genuine: List[float], impostor: List[float]):
+    default = COSINE_THRESHOLDS.get(model)
+    print(f"    threshold   TAR      FAR      ({len(genuine)} genuine / {len(impostor)} impostor pairs)")
+    for threshold in sorted(set(THRESHOLDS + ([default] if default is not None else []))):
+        tar = sum(d <= threshold for d in genuine) / len(genuine) if genuine else float("nan")
+        far = sum(d <= threshold for d in impostor) / len(impostor) if impostor else float("nan")
+        marker = "  <- DeepFace default" if threshold == default else ""
+        print(f"    {threshold:>9.3f}   {tar:6.1%}   {far:6.1%}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", help="directory with one sub-directory of images per person")
+    parser.add_argument("--detectors", default="opencv,ssd,mtcnn,retinaface,yunet")
+    parser.add_argument("--models", default="Facenet512,Facenet,ArcFace,SFace,VGG-Face")
+    parser.add_argument("--curve-detector", default=FACE_DETECTOR_BACKEND,
+                        help="detector used in front of each model for latency/accuracy")
+    args = parser.parse_args()
+
+    images = load_dataset(args.dataset)
+    people = len({person for person, _, _ in images})
+    print(f"{len(images)} images of {people} people; configured: {FACE_MODEL_NAME} + {FACE_DETECTOR_BACKEND}\n")
+
+    print("Detectors (extract_faces):")
+    for detector in args.detectors.split(","):
+        result = bench_detector(detector, images)
+        if result:
+            print(f"  {detector:<12} p50 {result['p50_ms']:8.1f} ms   p95 {result['p95_ms']:8.1f} ms   "
+                  f"faces found {result['hit_rate']:.0%}")
+
+    print(f"\nModels (represent with the {args.curve_detector} detector):")
+    for model in args.models.split(","):
+        result = bench_model(model, args.curve_detector, images)
+        if not result:
+            continue
+        print(f"  {model:<12} load {result['load_s']:6.1f} s   p50 {result['p50_ms']:8.1f} ms   "
+              f"p95 {result['p95_ms']:8.1f} ms   +{result['rss_delta_mb']:.0f} MB RSS")
+        print_curve(model, result["genuine"], result["impostor"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares the old temp-file face verification flow with the in-memory pipeline.
+
+Run from Backend/app (needs deepface + opencv):
+    python -m benchmarks.face_pipeline [rounds]
+"""
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+from deepface import DeepFace
+
+from utils.verification import decode_image, extract_face_from_image, verify_faces, FACE_MODEL_NAME, FACE_DETECTOR_BACKEND
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "Frontend", "se-frontend", "data")
+
+
+def temp_file_flow(live_bytes: bytes, adhar_bytes: bytes) -> bool:
+    """The previous upload_file implementation: three NamedTemporaryFiles and path-based DeepFace calls."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_live:
+        tmp_live.write(live_bytes)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_adhar:
+        tmp_adhar.write(adhar_bytes)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_face:
+        pass
+    try:
+        faces = DeepFace.extract_faces(img_path=tmp_adhar.name, detector_backend=FACE_DETECTOR_BACKEND, enforce_detection=False)
+        face = (faces[0]["face"] * 255).astype("uint8")
+        cv2.imwrite(tmp_face.name, cv2.cvtColor(face, cv2.COLOR_RGB2BGR))
+        result = DeepFace.verify(tmp_live.name, tmp_face.name, model_name=FACE_MODEL_NAME,
+                                 distance_metric="cosine", enforce_detection=False)
+        return result["verified"]
+    finally:
+        for path in (tmp_live.name, tmp_adhar.name, tmp_face.name):
+            os.unlink(path)
+
+
+def in_memory_flow(live_bytes: bytes, adhar_bytes: bytes) -> bool:
+    face = extract_face_from_image(decode_image(adhar_bytes))
+    return face is not None and verify_faces(decode_image(live_bytes), face)
+
+
+def temp_files() -> set:
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), "tmp*")))
+
+
+def main(rounds: int):
+    with open(os.path.join(SAMPLE_DIR, "photo.jpeg"), "rb") as f:
+        live_bytes = f.read()
+    with open(os.path.join(SAMPLE_DIR, "aadhar-front.jpeg"), "rb") as f:
+        adhar_bytes = f.read()
+
+    # Load the models once so both flows are measured warm
+    in_memory_flow(live_bytes, adhar_bytes)
+
+    for name, flow in (("temp files", temp_file_flow), ("in memory", in_memory_flow)):
+        before = temp_files()
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            flow(live_bytes, adhar_bytes)
+            timings.append(time.perf_counter() - start)
+        leftover = len(temp_files() - before)
+        timings.sort()
+        print(f"{name:<12} median {timings[len(timings) // 2] * 1000:8.1f} ms   "
+              f"min {timings[0] * 1000:8.1f} ms   temp files left: {leftover}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,75 @@
+"""
+False positive rate, memory and lookup cost of the Adhar/PAN identity filter
+(utils/identity_filter.py) against a plain Python set of the same numbers, and,
+with DATABASE_URL set, against the duplicate-application query it replaces for
+numbers that were never seen.
+
+Run from Backend/app:
+    python -m benchmarks.identity_filter [known_numbers]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from utils.identity_filter import BloomFilter, KNOWN_IDS_FPR
+
+LOOKUPS = 100_000
+
+
+def adhar_numbers(count: int) -> list:
+    return [str(random.randrange(10 ** 11, 10 ** 12)) for _ in range(count)]
+
+
+def measure(build):
+    tracemalloc.start()
+    structure = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return structure, size / (1024 * 1024)
+
+
+def timed_lookups(structure, probes) -> float:
+    start = time.perf_counter()
+    for probe in probes:
+        probe in structure
+    return (time.perf_counter() - start) / len(probes) * 1e6
+
+
+def main(count: int):
+    known = adhar_numbers(count)
+    probes = adhar_numbers(LOOKUPS)
+
+    def build_bloom():
+        bloom = BloomFilter(count, KNOWN_IDS_FPR)
+        for value in known:
+            bloom.add(value)
+        return bloom
+
+    bloom, bloom_mb = measure(build_bloom)
+    known_set, set_mb = measure(lambda: set(known))
+
+    false_positives = sum(1 for probe in probes if probe not in known_set and probe in bloom)
+    print(f"{count} known numbers, target FPR {KNOWN_IDS_FPR:.2%}")
+    print(f"bloom filter: {bloom_mb:7.2f} MB, {bloom.hashes} hashes, measured FPR {false_positives / LOOKUPS:.3%} "
+          f"(estimated {bloom.estimated_fpr():.3%}), {timed_lookups(bloom, probes):.2f} us/lookup")
+    print(f"python set  : {set_mb:7.2f} MB, {timed_lookups(known_set, probes):.2f} us/lookup")
+
+    if os.getenv("DATABASE_URL"):
+        from database import SessionLocal
+        from models import ApplicationTable
+
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            for probe in probes[:200]:
+                db.query(ApplicationTable).filter(ApplicationTable.adhar_card_no == probe).first()
+            query_us = (time.perf_counter() - start) / 200 * 1e6
+        finally:
+            db.close()
+        print(f"db query    : {query_us:.0f} us/lookup, skipped for {1 - false_positives / LOOKUPS:.1%} of unseen numbers")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,79 @@
+"""
+Benchmarks the OCR preprocessing stage over the sample ID images.
+
+Run from Backend/app:
+    python -m benchmarks.ocr_preprocess          # bytes sent + preprocessing time
+    python -m benchmarks.ocr_preprocess --live   # also end-to-end Gemini extraction latency (needs GEMINI_API_KEY)
+"""
+import asyncio
+import glob
+import io
+import os
+import sys
+import time
+
+from utils.image_preprocess import preprocess_for_ocr, ImageQualityError
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "Frontend", "se-frontend", "data")
+
+EXTRACTORS = {
+    "aadhar-front": "extract_adhar_front",
+    "aadhar-backend": "extract_adhar_back",
+    "p3_adharback": "extract_adhar_back",
+    "pan-card": "extract_pan_data",
+}
+
+
+async def extraction_latency(extractor_name: str, image_bytes: bytes, preprocess: bool) -> float:
+    from PIL import Image
+    from utils import ocr
+    from utils.image_preprocess import PreparedImage
+
+    original = ocr.preprocess_for_ocr
+    if not preprocess:
+        # Baseline: send the upload as-is, like before the preprocessing stage existed
+        def passthrough(data: bytes) -> PreparedImage:
+            image = Image.open(io.BytesIO(data))
+            return PreparedImage(data, Image.MIME[image.format], image.size, len(data))
+        ocr.preprocess_for_ocr = passthrough
+    try:
+        start = time.perf_counter()
+        await getattr(ocr, extractor_name)(image_bytes)
+        return time.perf_counter() - start
+    finally:
+        ocr.preprocess_for_ocr = original
+
+
+def main(live: bool):
+    paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, "*")))
+    print(f"{'image':<22}{'raw bytes':>12}{'sent bytes':>12}{'saved':>8}{'prep ms':>9}{'raw s':>8}{'prep s':>8}")
+    total_raw = total_sent = 0
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "rb") as f:
+            raw = f.read()
+
+        start = time.perf_counter()
+        try:
+            prepared = preprocess_for_ocr(raw)
+        except ImageQualityError as e:
+            print(f"{name:<22}{len(raw):>12}  rejected: {e}")
+            continue
+        prep_ms = (time.perf_counter() - start) * 1000
+
+        total_raw += len(raw)
+        total_sent += len(prepared.data)
+        line = f"{name:<22}{len(raw):>12}{len(prepared.data):>12}{1 - len(prepared.data) / len(raw):>8.0%}{prep_ms:>9.1f}"
+
+        if live and name in EXTRACTORS:
+            raw_s = asyncio.run(extraction_latency(EXTRACTORS[name], raw, preprocess=False))
+            prep_s = asyncio.run(extraction_latency(EXTRACTORS[name], raw, preprocess=True))
+            line += f"{raw_s:>8.2f}{prep_s:>8.2f}"
+        print(line)
+
+    if total_raw:
+        print(f"\nTotal: {total_raw} -> {total_sent} bytes ({1 - total_sent / total_raw:.0%} less sent to Gemini)")
+
+
+if __name__ == "__main__":
+    main(live="--live" in sys.argv)
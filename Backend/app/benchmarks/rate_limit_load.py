@@ -0,0 +1,97 @@
+"""
+Load test for the rate limiting middleware (utils/rate_limit.py).
+
+Well-behaved clients send a steady 5 requests per second each while one abusive
+client hammers the same route from many concurrent loops. The route does 20 ms of
+blocking work in the threadpool, like most of our sync handlers. The run is
+repeated without the middleware, and with it, and reports throughput and p95
+latency of the well-behaved clients plus what happened to the abusive one.
+
+The app is driven in-process by httpx, so client identity comes from a bearer
+token of the user id; utils.auth is given a throwaway JWT secret for the run.
+
+Run from Backend/app (needs fastapi + httpx + python-jose):
+    python -m benchmarks.rate_limit_load [seconds] [good_clients] [abusive_loops]
+"""
+import asyncio
+import sys
+import time
+import uuid
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI
+from jose import jwt
+
+from utils import auth
+from utils.rate_limit import MemoryRateLimitBackend, RateLimitMiddleware
+
+GOOD_RATE = 5  # requests per second per well-behaved client
+
+
+def build_app(limited: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/work")
+    def work():
+        time.sleep(0.02)
+        return {"ok": True}
+
+    if limited:
+        app.add_middleware(RateLimitMiddleware, backend=MemoryRateLimitBackend(), max_concurrent=32,
+                           per_minute=GOOD_RATE * 60 * 2, burst=10, route_limits={})
+    return app
+
+
+def token() -> str:
+    return jwt.encode({"sub": str(uuid.uuid4()), "exp": time.time() + 3600}, auth.JWT_SECRET_KEY, algorithm=auth.JWT_ALGORITHM)
+
+
+async def good_client(client, headers, deadline, results):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/work", headers=headers)
+        results.append((response.status_code, time.perf_counter() - start))
+        await asyncio.sleep(max(0.0, 1 / GOOD_RATE - (time.perf_counter() - start)))
+
+
+async def abusive_loop(client, headers, deadline, statuses):
+    while time.perf_counter() < deadline:
+        response = await client.get("/work", headers=headers)
+        statuses[response.status_code] += 1
+        if response.status_code != 200:
+            # A client that ignores Retry-After but yields to the loop between attempts
+            await asyncio.sleep(0)
+
+
+async def run(limited: bool, seconds: float, good_clients: int, abusive_loops: int):
+    transport = httpx.ASGITransport(app=build_app(limited))
+    good, abusive = [], Counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+        abuser = {"Authorization": f"Bearer {token()}"}
+        await asyncio.gather(
+            *(good_client(client, {"Authorization": f"Bearer {token()}"}, deadline, good) for _ in range(good_clients)),
+            *(abusive_loop(client, abuser, deadline, abusive) for _ in range(abusive_loops)),
+        )
+
+    ok = [latency for status, latency in good if status == 200]
+    p95 = sorted(ok)[int(len(ok) * 0.95)] * 1000 if ok else float("nan")
+    label = "with middleware   " if limited else "without middleware"
+    print(f"{label}: well-behaved {len(ok) / seconds:6.1f} ok req/s of {good_clients * GOOD_RATE} offered, "
+          f"p95 {p95:7.1f} ms, rejected {len(good) - len(ok)}; abusive client statuses {dict(abusive)}")
+
+
+async def main(seconds: float, good_clients: int, abusive_loops: int):
+    auth.JWT_SECRET_KEY = auth.JWT_SECRET_KEY or "benchmark-secret"
+    auth.JWT_ALGORITHM = auth.JWT_ALGORITHM or "HS256"
+    for limited in (False, True):
+        await run(limited, seconds, good_clients, abusive_loops)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 64,
+    ))
@@ -0,0 +1,79 @@
+"""
+Compares how long a chat reply waits on storage with synchronous uploads (the old
+behaviour, also paying for a new boto3 client per call) versus the background
+upload queue, how long the queued uploads take to become durable, and how much a
+repeated upload of the same bytes costs once it is deduplicated by content key.
+
+Run from Backend/app against a local S3-compatible server, e.g. MinIO:
+    docker run -p 9000:9000 -e MINIO_ROOT_USER=minio -e MINIO_ROOT_PASSWORD=minio123 minio/minio server /data
+    STORAGE_ENDPOINT_URL=http://localhost:9000 STORAGE_ACCESS_KEY_ID=minio STORAGE_SECRET_ACCESS_KEY=minio123 \
+        python -m benchmarks.storage_uploads [uploads] [size_kb]
+"""
+import io
+import os
+import statistics
+import sys
+import time
+
+import boto3
+from botocore.client import Config
+
+from utils import storage
+from utils.metrics import metrics
+
+BUCKET = "kyc-documents"
+
+
+def new_client():
+    """What every upload_file_to_s3 call used to do."""
+    return boto3.client(
+        's3',
+        endpoint_url=storage.ENDPOINT_URL,
+        aws_access_key_id=storage.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=storage.AWS_SECRET_ACCESS_KEY,
+        config=Config(signature_version='s3v4', s3={"addressing_style": "path"}),
+        region_name=storage.REGION_NAME
+    )
+
+
+def main(uploads: int, size_kb: int):
+    payload = os.urandom(size_kb * 1024)
+    client = storage.get_s3_client()
+    try:
+        client.create_bucket(Bucket=BUCKET)
+    except Exception:
+        pass
+    # This benchmark is about the S3 path
+    storage._backend = storage.S3StorageBackend()
+
+    waits = []
+    for i in range(uploads):
+        start = time.perf_counter()
+        new_client().upload_fileobj(io.BytesIO(payload), BUCKET, f"bench/sync_{i}.jpg")
+        waits.append(time.perf_counter() - start)
+    print(f"sync, new client : reply waits median {statistics.median(waits) * 1000:7.1f} ms, max {max(waits) * 1000:7.1f} ms")
+
+    # A fresh random prefix per run so the first queued pass really uploads;
+    # the second pass sends identical bytes and is deduplicated by content key
+    prefix = os.urandom(16)
+    for label in ("queued, pooled   ", "queued, repeated "):
+        waits, job_ids = [], []
+        start_all = time.perf_counter()
+        for i in range(uploads):
+            start = time.perf_counter()
+            job_ids.append(storage.upload_queue.enqueue(prefix + i.to_bytes(4, "big") + payload, BUCKET, "image/jpeg").id)
+            waits.append(time.perf_counter() - start)
+        durable = storage.upload_queue.wait(job_ids)
+        durable_after = time.perf_counter() - start_all
+        print(f"{label}: reply waits median {statistics.median(waits) * 1000:7.1f} ms, max {max(waits) * 1000:7.1f} ms; "
+              f"all durable={durable} after {durable_after * 1000:.0f} ms")
+
+    snapshot = metrics.snapshot()
+    for section in ("counters", "gauges", "timings"):
+        for name, value in sorted(snapshot[section].items()):
+            if name.startswith("storage_"):
+                print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20, int(sys.argv[2]) if len(sys.argv) > 2 else 300)
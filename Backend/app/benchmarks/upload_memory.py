@@ -0,0 +1,76 @@
+"""
+Memory used by concurrent 10 MB uploads through the old handling (`await file.read()`
+with no limit) and the size-capped, sniffed ingestion in utils/upload_ingest.py.
+
+Both endpoints run in a minimal FastAPI app driven in-process by httpx, so the
+numbers include the multipart parsing but not OCR or storage. Peak Python heap
+is measured with tracemalloc after the request bodies have been built.
+
+Run from Backend/app (needs fastapi + httpx):
+    python -m benchmarks.upload_memory [concurrency]
+"""
+import asyncio
+import os
+import sys
+import tracemalloc
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from utils.upload_ingest import read_image_upload, upload_body_limit, UploadRejectedError, UploadSizeLimitMiddleware
+
+MB = 1024 * 1024
+
+app = FastAPI()
+app.add_middleware(UploadSizeLimitMiddleware, limits={"/new": upload_body_limit()})
+
+
+@app.post("/old")
+async def old_upload(file: UploadFile = File(...)):
+    content = await file.read()
+    return {"size": len(content)}
+
+
+@app.post("/new")
+async def new_upload(file: UploadFile = File(...)):
+    try:
+        content, content_type = await read_image_upload(file)
+    except UploadRejectedError as e:
+        return {"rejected": str(e)}
+    return {"size": len(content), "type": content_type}
+
+
+def payload(size: int, image: bool) -> bytes:
+    head = b"\xff\xd8\xff\xe0" if image else b"%PDF"
+    return head + os.urandom(size - len(head))
+
+
+async def run(path: str, bodies, concurrency: int) -> tuple[float, list]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        responses = await asyncio.gather(*(
+            client.post(path, files={"file": ("upload.jpg", bodies[i % len(bodies)], "image/jpeg")})
+            for i in range(concurrency)
+        ))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak / MB, [r.status_code for r in responses]
+
+
+async def main(concurrency: int):
+    scenarios = [
+        ("10 MB photos", [payload(10 * MB - 1024, True)]),
+        ("30 MB photos", [payload(30 * MB, True)]),
+        ("10 MB non-images", [payload(10 * MB - 1024, False)]),
+    ]
+    for name, bodies in scenarios:
+        for path in ("/old", "/new"):
+            peak, statuses = await run(path, bodies, concurrency)
+            print(f"{name:<17} {path:<5} x{concurrency}: peak heap {peak:8.1f} MB, "
+                  f"status codes {sorted(set(statuses))}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8))
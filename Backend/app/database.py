@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
 from typing import Generator
@@ -27,10 +27,44 @@ def create_tables():
     Base.metadata.create_all(bind=engine)
     print("All tables created successfully!")
 
+# create_all() never alters tables that already exist, so columns and sequences
+# added to models.py later are applied here. Every statement is idempotent; they
+# run at startup and with `python database.py migrate`.
+SCHEMA_MIGRATIONS = [
+    # Face embedding cache and duplicate-face flag
+    "ALTER TABLE application_table ADD COLUMN IF NOT EXISTS face_embedding BYTEA",
+    "ALTER TABLE application_table ADD COLUMN IF NOT EXISTS duplicate_face_of UUID",
+    # Background upload state of the KYC images
+    "ALTER TABLE application_table ADD COLUMN IF NOT EXISTS artifacts_status VARCHAR",
+    # Clerk review leases
+    'ALTER TABLE application_table ADD COLUMN IF NOT EXISTS claimed_by UUID REFERENCES "user" (user_id)',
+    "ALTER TABLE application_table ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE application_table ADD COLUMN IF NOT EXISTS submitted_at TIMESTAMP WITH TIME ZONE DEFAULT now()",
+    "CREATE INDEX IF NOT EXISTS ix_application_table_pending_queue ON application_table (submitted_at) "
+    "WHERE application_status = 'pending'",
+    # Account number blocks, see utils/account_numbers.py
+    "CREATE SEQUENCE IF NOT EXISTS account_no_block_seq",
+]
+# Held while migrating so several workers starting together don't race on the DDL
+MIGRATION_LOCK_ID = 720_046_038
+
+
+def apply_migrations():
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+        for statement in SCHEMA_MIGRATIONS:
+            connection.execute(text(statement))
+    print(f"Schema migrations applied ({len(SCHEMA_MIGRATIONS)} statements)")
+
 def drop_tables():
     from models import Base 
     Base.metadata.drop_all(bind=engine)
     print("All tables dropped successfully!")
 
 if __name__ == "__main__":
-    create_tables()
\ No newline at end of file
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        apply_migrations()
+    else:
+        create_tables()
\ No newline at end of file
@@ -1,13 +1,28 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 import os
+import threading
+import time
 os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
 
+# Taken before the heavy imports (TensorFlow via DeepFace) so cold start covers them
+PROCESS_STARTED_AT = time.perf_counter()
+
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
-from database import create_tables, get_db , drop_tables
-from routes import roles, users, customers, accounts, transactions, auth, applications, chatbot
+from database import create_tables, get_db , drop_tables, SessionLocal, apply_migrations
+from utils.metrics import metrics
+from utils.faq_cache import faq_cache
+from utils.ocr_cache import ocr_cache
+from utils.face_index import face_index
+from utils.identity_filter import identity_filter
+from utils import verification, executors, storage
+from utils.auth import get_current_user, role_managers_only
+from utils.rate_limit import RateLimitMiddleware, RATE_LIMIT_ENABLED
+from utils.upload_ingest import UploadSizeLimitMiddleware
+from routes import roles, users, customers, accounts, transactions, auth, applications, chatbot, storage_upload
 
 app = FastAPI(
     title="Banking API",
@@ -15,6 +30,11 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Added before CORS so that 413/429/503 responses still carry the CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -24,21 +44,106 @@ app.add_middleware(
     allow_headers=["*"],  
 )
 
-# Include routers
-app.include_router(roles.router)
+# Include routers. Everything needs a bearer token except login, registration
+# (users router, protected per route) and signed storage uploads; managing roles
+# is limited to AUTH_ROLE_MANAGERS.
+authenticated = [Depends(get_current_user)]
+app.include_router(roles.router, dependencies=[Depends(role_managers_only)])
 app.include_router(users.router)
-app.include_router(customers.router)
-app.include_router(accounts.router)
-app.include_router(transactions.router)
+app.include_router(customers.router, dependencies=authenticated)
+app.include_router(accounts.router, dependencies=authenticated)
+app.include_router(transactions.router, dependencies=authenticated)
 app.include_router(auth.router)
-app.include_router(applications.router)
-app.include_router(chatbot.router)
+app.include_router(applications.router, dependencies=authenticated)
+app.include_router(chatbot.router, dependencies=authenticated)
+app.include_router(storage_upload.router)
+
+# Refuse to start with a storage backend that can't work (e.g. S3 without credentials)
+storage.check_config()
+
+# Objects stored by the local storage backend are served from here during development
+if storage.STORAGE_BACKEND == "local":
+    os.makedirs(storage.STORAGE_LOCAL_DIR, exist_ok=True)
+    app.mount("/storage", StaticFiles(directory=storage.STORAGE_LOCAL_DIR), name="storage")
 
 
 # Tables are already created, commenting this out to prevent connection exhaustion
 # create_tables()
 
 
+@app.on_event("startup")
+def migrate_schema():
+    # Registered first: the handlers below query the migrated tables
+    try:
+        apply_migrations()
+    except Exception as e:
+        print(f"Schema migrations failed, run `python database.py migrate`: {e}")
+
+
+@app.on_event("startup")
+def load_faq_cache():
+    try:
+        faq_cache.load()
+    except Exception as e:
+        print(f"FAQ cache unavailable: {e}")
+
+
+@app.on_event("startup")
+def load_face_index():
+    try:
+        face_index.load()
+    except Exception as e:
+        print(f"Face index unavailable: {e}")
+
+
+@app.on_event("startup")
+def load_identity_filter():
+    db = SessionLocal()
+    try:
+        identity_filter.load(db)
+    except Exception as e:
+        print(f"Identity filter unavailable, duplicate checks use the database: {e}")
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def purge_ocr_cache():
+    # Cached extractions are personal data; later purges are triggered by new entries
+    threading.Thread(target=ocr_cache.purge_expired, name="ocr-cache-purge", daemon=True).start()
+
+
+@app.on_event("startup")
+def reconcile_application_artifacts():
+    # Upload completion callbacks live in memory, so applications submitted just
+    # before a restart would otherwise stay "pending" forever. Checking storage
+    # can be slow, so it runs in the background.
+    def reconcile():
+        db = SessionLocal()
+        try:
+            changed = applications.reconcile_artifacts(db)
+            if changed:
+                print(f"Settled KYC artifacts of {changed} pending applications")
+        except Exception as e:
+            print(f"Could not reconcile pending KYC artifacts: {e}")
+        finally:
+            db.close()
+
+    threading.Thread(target=reconcile, name="reconcile-artifacts", daemon=True).start()
+
+
+@app.on_event("startup")
+def warm_up_face_models():
+    # Runs in the background so the server starts accepting /health immediately;
+    # /ready stays false until every process pool worker has loaded the models
+    executors.start_warm_up(started_at=PROCESS_STARTED_AT)
+
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    executors.shutdown()
+
+
 @app.get("/")
 def read_root():
     return {
@@ -59,6 +164,21 @@ def health_check(db: Session = Depends(get_db)):
         )
 
 
+@app.get("/ready")
+def readiness_check():
+    if not verification.face_models_ready.is_set():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Face models are warming up"
+        )
+    return {"status": "ready", "face_models": verification.warmup_status["state"]}
+
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
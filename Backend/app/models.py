@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Boolean, Date, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, Float, Boolean, Date, DateTime, ForeignKey, Enum, LargeBinary, Sequence
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import DeclarativeBase, relationship
 from datetime import datetime, timezone
@@ -9,6 +9,10 @@ class Base(DeclarativeBase):
     pass
 
 
+# Hands out blocks of account numbers, see utils/account_numbers.py
+account_no_block_seq = Sequence('account_no_block_seq', metadata=Base.metadata)
+
+
 class AccountStatusEnum(enum.Enum):
     ACTIVE = "active"
     BLOCKED = "blocked"
@@ -171,5 +175,11 @@ class ApplicationTable(Base):
     father_name = Column(String)
     gender = Column(String)
     kyc_status = Column(Boolean, default=False)
+    face_embedding = Column(LargeBinary, nullable=True)  # float32 Facenet512 embedding of the live photo
+    duplicate_face_of = Column(UUID(as_uuid=True), nullable=True)  # approved application with the same face
+    artifacts_status = Column(String, nullable=True)  # pending/stored/failed: background upload of the KYC images
+    claimed_by = Column(UUID(as_uuid=True), ForeignKey('user.user_id'), nullable=True)  # clerk holding the review lease
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    submitted_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))  # clerks review in this order
     
 
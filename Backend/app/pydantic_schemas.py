@@ -1,3 +1,4 @@
+from typing import List
 from pydantic import BaseModel, EmailStr
 import uuid
 from datetime import date, datetime
@@ -15,7 +16,11 @@ class UserCreate(BaseModel):
     email: EmailStr
     password: str
     mobile_no: str | None = None
-    role_id: uuid.UUID | None = None
+    role_id: uuid.UUID | None = None  # honoured only for role managers; self-registration is always "customer"
+
+
+class UserRoleUpdate(BaseModel):
+    role_id: uuid.UUID
 
 
 class UserResponse(BaseModel):
@@ -119,6 +124,19 @@ class TransactionResponse(BaseModel):
     mode_of_transaction: str
 
 
+class DashboardAccount(AccountResponse):
+    recent_transactions: List[TransactionResponse] = []
+
+
+class CustomerDashboardResponse(BaseModel):
+    customer_id: uuid.UUID
+    customer_name: str
+    account_no: str | None  # primary (oldest) account
+    balance: float  # across all accounts
+    customer: CustomerResponse
+    accounts: List[DashboardAccount]
+
+
 class ApplicationCreate(BaseModel):
     user_id: uuid.UUID
     firstname: str
@@ -168,6 +186,37 @@ class ApplicationResponse(BaseModel):
     adhar_card_image_url: str
     pan_card_image_url: str
     customer_image_url: str | None
+    duplicate_face_of: uuid.UUID | None = None
+    artifacts_status: str | None = None
+    claimed_by: uuid.UUID | None = None
+    lease_expires_at: datetime | None = None
+    submitted_at: datetime | None = None
+
+
+class ClaimRequest(BaseModel):
+    limit: int = 10
+
+
+class ClaimResponse(BaseModel):
+    lease_expires_at: datetime
+    applications: List[ApplicationResponse]
+
+
+class BatchDecisionRequest(BaseModel):
+    application_nos: List[uuid.UUID]
+    action: str  # approve/reject; applications leased to other clerks are skipped
+
+
+class BatchDecisionResult(BaseModel):
+    application_no: uuid.UUID
+    status: str  # approved/rejected/error
+    detail: str | None = None
+    customer_id: uuid.UUID | None = None
+    account_no: str | None = None
+
+
+class BatchDecisionResponse(BaseModel):
+    results: List[BatchDecisionResult]
 
 
 class AdharDetailsCreate(BaseModel):
@@ -1,15 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List
+import os
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
 
 from database import get_db
 from models import ApplicationTable, Customer, Account, User, AdharDetails, PanDetails
-from pydantic_schemas import ApplicationCreate, ApplicationResponse
+from pydantic_schemas import (ApplicationCreate, ApplicationResponse, BatchDecisionRequest, BatchDecisionResponse,
+                              BatchDecisionResult, ClaimRequest, ClaimResponse)
+from utils.account_numbers import account_numbers
+from utils.auth import AuthenticatedUser, require_roles
+from utils.face_index import face_index
+from utils.identity_filter import identity_filter
+from utils.storage import KYC_BUCKET, get_backend, key_from_url, upload_queue
 
 router = APIRouter(prefix="/applications", tags=["applications"])
 
+# Clerks claim pending applications for review; a claim is a lease that lapses
+# unless renewed by a heartbeat, so work held by a closed tab returns to the queue.
+APPLICATION_LEASE_SECONDS = int(os.getenv("APPLICATION_LEASE_SECONDS", "300"))
+APPLICATION_CLAIM_MAX = int(os.getenv("APPLICATION_CLAIM_MAX", "50"))
+
+# Reviewing applications is the clerk's job; leases are held by the clerk behind the token
+clerks_only = require_roles("clerk")
+
 
 @router.post("/", response_model=ApplicationResponse, status_code=status.HTTP_201_CREATED)
 def create_application(application: ApplicationCreate, db: Session = Depends(get_db)):
@@ -17,6 +35,7 @@ def create_application(application: ApplicationCreate, db: Session = Depends(get
     db.add(db_application)
     db.commit()
     db.refresh(db_application)
+    identity_filter.add(adhar_no=db_application.adhar_card_no, pan_no=db_application.pan_card_no)
     return db_application
 
 
@@ -29,6 +48,70 @@ def get_applications(skip: int = 0, limit: int = 100, status: str = None, db: Se
     return applications
 
 
+@router.post("/claim", response_model=ClaimResponse)
+def claim_applications(claim: ClaimRequest, clerk: AuthenticatedUser = Depends(clerks_only), db: Session = Depends(get_db)):
+    """
+    Leases up to `limit` reviewable pending applications to a clerk, oldest submission first,
+    including ones it already holds. Rows locked by a concurrent claim or decision are skipped
+    (FOR UPDATE SKIP LOCKED), so clerks never wait on each other or receive the same application.
+    """
+    limit = max(1, min(claim.limit, APPLICATION_CLAIM_MAX))
+    now = datetime.now(timezone.utc)
+    applications = (
+        db.query(ApplicationTable)
+        .filter(
+            ApplicationTable.application_status == "pending",
+            or_(ApplicationTable.artifacts_status.is_(None), ApplicationTable.artifacts_status == "stored"),
+            or_(ApplicationTable.lease_expires_at.is_(None),
+                ApplicationTable.lease_expires_at < now,
+                ApplicationTable.claimed_by == clerk.user_id),
+        )
+        .order_by(ApplicationTable.submitted_at, ApplicationTable.application_no)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+    lease_expires_at = now + timedelta(seconds=APPLICATION_LEASE_SECONDS)
+    for application in applications:
+        application.claimed_by = clerk.user_id
+        application.lease_expires_at = lease_expires_at
+    # Build the response before commit expires the loaded rows
+    response = ClaimResponse(lease_expires_at=lease_expires_at,
+                             applications=[ApplicationResponse.model_validate(application) for application in applications])
+    db.commit()
+    return response
+
+
+@router.post("/heartbeat")
+def renew_leases(clerk: AuthenticatedUser = Depends(clerks_only), db: Session = Depends(get_db)):
+    """Extends every unexpired lease the clerk holds. Expired leases may already belong to someone else."""
+    now = datetime.now(timezone.utc)
+    lease_expires_at = now + timedelta(seconds=APPLICATION_LEASE_SECONDS)
+    renewed = (
+        db.query(ApplicationTable)
+        .filter(ApplicationTable.claimed_by == clerk.user_id,
+                ApplicationTable.application_status == "pending",
+                ApplicationTable.lease_expires_at >= now)
+        .update({ApplicationTable.lease_expires_at: lease_expires_at}, synchronize_session=False)
+    )
+    db.commit()
+    return {"renewed": renewed, "lease_expires_at": lease_expires_at}
+
+
+@router.post("/{application_no}/release")
+def release_application(application_no: uuid.UUID, clerk: AuthenticatedUser = Depends(clerks_only), db: Session = Depends(get_db)):
+    released = (
+        db.query(ApplicationTable)
+        .filter(ApplicationTable.application_no == application_no, ApplicationTable.claimed_by == clerk.user_id)
+        .update({ApplicationTable.claimed_by: None, ApplicationTable.lease_expires_at: None}, synchronize_session=False)
+    )
+    db.commit()
+    if not released:
+        raise HTTPException(status_code=409, detail="Application is not claimed by this clerk")
+    return {"message": "Application released"}
+
+
 @router.get("/{application_no}", response_model=ApplicationResponse)
 def get_application(application_no: uuid.UUID, db: Session = Depends(get_db)):
     application = db.query(ApplicationTable).filter(ApplicationTable.application_no == application_no).first()
@@ -37,21 +120,64 @@ def get_application(application_no: uuid.UUID, db: Session = Depends(get_db)):
     return application
 
 
-@router.post("/{application_no}/approve")
-def approve_application(application_no: uuid.UUID, db: Session = Depends(get_db)):
-    application = db.query(ApplicationTable).filter(ApplicationTable.application_no == application_no).first()
-    if not application:
-        raise HTTPException(status_code=404, detail="Application not found")
-    
-    if application.application_status != "pending":
-        raise HTTPException(status_code=400, detail=f"Application is already {application.application_status}")
+def artifacts_problem(application: ApplicationTable) -> str | None:
+    # KYC images are uploaded in the background after submission
+    if application.artifacts_status == "pending":
+        return "KYC documents are still being stored, try again shortly"
+    if application.artifacts_status == "failed":
+        return "KYC documents could not be stored, the applicant has to upload them again"
+    return None
 
-    # Create Customer
-    # We need to check if customer already exists for this user? 
-    # The PRD implies new customer creation.
-    
-    # Create Customer
-    new_customer = Customer(
+
+def check_artifacts(application: ApplicationTable) -> str:
+    """
+    Re-derives artifacts_status from storage for applications whose upload callback
+    never ran (the process that queued the uploads exited). Images still queued in
+    this process stay "pending". A "failed" verdict is not final: if another worker
+    was still uploading, its completion callback overwrites it with "stored".
+    """
+    urls = (application.adhar_card_image_url, application.pan_card_image_url, application.customer_image_url)
+    keys = [key_from_url(KYC_BUCKET, url) for url in urls]
+    if any(key in upload_queue.pending_keys() for key in keys if key):
+        return "pending"
+    backend = get_backend()
+    return "stored" if all(key and backend.exists(KYC_BUCKET, key) for key in keys) else "failed"
+
+
+def reconcile_artifacts(db: Session) -> int:
+    """Settles every application left with pending artifacts. Returns how many changed."""
+    changed = 0
+    for application in db.query(ApplicationTable).filter(ApplicationTable.artifacts_status == "pending").all():
+        artifacts_status = check_artifacts(application)
+        if artifacts_status != "pending":
+            application.artifacts_status = artifacts_status
+            changed += 1
+    db.commit()
+    return changed
+
+
+def lease_problem(application: ApplicationTable, clerk_id: uuid.UUID) -> str | None:
+    # Another clerk's unexpired claim wins; unclaimed or lapsed applications can be decided by anyone
+    if application.claimed_by is None or application.claimed_by == clerk_id:
+        return None
+    if application.lease_expires_at is None or application.lease_expires_at < datetime.now(timezone.utc):
+        return None
+    return "Application is claimed by another clerk"
+
+
+def clear_lease(application: ApplicationTable):
+    application.claimed_by = None
+    application.lease_expires_at = None
+
+
+def approval_rows(application: ApplicationTable, db: Session) -> tuple:
+    """
+    Builds the Customer, AdharDetails, PanDetails and Account rows for an approved application.
+    The customer_id is generated here so no flush is needed before the dependent rows.
+    """
+    customer_id = uuid.uuid4()
+    customer = Customer(
+        customer_id=customer_id,
         user_id=application.user_id,
         firstname=application.firstname,
         lastname=application.lastname,
@@ -67,38 +193,29 @@ def approve_application(application_no: uuid.UUID, db: Session = Depends(get_db)
         dob=application.dob,
         father_name=application.father_name
     )
-    db.add(new_customer)
-    db.flush() # To get customer_id
 
-    # Create AdharDetails
-    new_adhar_details = AdharDetails(
-        customer_id=new_customer.customer_id,
+    adhar_details = AdharDetails(
+        customer_id=customer_id,
         name=f"{application.firstname} {application.lastname}",
         dob=application.dob,
         gender=application.gender,
         adhar_no=application.adhar_card_no,
         address=f"{application.address_line}, {application.city}, {application.state}"
     )
-    db.add(new_adhar_details)
 
-    # Create PanDetails
-    new_pan_details = PanDetails(
-        customer_id=new_customer.customer_id,
+    pan_details = PanDetails(
+        customer_id=customer_id,
         name=f"{application.firstname} {application.lastname}", # Or father name? Pan has name and father name.
         father_name=application.father_name,
         dob=application.dob,
         pan_no=application.pan_card_no
     )
-    db.add(new_pan_details)
 
-    # Create Account
-    # Generate account no
-    import random
-    account_no = str(random.randint(1000000000, 9999999999))
-    
-    new_account = Account(
+    # Unique by construction, so the commit can't fail on account_no
+    account_no = account_numbers.allocate(db)
+    account = Account(
         account_no=account_no,
-        customer_id=new_customer.customer_id,
+        customer_id=customer_id,
         status_flag="active",
         account_type="savings",
         home_branch_code="BR001",
@@ -108,27 +225,165 @@ def approve_application(application_no: uuid.UUID, db: Session = Depends(get_db)
         has_card=False,
         debit_card_no=None
     )
-    db.add(new_account)
+    return customer, adhar_details, pan_details, account
+
+
+def index_approved_faces(applications: List[ApplicationTable]):
+    # Approved faces are what later applications are checked against for duplicates
+    for application in applications:
+        if not application.face_embedding:
+            continue
+        try:
+            face_index.add(application.application_no, application.adhar_card_no,
+                           np.frombuffer(application.face_embedding, dtype=np.float32))
+        except Exception as e:
+            print(f"Could not add face embedding to the index: {e}")
+
+
+@router.post("/{application_no}/artifacts/recheck", dependencies=[Depends(clerks_only)])
+def recheck_artifacts(application_no: uuid.UUID, db: Session = Depends(get_db)):
+    """Lets a clerk settle an application whose KYC images are stuck as pending."""
+    application = db.query(ApplicationTable).filter(ApplicationTable.application_no == application_no).first()
+    if not application:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if application.artifacts_status != "stored":
+        application.artifacts_status = check_artifacts(application)
+        db.commit()
+    return {"artifacts_status": application.artifacts_status}
+
+
+@router.post("/{application_no}/approve")
+def approve_application(application_no: uuid.UUID, clerk: AuthenticatedUser = Depends(clerks_only), db: Session = Depends(get_db)):
+    # Locked until the commit, so the lease checked below can't lapse and be re-claimed meanwhile
+    application = (db.query(ApplicationTable).filter(ApplicationTable.application_no == application_no)
+                   .with_for_update().first())
+    if not application:
+        raise HTTPException(status_code=404, detail="Application not found")
+    
+    if application.application_status != "pending":
+        raise HTTPException(status_code=400, detail=f"Application is already {application.application_status}")
+
+    problem = lease_problem(application, clerk.user_id) or artifacts_problem(application)
+    if problem:
+        raise HTTPException(status_code=409, detail=problem)
+
+    customer, adhar_details, pan_details, account = approval_rows(application, db)
+    db.add_all([customer, adhar_details, pan_details, account])
 
     # Update Application Status
     application.application_status = "approved"
-    application.customer_id = new_customer.customer_id
+    application.customer_id = customer.customer_id
+    clear_lease(application)
     
     db.commit()
     
-    return {"message": "Application approved", "customer_id": new_customer.customer_id, "account_no": account_no}
+    index_approved_faces([application])
+    
+    return {"message": "Application approved", "customer_id": customer.customer_id, "account_no": account.account_no}
+
+
+@router.post("/batch", response_model=BatchDecisionResponse)
+def decide_applications(batch: BatchDecisionRequest, clerk: AuthenticatedUser = Depends(clerks_only),
+                        db: Session = Depends(get_db)):
+    """
+    Approves or rejects many applications in one transaction: one query loads and locks
+    them (in key order, so overlapping batches can't deadlock), the derived rows are
+    inserted together and the batch commits once.
+    Returns a result per application; ones that can't be decided are skipped.
+    """
+    if batch.action not in ("approve", "reject"):
+        raise HTTPException(status_code=400, detail="action must be 'approve' or 'reject'")
+
+    application_nos = list(dict.fromkeys(batch.application_nos))
+    applications = {
+        application.application_no: application
+        for application in db.query(ApplicationTable).filter(ApplicationTable.application_no.in_(application_nos))
+        .order_by(ApplicationTable.application_no).with_for_update().all()
+    }
+
+    results: Dict[uuid.UUID, BatchDecisionResult] = {}
+    decided: List[ApplicationTable] = []
+    for application_no in application_nos:
+        application = applications.get(application_no)
+        if application is None:
+            results[application_no] = BatchDecisionResult(application_no=application_no, status="error", detail="Application not found")
+        elif application.application_status != "pending":
+            results[application_no] = BatchDecisionResult(application_no=application_no, status="error",
+                                                          detail=f"Application is already {application.application_status}")
+        elif lease_problem(application, clerk.user_id):
+            results[application_no] = BatchDecisionResult(application_no=application_no, status="error",
+                                                          detail=lease_problem(application, clerk.user_id))
+        elif batch.action == "approve" and artifacts_problem(application):
+            results[application_no] = BatchDecisionResult(application_no=application_no, status="error",
+                                                          detail=artifacts_problem(application))
+        else:
+            decided.append(application)
+
+    if batch.action == "approve":
+        decided = skip_identity_conflicts(db, decided, results)
+
+    rows = []
+    for application in decided:
+        clear_lease(application)
+        if batch.action == "approve":
+            customer, adhar_details, pan_details, account = approval_rows(application, db)
+            rows += [customer, adhar_details, pan_details, account]
+            application.application_status = "approved"
+            application.customer_id = customer.customer_id
+            results[application.application_no] = BatchDecisionResult(
+                application_no=application.application_no, status="approved",
+                customer_id=customer.customer_id, account_no=account.account_no)
+        else:
+            application.application_status = "rejected"
+            results[application.application_no] = BatchDecisionResult(application_no=application.application_no, status="rejected")
+
+    db.add_all(rows)
+    db.commit()
+
+    if batch.action == "approve":
+        index_approved_faces(decided)
+
+    return BatchDecisionResponse(results=[results[application_no] for application_no in application_nos])
+
+
+def skip_identity_conflicts(db: Session, applications: List[ApplicationTable],
+                            results: Dict[uuid.UUID, BatchDecisionResult]) -> List[ApplicationTable]:
+    """Drops applications whose Adhar or PAN number is already registered (or repeated in the batch)."""
+    adhar_nos = {application.adhar_card_no for application in applications}
+    pan_nos = {application.pan_card_no for application in applications}
+    taken_adhar = {row[0] for row in db.query(AdharDetails.adhar_no).filter(AdharDetails.adhar_no.in_(adhar_nos)).all()}
+    taken_pan = {row[0] for row in db.query(PanDetails.pan_no).filter(PanDetails.pan_no.in_(pan_nos)).all()}
+
+    accepted = []
+    for application in applications:
+        if application.adhar_card_no in taken_adhar or application.pan_card_no in taken_pan:
+            results[application.application_no] = BatchDecisionResult(
+                application_no=application.application_no, status="error",
+                detail="A customer with this Adhar or PAN number already exists")
+            continue
+        taken_adhar.add(application.adhar_card_no)
+        taken_pan.add(application.pan_card_no)
+        accepted.append(application)
+    return accepted
 
 
 @router.post("/{application_no}/reject")
-def reject_application(application_no: uuid.UUID, db: Session = Depends(get_db)):
-    application = db.query(ApplicationTable).filter(ApplicationTable.application_no == application_no).first()
+def reject_application(application_no: uuid.UUID, clerk: AuthenticatedUser = Depends(clerks_only), db: Session = Depends(get_db)):
+    # Locked until the commit, so the lease checked below can't lapse and be re-claimed meanwhile
+    application = (db.query(ApplicationTable).filter(ApplicationTable.application_no == application_no)
+                   .with_for_update().first())
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
     
     if application.application_status != "pending":
         raise HTTPException(status_code=400, detail=f"Application is already {application.application_status}")
 
+    problem = lease_problem(application, clerk.user_id)
+    if problem:
+        raise HTTPException(status_code=409, detail=problem)
+
     application.application_status = "rejected"
+    clear_lease(application)
     db.commit()
     
     return {"message": "Application rejected"}
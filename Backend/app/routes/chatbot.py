@@ -1,27 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Dict, Any
 import uuid
 from datetime import datetime
-import io
-import tempfile
-import os
+import asyncio
+import json
 
-from database import get_db
+import numpy as np
+
+from database import get_db, SessionLocal
 from models import User, Customer, Account, ApplicationTable
-from utils.verification import verify_faces
-from utils.storage import upload_file_to_s3
+from utils.verification import verify_live_photo, record_timings
+from utils.executors import cpu_executor, io_executor, ExecutorBusyError, ExecutorTimeoutError
+from utils.storage import upload_queue, get_backend, fetch_image, incoming_key, is_incoming_key, KYC_BUCKET, STORAGE_PRESIGN_EXPIRES
+from utils.image_preprocess import OCR_MAX_SIDE
+from utils.upload_ingest import read_image_upload, UploadRejectedError
+from utils.faq_cache import faq_cache
+from utils.face_index import face_index
+from utils.identity_filter import identity_filter
+from utils.correction_parser import parse_correction
+from utils.auth import AuthenticatedUser, get_current_user
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/chatbot", tags=["chatbot"])
 
-# In-memory session store
+# In-memory session store, keyed by the user behind the bearer token (never a
+# user_id sent by the client, which could be anyone's)
 # Format: { user_id: { "state": "...", "data": { ... } } }
 CHAT_SESSIONS: Dict[uuid.UUID, Dict[str, Any]] = {}
 
+UPLOAD_FILE_TYPES = {"adhar", "pan", "live_photo"}
+UPLOAD_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp"}
+UPLOAD_ACTIONS = {"adhar": "upload_adhar", "pan": "upload_pan", "live_photo": "upload_live_photo"}
+
 class ChatRequest(BaseModel):
     message: str
-    user_id: uuid.UUID
 
 from typing import List, Optional
 
@@ -39,6 +53,17 @@ class ChatMessage(BaseModel):
 class ChatResponse(BaseModel):
     messages: List[ChatMessage]
 
+class PresignRequest(BaseModel):
+    file_type: str
+    content_type: str = "image/jpeg"
+
+class PresignResponse(BaseModel):
+    object_key: str
+    upload_url: str
+    method: str = "PUT"
+    headers: Dict[str, str]
+    expires_in: int
+
 def create_response(text: str, type: str = "text", payload_data: Dict[str, Any] | None = None, action: str | None = None) -> ChatResponse:
     payload = MessagePayload(extractedData=payload_data, action=action) if (payload_data or action) else None
     return ChatResponse(
@@ -53,9 +78,107 @@ def create_response(text: str, type: str = "text", payload_data: Dict[str, Any]
         ]
     )
 
-@router.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest, db: Session = Depends(get_db)):
-    user_id = request.user_id
+def cross_validate(data: Dict[str, Any]) -> str:
+    """Compares the Adhar and PAN name/DOB stored in the session."""
+    pan_name = data.get("pan_name")
+    pan_dob = data.get("pan_dob")
+    
+    adhar_name = f"{data['firstname']} {data['lastname']}".strip()
+    adhar_dob = data['dob']
+    
+    # DOB Check
+    if pan_dob and pan_dob != adhar_dob:
+        return f"⚠️ DOB mismatch! Adhar: {adhar_dob}, PAN: {pan_dob}"
+    
+    # Name Check (Simple case-insensitive check)
+    if pan_name and adhar_name.lower() not in pan_name.lower() and pan_name.lower() not in adhar_name.lower():
+        return f"⚠️ Name mismatch! Adhar: {adhar_name}, PAN: {pan_name}"
+    
+    return "✅ Adhar and PAN details matched."
+
+
+def store_adhar_front_details(data: Dict[str, Any], details: Dict[str, Any]):
+    name = details["name"]
+    data["firstname"] = name.split()[0]
+    data["lastname"] = " ".join(name.split()[1:]) if len(name.split()) > 1 else ""
+    data["dob"] = details["dob"]
+    data["adhar_no"] = details["adhar_no"]
+    data["gender"] = details.get("gender") or "Other"
+
+
+def store_adhar_back_details(data: Dict[str, Any], details: Dict[str, Any]):
+    data["address"] = details.get("address") or "Unknown Address"
+    data["city"] = details.get("city") or "Unknown City"
+    data["district"] = details.get("district") or "Unknown District"
+    data["state"] = details.get("state") or "Unknown State"
+    data["pincode"] = details.get("pincode") or "000000"
+
+
+def store_pan_details(data: Dict[str, Any], details: Dict[str, Any]):
+    data["pan_no"] = details["pan_no"]
+    data["father_name"] = details["father_name"]
+    data["pan_name"] = details.get("name")
+    data["pan_dob"] = details.get("dob")
+
+
+def kyc_review_text(data: Dict[str, Any]) -> str:
+    name = f"{data.get('firstname', '')} {data.get('lastname', '')}".strip()
+    return (
+        f"Name: {name}\nDOB: {data.get('dob')}\nGender: {data.get('gender')}\nAdhar No: {data.get('adhar_no')}\n\n"
+        f"Address: {data.get('address')}\nCity: {data.get('city')}\nDistrict: {data.get('district')}\n"
+        f"State: {data.get('state')}\nPincode: {data.get('pincode')}\n\n"
+        f"PAN Number: {data.get('pan_no')}\nPAN Name: {data.get('pan_name')}\n"
+        f"Father's Name: {data.get('father_name')}\nPAN DOB: {data.get('pan_dob')}"
+    )
+
+
+def queue_kyc_upload(data: Dict[str, Any], user_id: uuid.UUID, suffix: str, content: bytes, content_type: str | None) -> str:
+    """Queues a KYC image for background upload and returns the URL it will be served from."""
+    job = upload_queue.enqueue(content, KYC_BUCKET, content_type)
+    data.setdefault("upload_jobs", {})[suffix] = job.id
+    return job.url
+
+
+def find_existing_application(db: Session, adhar_no: str | None = None, pan_no: str | None = None):
+    # The identity filter rules out numbers never seen, so most new applicants skip the query
+    if adhar_no and identity_filter.might_have_adhar(adhar_no):
+        existing_app = db.query(ApplicationTable).filter(ApplicationTable.adhar_card_no == adhar_no).first()
+        if existing_app:
+            return existing_app
+    if pan_no and identity_filter.might_have_pan(pan_no):
+        return db.query(ApplicationTable).filter(ApplicationTable.pan_card_no == pan_no).first()
+    return None
+
+
+def finalize_application_artifacts(application_no: uuid.UUID, durable: bool):
+    """Upload completion callback: records whether all of the application's KYC images were stored."""
+    db = SessionLocal()
+    try:
+        application = db.query(ApplicationTable).filter(ApplicationTable.application_no == application_no).first()
+        if application:
+            application.artifacts_status = "stored" if durable else "failed"
+            db.commit()
+    finally:
+        db.close()
+    if not durable:
+        print(f"KYC image upload failed for application {application_no}")
+
+
+def apply_correction(current_data: Dict[str, Any], message: str) -> Dict[str, Any]:
+    """Parses common corrections locally; ambiguous messages go to Gemini."""
+    updated_data = parse_correction(current_data, message)
+    if updated_data is not None:
+        return updated_data
+
+    from utils.ocr import interpret_correction
+    return interpret_correction(current_data, message)
+
+
+def run_state_machine(request: ChatRequest, user_id: uuid.UUID, db: Session) -> ChatResponse | None:
+    """
+    Handles global commands and the onboarding state machine.
+    Returns None when the message should fall through to the General Query Engine.
+    """
     message = request.message.lower().strip()
     
     # Initialize session if not exists
@@ -117,7 +240,6 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
             return create_response(text="Great! Identity details verified. Now, please upload the BACK side of your Adhar Card (with address).", type="action-required", action="upload_adhar")
         else:
             # Interpret correction
-            from utils.ocr import interpret_correction
             
             current_data = {
                 "name": f"{session['data'].get('firstname', '')} {session['data'].get('lastname', '')}".strip(),
@@ -126,7 +248,7 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
                 "adhar_no": session["data"].get("adhar_no")
             }
             
-            updated_data = interpret_correction(current_data, message)
+            updated_data = apply_correction(current_data, message)
             
             if updated_data.get("error") == "network_error":
                 return create_response(text="There was some network error. We will back soon. Till then is there anything else i can help you with?")
@@ -153,7 +275,6 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
             return create_response(text="Address details verified. Now, please upload your PAN Card.", type="action-required", action="upload_pan")
         else:
             # Interpret correction
-            from utils.ocr import interpret_correction
             
             current_data = {
                 "address": session["data"].get("address"),
@@ -163,7 +284,7 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
                 "pincode": session["data"].get("pincode")
             }
             
-            updated_data = interpret_correction(current_data, message)
+            updated_data = apply_correction(current_data, message)
             
             if updated_data.get("error") == "network_error":
                 return create_response(text="There was some network error. We will back soon. Till then is there anything else i can help you with?")
@@ -184,18 +305,7 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
     elif state == "CONFIRMING_PAN":
         if message == "correct":
             # Perform Cross-Validation here
-            pan_name = session["data"].get("pan_name")
-            pan_dob = session["data"].get("pan_dob")
-            
-            adhar_name = f"{session['data']['firstname']} {session['data']['lastname']}".strip()
-            adhar_dob = session['data']['dob']
-            
-            match_status = "✅ Adhar and PAN details matched."
-            
-            if pan_dob and pan_dob != adhar_dob:
-                match_status = f"⚠️ DOB mismatch! Adhar: {adhar_dob}, PAN: {pan_dob}"
-            elif pan_name and adhar_name.lower() not in pan_name.lower() and pan_name.lower() not in adhar_name.lower():
-                 match_status = f"⚠️ Name mismatch! Adhar: {adhar_name}, PAN: {pan_name}"
+            match_status = cross_validate(session["data"])
             
             session["state"] = "AWAITING_LIVE_PHOTO"
             return create_response(
@@ -205,7 +315,6 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
             )
         else:
             # Interpret correction
-            from utils.ocr import interpret_correction
             
             current_data = {
                 "pan_no": session["data"].get("pan_no"),
@@ -214,7 +323,7 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
                 "dob": session["data"].get("pan_dob")
             }
             
-            updated_data = interpret_correction(current_data, message)
+            updated_data = apply_correction(current_data, message)
             
             if updated_data.get("error") == "network_error":
                 return create_response(text="There was some network error. We will back soon. Till then is there anything else i can help you with?")
@@ -228,9 +337,69 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
                 text=f"Updated PAN details:\n\nNumber: {session['data']['pan_no']}\nName: {session['data']['pan_name']}\nFather's Name: {session['data']['father_name']}\nDOB: {session['data']['pan_dob']}\n\nIs this correct now?"
             )
 
+    elif state == "CONFIRMING_KYC":
+        if message == "correct":
+            match_status = cross_validate(session["data"])
+            session["state"] = "AWAITING_LIVE_PHOTO"
+            return create_response(
+                text=f"Details confirmed.\n\n{match_status}\n\nPlease upload a live photo of yourself to complete verification.",
+                type="action-required",
+                action="upload_live_photo"
+            )
+        else:
+            # Interpret correction across all three documents; name and DOB refer to the Adhar card
+            current_data = {
+                "name": f"{session['data'].get('firstname', '')} {session['data'].get('lastname', '')}".strip(),
+                "dob": session["data"].get("dob"),
+                "gender": session["data"].get("gender"),
+                "adhar_no": session["data"].get("adhar_no"),
+                "address": session["data"].get("address"),
+                "city": session["data"].get("city"),
+                "district": session["data"].get("district"),
+                "state": session["data"].get("state"),
+                "pincode": session["data"].get("pincode"),
+                "pan_no": session["data"].get("pan_no"),
+                "father_name": session["data"].get("father_name")
+            }
+            
+            updated_data = apply_correction(current_data, message)
+            
+            if updated_data.get("error") == "network_error":
+                return create_response(text="There was some network error. We will back soon. Till then is there anything else i can help you with?")
+            
+            if "name" in updated_data and updated_data["name"]:
+                name_parts = updated_data["name"].split()
+                session["data"]["firstname"] = name_parts[0]
+                session["data"]["lastname"] = " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
+            for field in ["dob", "gender", "adhar_no", "address", "city", "district", "state", "pincode", "pan_no", "father_name"]:
+                if field in updated_data:
+                    session["data"][field] = updated_data[field]
+            
+            return create_response(
+                text=f"Updated details:\n\n{kyc_review_text(session['data'])}\n\nIs this correct now?"
+            )
+
     elif state == "AWAITING_LIVE_PHOTO":
         return create_response(text="Please upload a live photo of yourself to complete verification.", type="action-required", action="upload_live_photo")
 
+    # No state-machine reply, let the caller fall back to the General Query Engine
+    return None
+
+
+@router.post("/chat", response_model=ChatResponse)
+def chat(request: ChatRequest, current_user: AuthenticatedUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    user_id = current_user.user_id
+    response = run_state_machine(request, user_id, db)
+    if response is not None:
+        return response
+
+    message = request.message.lower().strip()
+
+    # General banking questions are answered from the vetted FAQ cache
+    faq_answer = faq_cache.lookup(message)
+    if faq_answer:
+        return create_response(text=faq_answer)
+
     # Fallback: Try General Query Engine
     try:
         from utils.query_engine import process_user_query
@@ -241,32 +410,131 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
         return create_response(text="I didn't understand that. How can I help?")
 
 
+def sse_event(event: str, data: str) -> str:
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+@router.post("/chat/stream")
+def chat_stream(request: ChatRequest, current_user: AuthenticatedUser = Depends(get_current_user),
+                db: Session = Depends(get_db)):
+    """
+    Server-Sent Events variant of /chat.
+    State-machine replies are sent immediately as a single 'message' frame.
+    Fallback answers stream LLM text as 'token' frames, followed by the
+    final 'message' frame carrying the usual ChatResponse shape.
+    """
+    user_id = current_user.user_id
+    response = run_state_machine(request, user_id, db)
+
+    def event_stream():
+        if response is not None:
+            yield sse_event("message", response.model_dump_json())
+            return
+
+        message = request.message.lower().strip()
+
+        faq_answer = faq_cache.lookup(message)
+        if faq_answer:
+            yield sse_event("message", create_response(text=faq_answer).model_dump_json())
+            return
+
+        chunks = []
+        try:
+            from utils.query_engine import stream_user_query
+            for chunk in stream_user_query(user_id, message, db):
+                chunks.append(chunk)
+                yield sse_event("token", json.dumps({"text": chunk}))
+            final = create_response(text="".join(chunks).strip())
+        except Exception as e:
+            print(f"Fallback Stream Error: {e}")
+            final = create_response(text="I didn't understand that. How can I help?")
+        yield sse_event("message", final.model_dump_json())
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/upload/presign", response_model=PresignResponse)
+def presign_upload(request: PresignRequest, current_user: AuthenticatedUser = Depends(get_current_user)):
+    """
+    Issues a short-lived URL the client PUTs the image to directly; the returned
+    object_key is then sent to /chatbot/upload instead of the file.
+    """
+    if current_user.user_id not in CHAT_SESSIONS:
+        raise HTTPException(status_code=400, detail="No active session")
+    if request.file_type not in UPLOAD_FILE_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid file type")
+    if request.content_type not in UPLOAD_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail="Only JPEG, PNG or WebP images are accepted")
+    
+    key = incoming_key(current_user.user_id, request.file_type, request.content_type)
+    return PresignResponse(
+        object_key=key,
+        upload_url=get_backend().presigned_put_url(KYC_BUCKET, key, request.content_type),
+        headers={"Content-Type": request.content_type},
+        expires_in=STORAGE_PRESIGN_EXPIRES
+    )
+
+
 @router.post("/upload", response_model=ChatResponse)
 async def upload_file(
-    user_id: uuid.UUID = Form(...),
-    file: UploadFile = File(...),
+    file: UploadFile | None = File(None),
+    object_key: str | None = Form(None), # from /upload/presign, instead of file
     file_type: str = Form(...), # adhar, pan, live_photo
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    user_id = current_user.user_id
     if user_id not in CHAT_SESSIONS:
         raise HTTPException(status_code=400, detail="No active session")
     
     session = CHAT_SESSIONS[user_id]
     state = session["state"]
     
-    # Read file content
-    content = await file.read()
+    if object_key:
+        # Uploaded directly to storage: only a downscaled copy comes through the API
+        if not is_incoming_key(object_key, user_id, file_type):
+            raise HTTPException(status_code=400, detail="Object key does not belong to this upload")
+        try:
+            content = await io_executor.run(fetch_image, KYC_BUCKET, object_key, OCR_MAX_SIDE)
+        except ValueError as e:
+            return create_response(text=f"{e}. Please upload the image again.")
+        except Exception as e:
+            print(f"Could not fetch {object_key}: {e}")
+            return create_response(text="There was some network error. We will back soon. Till then is there anything else i can help you with?")
+        content_type = "image/jpeg"
+        stored_url = get_backend().url(KYC_BUCKET, object_key)
+    elif file is not None:
+        # Size and type are checked on the spooled upload before it is read into memory
+        try:
+            content, content_type = await read_image_upload(file)
+        except UploadRejectedError as e:
+            return create_response(text=str(e), type="action-required", action=UPLOAD_ACTIONS.get(file_type))
+        stored_url = None
+    else:
+        raise HTTPException(status_code=400, detail="Either file or object_key is required")
+    
+    def store(suffix: str) -> str:
+        # Directly uploaded objects are already durable; form uploads go through the background queue
+        return stored_url or queue_kyc_upload(session["data"], user_id, suffix, content, content_type)
     
     if file_type == "adhar":
         if state == "AWAITING_ADHAR_FRONT":
             # Use Gemini to extract Adhar Front data
             from utils.ocr import extract_adhar_front
-            details = extract_adhar_front(content)
+            details = await extract_adhar_front(content)
             print(f"Gemini extracted Adhar Front details: {details}")
             
             if details.get("error") == "network_error":
                  return create_response(text="There was some network error. We will back soon. Till then is there anything else i can help you with?")
             
+            if details.get("error") == "low_quality":
+                 return create_response(text=f"{details['reason']} Please upload a clearer photo with the whole card visible.")
+            
             if details.get("is_adhar_card") is False:
                  return create_response(text="This does not appear to be a valid Adhar Card Front. Please upload a clear photo.")
             
@@ -274,7 +542,7 @@ async def upload_file(
                 return create_response(text="Could not extract critical details (Name, DOB, Adhar No). Please upload a clearer image.")
             
             # Check for duplicate application
-            existing_app = db.query(ApplicationTable).filter(ApplicationTable.adhar_card_no == details["adhar_no"]).first()
+            existing_app = find_existing_application(db, adhar_no=details["adhar_no"])
             if existing_app:
                 session["state"] = "INITIAL"
                 session["data"] = {}
@@ -282,24 +550,16 @@ async def upload_file(
                     text=f"⚠️ Application Already Exists!\n\nApplication No: {existing_app.application_no}\nStatus: {existing_app.application_status}\n\nYou cannot submit a duplicate application."
                 )
             
-            # Upload to S3
-            try:
-                public_url = upload_file_to_s3(io.BytesIO(content), "kyc-documents", f"{user_id}_adhar_front.jpg", file.content_type)
-                session["data"]["adhar_image_url"] = public_url
-            except Exception as e:
-                print(f"S3 upload failed for Adhar Front: {e}")
-                return create_response(text=f"Failed to store Adhar card image. Please try again. Error: {str(e)}")
+            # Upload to S3 in the background
+            session["data"]["adhar_image_url"] = store("adhar_front")
             
             # Store in session
             session["data"]["adhar_image"] = content
+            session["data"].pop("adhar_embedding", None)
             
             # Store extracted fields
             name = details["name"]
-            session["data"]["firstname"] = name.split()[0]
-            session["data"]["lastname"] = " ".join(name.split()[1:]) if len(name.split()) > 1 else ""
-            session["data"]["dob"] = details["dob"]
-            session["data"]["adhar_no"] = details["adhar_no"]
-            session["data"]["gender"] = details.get("gender") or "Other"
+            store_adhar_front_details(session["data"], details)
             
             session["state"] = "CONFIRMING_ADHAR_FRONT"
             
@@ -320,29 +580,23 @@ async def upload_file(
         elif state == "AWAITING_ADHAR_BACK":
             # Use Gemini to extract Adhar Back data
             from utils.ocr import extract_adhar_back
-            details = extract_adhar_back(content)
+            details = await extract_adhar_back(content)
             print(f"Gemini extracted Adhar Back details: {details}")
             
             if details.get("error") == "network_error":
                  return create_response(text="There was some network error. We will back soon. Till then is there anything else i can help you with?")
             
+            if details.get("error") == "low_quality":
+                 return create_response(text=f"{details['reason']} Please upload a clearer photo with the whole card visible.")
+            
             if details.get("is_adhar_back") is False:
                  return create_response(text="This does not appear to be a valid Adhar Card Back (Address side). Please upload a clear photo.")
             
-            # Upload to S3
-            try:
-                public_url = upload_file_to_s3(io.BytesIO(content), "kyc-documents", f"{user_id}_adhar_back.jpg", file.content_type)
-                session["data"]["adhar_back_image_url"] = public_url
-            except Exception as e:
-                print(f"S3 upload failed for Adhar Back: {e}")
-                return create_response(text=f"Failed to store Adhar card image. Please try again. Error: {str(e)}")
+            # Upload to S3 in the background
+            session["data"]["adhar_back_image_url"] = store("adhar_back")
             
             # Store extracted address fields
-            session["data"]["address"] = details.get("address") or "Unknown Address"
-            session["data"]["city"] = details.get("city") or "Unknown City"
-            session["data"]["district"] = details.get("district") or "Unknown District"
-            session["data"]["state"] = details.get("state") or "Unknown State"
-            session["data"]["pincode"] = details.get("pincode") or "000000"
+            store_adhar_back_details(session["data"], details)
             
             session["state"] = "CONFIRMING_ADHAR_BACK"
             
@@ -369,12 +623,15 @@ async def upload_file(
          
         # Use Gemini to extract PAN data
         from utils.ocr import extract_pan_data
-        details = extract_pan_data(content)
+        details = await extract_pan_data(content)
         print(f"Gemini extracted PAN details: {details}")
         
         if details.get("error") == "network_error":
              return create_response(text="There was some network error. We will back soon. Till then is there anything else i can help you with?")
         
+        if details.get("error") == "low_quality":
+             return create_response(text=f"{details['reason']} Please upload a clearer photo with the whole card visible.")
+        
         # Check if it's a valid PAN card
         if details.get("is_pan_card") is False:
              return create_response(text="This does not appear to be a valid PAN Card. Please upload a clear photo of your PAN Card.")
@@ -385,37 +642,23 @@ async def upload_file(
         if not details.get("father_name"):
             return create_response(text="Could not extract Father's Name from PAN Card. Please upload a clearer image.")
         
-        # Upload to S3
-        try:
-            public_url = upload_file_to_s3(io.BytesIO(content), "kyc-documents", f"{user_id}_pan.jpg", file.content_type)
-            session["data"]["pan_image_url"] = public_url
-        except Exception as e:
-            print(f"S3 upload failed for PAN: {e}")
-            return create_response(text=f"Failed to store PAN card image. Please try again. Error: {str(e)}")
+        # Check for duplicate application
+        existing_app = find_existing_application(db, pan_no=details["pan_no"])
+        if existing_app:
+            session["state"] = "INITIAL"
+            session["data"] = {}
+            return create_response(
+                text=f"⚠️ Application Already Exists!\n\nApplication No: {existing_app.application_no}\nStatus: {existing_app.application_status}\n\nYou cannot submit a duplicate application."
+            )
+        
+        # Upload to S3 in the background
+        session["data"]["pan_image_url"] = store("pan")
         
         # Store extracted data (all guaranteed to exist now)
-        session["data"]["pan_no"] = details["pan_no"]
-        session["data"]["father_name"] = details["father_name"]
-        session["data"]["pan_name"] = details.get("name")
-        session["data"]["pan_dob"] = details.get("dob")
+        store_pan_details(session["data"], details)
         
-        # Cross-validate name and DOB
         pan_name = details.get("name")
         pan_dob = details.get("dob")
-        
-        adhar_name = f"{session['data']['firstname']} {session['data']['lastname']}".strip()
-        adhar_dob = session['data']['dob']
-        
-        # Compare details
-        match_status = "✅ Adhar and PAN details matched."
-        
-        # DOB Check
-        if pan_dob and pan_dob != adhar_dob:
-            match_status = f"⚠️ DOB mismatch! Adhar: {adhar_dob}, PAN: {pan_dob}"
-            
-        # Name Check (Simple case-insensitive check)
-        elif pan_name and adhar_name.lower() not in pan_name.lower() and pan_name.lower() not in adhar_name.lower():
-             match_status = f"⚠️ Name mismatch! Adhar: {adhar_name}, PAN: {pan_name}"
 
         session["state"] = "CONFIRMING_PAN"
         
@@ -445,48 +688,30 @@ async def upload_file(
         if state != "AWAITING_LIVE_PHOTO":
              return create_response(text="Not expecting live photo now.")
         
-        # Save live photo temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_live:
-            tmp_live.write(content)
-            live_photo_path = tmp_live.name
-            
-        # Save adhar photo temporarily (from memory or download)
         if "adhar_image" not in session["data"]:
              return create_response(text="Adhar image missing from session.")
-             
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_adhar:
-            tmp_adhar.write(session["data"]["adhar_image"])
-            adhar_photo_path = tmp_adhar.name
-            
-        # Extract face from Adhar
-        from utils.verification import extract_face_from_image
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_adhar_face:
-            adhar_face_path = tmp_adhar_face.name
-            
-        print(f"Extracting face from {adhar_photo_path} to {adhar_face_path}...")
-        has_face = extract_face_from_image(adhar_photo_path, adhar_face_path)
+        # Decoding, face extraction and matching run in the process pool so the
+        # event loop keeps serving other requests during the DeepFace call
+        try:
+            result = await cpu_executor.run(verify_live_photo, content, session["data"]["adhar_image"],
+                                            session["data"].get("adhar_embedding"))
+        except (ExecutorBusyError, ExecutorTimeoutError) as e:
+            print(f"Face verification not completed: {e}")
+            return create_response(text="Verification is taking longer than usual. Please upload your live photo again in a moment.", type="action-required", action="upload_live_photo")
+        # The worker process can't export its metrics, so its timings are recorded here
+        record_timings(result["timings"])
         
-        target_verification_path = adhar_face_path
-        if has_face:
-            print("Using extracted face for verification.")
-        else:
+        if result["status"] == "invalid_live_photo":
+            return create_response(text="Could not read the live photo. Please upload a JPEG or PNG image.", type="action-required", action="upload_live_photo")
+        if result["status"] == "no_adhar_face":
             print("Face extraction failed.")
-            # Cleanup temp files
-            if os.path.exists(live_photo_path): os.unlink(live_photo_path)
-            if os.path.exists(adhar_photo_path): os.unlink(adhar_photo_path)
-            if os.path.exists(adhar_face_path): os.unlink(adhar_face_path)
-            
             return create_response(text="Could not detect a clear face in your Adhar Card. Verification requires a clear face photo. Please restart and upload a clearer Adhar Card.")
 
-        # Verify Faces
-        is_match = verify_faces(live_photo_path, target_verification_path)
+        # Retries reuse the Adhar embedding instead of extracting the face again
+        session["data"]["adhar_embedding"] = result["adhar_embedding"]
+        is_match = result["verified"]
         print(f"Face verification result: {is_match}")
-
-        # Cleanup temp files
-        if os.path.exists(live_photo_path): os.unlink(live_photo_path)
-        if os.path.exists(adhar_photo_path): os.unlink(adhar_photo_path)
-        if os.path.exists(adhar_face_path): os.unlink(adhar_face_path)
         
         # Initialize retry count if not present
         if "retry_count" not in session["data"]:
@@ -512,13 +737,19 @@ async def upload_file(
                 message = "Face verification failed 3 times. Your application has been submitted, but you must visit the bank branch to complete manual KYC."
                 status_code = "manual_kyc"
 
-        # Upload to S3 (Only if verified or max retries reached)
-        try:
-            public_url = upload_file_to_s3(io.BytesIO(content), "kyc-documents", f"{user_id}_live.jpg", file.content_type)
-            session["data"]["customer_image_url"] = public_url
-        except Exception as e:
-            print(f"S3 upload failed for Live Photo: {e}")
-            return create_response(text=f"Failed to store live photo. Please try again. Error: {str(e)}")
+        # Flag applicants whose face matches an approved customer with a different Adhar number
+        live_embedding = result.get("live_embedding")
+        duplicate_face_of = None
+        if live_embedding is not None:
+            duplicate = face_index.find_duplicate(np.frombuffer(live_embedding, dtype=np.float32), session["data"]["adhar_no"])
+            if duplicate is not None:
+                duplicate_face_of, similarity = duplicate
+                print(f"Possible duplicate identity: matches application {duplicate_face_of} (similarity {similarity:.3f})")
+                kyc_status = False
+                message = "Your application has been submitted. Our team will review your KYC before it is approved."
+
+        # Upload to S3 in the background (Only if verified or max retries reached)
+        session["data"]["customer_image_url"] = store("live")
 
         try:
             # Create Application
@@ -556,13 +787,24 @@ async def upload_file(
                 dob=dob_obj,
                 gender=session["data"].get("gender"),
                 kyc_status=kyc_status,
+                face_embedding=live_embedding,
+                duplicate_face_of=duplicate_face_of,
                 adhar_card_image_url=session["data"]["adhar_image_url"],
                 pan_card_image_url=session["data"]["pan_image_url"],
                 customer_image_url=session["data"]["customer_image_url"],
-                application_status="pending"
+                application_status="pending",
+                artifacts_status="pending"
             )
             db.add(new_app)
             db.commit()
+            identity_filter.add(adhar_no=new_app.adhar_card_no, pan_no=new_app.pan_card_no)
+            
+            # The application can only be approved once its KYC images are durable
+            application_no = new_app.application_no
+            upload_queue.when_durable(
+                list(session["data"].get("upload_jobs", {}).values()),
+                lambda durable: finalize_application_artifacts(application_no, durable)
+            )
             
             session["state"] = "COMPLETED"
             return create_response(text=message)
@@ -571,3 +813,109 @@ async def upload_file(
             return create_response(text=f"Process completed but failed to save application: {str(e)}")
 
     return create_response(text="Invalid file type")
+
+
+@router.post("/upload/kyc", response_model=ChatResponse)
+async def upload_kyc_documents(
+    adhar_front: UploadFile = File(...),
+    adhar_back: UploadFile = File(...),
+    pan: UploadFile = File(...),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Single-request alternative to the serial Adhar front / Adhar back / PAN uploads.
+    Extraction of all three documents runs concurrently, storage is queued in the
+    background, and one combined review (with the Adhar/PAN cross-validation) is returned.
+    """
+    user_id = current_user.user_id
+    if user_id not in CHAT_SESSIONS:
+        CHAT_SESSIONS[user_id] = {"state": "INITIAL", "data": {}}
+    
+    session = CHAT_SESSIONS[user_id]
+    if session["state"] not in ("INITIAL", "AWAITING_ADHAR_FRONT"):
+        return create_response(text="An application is already in progress. Say 'cancel' to start over.")
+    
+    try:
+        front_content, front_type = await read_image_upload(adhar_front)
+        back_content, back_type = await read_image_upload(adhar_back)
+        pan_content, pan_type = await read_image_upload(pan)
+    except UploadRejectedError as e:
+        return create_response(text=str(e))
+    
+    from utils.ocr import extract_adhar_front, extract_adhar_back, extract_pan_data
+    
+    results = await asyncio.gather(
+        extract_adhar_front(front_content),
+        extract_adhar_back(back_content),
+        extract_pan_data(pan_content),
+        return_exceptions=True
+    )
+    front_details, back_details, pan_details = [
+        {"error": "network_error"} if isinstance(result, Exception) else result for result in results
+    ]
+    print(f"Gemini extracted KYC bundle: {front_details}, {back_details}, {pan_details}")
+    
+    if any(details.get("error") == "network_error" for details in (front_details, back_details, pan_details)):
+        return create_response(text="There was some network error. We will back soon. Till then is there anything else i can help you with?")
+    
+    # Collect every problem so the user can fix all documents in one go
+    problems = []
+    for label, details in (("Adhar Front", front_details), ("Adhar Back", back_details), ("PAN Card", pan_details)):
+        if details.get("error") == "low_quality":
+            problems.append(f"{label}: {details['reason']}")
+    if not problems:
+        if front_details.get("is_adhar_card") is False:
+            problems.append("Adhar Front: this does not appear to be a valid Adhar Card Front.")
+        elif not front_details.get("name") or not front_details.get("dob") or not front_details.get("adhar_no"):
+            problems.append("Adhar Front: could not extract critical details (Name, DOB, Adhar No).")
+        if back_details.get("is_adhar_back") is False:
+            problems.append("Adhar Back: this does not appear to be a valid Adhar Card Back (Address side).")
+        if pan_details.get("is_pan_card") is False:
+            problems.append("PAN Card: this does not appear to be a valid PAN Card.")
+        elif not pan_details.get("pan_no") or not pan_details.get("father_name"):
+            problems.append("PAN Card: could not extract the PAN Number and Father's Name.")
+    if problems:
+        return create_response(text="Please re-upload the following documents with a clearer photo:\n\n" + "\n".join(problems))
+    
+    # Check for duplicate application
+    existing_app = find_existing_application(db, adhar_no=front_details["adhar_no"], pan_no=pan_details.get("pan_no"))
+    if existing_app:
+        session["state"] = "INITIAL"
+        session["data"] = {}
+        return create_response(
+            text=f"⚠️ Application Already Exists!\n\nApplication No: {existing_app.application_no}\nStatus: {existing_app.application_status}\n\nYou cannot submit a duplicate application."
+        )
+    
+    # Uploads run in the background; the application is finalized once they are durable
+    session["data"] = {"adhar_image": front_content}
+    session["data"]["adhar_image_url"] = queue_kyc_upload(session["data"], user_id, "adhar_front", front_content, front_type)
+    session["data"]["adhar_back_image_url"] = queue_kyc_upload(session["data"], user_id, "adhar_back", back_content, back_type)
+    session["data"]["pan_image_url"] = queue_kyc_upload(session["data"], user_id, "pan", pan_content, pan_type)
+    store_adhar_front_details(session["data"], front_details)
+    store_adhar_back_details(session["data"], back_details)
+    store_pan_details(session["data"], pan_details)
+    
+    session["state"] = "CONFIRMING_KYC"
+    match_status = cross_validate(session["data"])
+    
+    data = session["data"]
+    payload_data = {
+        "Name": f"{data['firstname']} {data['lastname']}".strip(),
+        "DOB": data["dob"],
+        "Gender": data["gender"],
+        "ID Number": data["adhar_no"],
+        "Address": data["address"],
+        "City": data["city"],
+        "District": data["district"],
+        "State": data["state"],
+        "Pincode": data["pincode"],
+        "PAN Number": data["pan_no"],
+        "Father's Name": data["father_name"]
+    }
+    
+    return create_response(
+        text=f"All documents scanned. Please review:\n\n{kyc_review_text(data)}\n\n{match_status}\n\nIs this correct? Type 'correct' to proceed, or tell me what to change.",
+        type="extraction-success",
+        payload_data=payload_data
+    )
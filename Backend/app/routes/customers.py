@@ -1,14 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, List
+import os
 import uuid
 
 from database import get_db
-from models import Customer
-from pydantic_schemas import CustomerCreate, CustomerResponse
+from models import Customer, Transactions
+from pydantic_schemas import (AccountResponse, CustomerCreate, CustomerDashboardResponse, CustomerResponse,
+                              DashboardAccount, TransactionResponse)
+from utils.auth import AuthenticatedUser, get_current_user
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
+DASHBOARD_MAX_TRANSACTIONS = 50
+# Roles that may open any customer's dashboard; everyone else only sees their own
+DASHBOARD_STAFF_ROLES = tuple(role.strip() for role in os.getenv("DASHBOARD_STAFF_ROLES", "clerk,admin").split(",") if role.strip())
+
 
 @router.post("/", response_model=CustomerResponse, status_code=status.HTTP_201_CREATED)
 def create_customer(customer: CustomerCreate, db: Session = Depends(get_db)):
@@ -31,3 +39,70 @@ def get_customer(customer_id: uuid.UUID, db: Session = Depends(get_db)):
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
+
+
+def recent_transactions(db: Session, account_nos: List[str], limit: int) -> Dict[str, List[Transactions]]:
+    """The latest `limit` transactions of every account in one query (ROW_NUMBER per account)."""
+    if not account_nos:
+        return {}
+    ranked = (
+        db.query(
+            Transactions.transaction_id,
+            func.row_number().over(partition_by=Transactions.account_no,
+                                   order_by=(Transactions.time.desc(), Transactions.transaction_id)).label("rank"),
+        )
+        .filter(Transactions.account_no.in_(account_nos))
+        .subquery()
+    )
+    rows = (
+        db.query(Transactions)
+        .join(ranked, Transactions.transaction_id == ranked.c.transaction_id)
+        .filter(ranked.c.rank <= limit)
+        .order_by(Transactions.account_no, ranked.c.rank)
+        .all()
+    )
+    by_account: Dict[str, List[Transactions]] = {account_no: [] for account_no in account_nos}
+    for transaction in rows:
+        by_account[transaction.account_no].append(transaction)
+    return by_account
+
+
+@router.get("/dashboard/{user_id}", response_model=CustomerDashboardResponse)
+def get_dashboard(user_id: uuid.UUID, transactions: int = 5, db: Session = Depends(get_db),
+                  current_user: AuthenticatedUser = Depends(get_current_user)):
+    """
+    Profile, accounts, balances and the latest transactions of each account in three
+    queries however many accounts the customer has: customer, accounts (selectinload)
+    and the per-account top-N transactions.
+    """
+    if current_user.role not in DASHBOARD_STAFF_ROLES and current_user.user_id != user_id:
+        raise HTTPException(status_code=403, detail="You can only view your own dashboard")
+
+    customer = (
+        db.query(Customer)
+        .options(selectinload(Customer.accounts))
+        .filter(Customer.user_id == user_id)
+        .first()
+    )
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    # Oldest first, so the primary account is stable; accounts without a date go last
+    accounts = sorted(customer.accounts, key=lambda account: (account.date_of_activation is None, account.date_of_activation or 0))
+    limit = max(0, min(transactions, DASHBOARD_MAX_TRANSACTIONS))
+    latest = recent_transactions(db, [account.account_no for account in accounts], limit) if limit else {}
+
+    return CustomerDashboardResponse(
+        customer_id=customer.customer_id,
+        customer_name=f"{customer.firstname} {customer.lastname}",
+        account_no=accounts[0].account_no if accounts else None,
+        balance=sum(account.current_balance or 0.0 for account in accounts),
+        customer=CustomerResponse.model_validate(customer),
+        accounts=[
+            DashboardAccount(
+                **AccountResponse.model_validate(account).model_dump(),
+                recent_transactions=[TransactionResponse.model_validate(t) for t in latest.get(account.account_no, [])],
+            )
+            for account in accounts
+        ],
+    )
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Request, status
+import asyncio
+import tempfile
+
+from utils import storage
+from utils.upload_ingest import sniff_image_type, SNIFF_BYTES
+
+# Target of presigned PUT URLs issued by the local storage backend, so the direct
+# upload flow works in development without an S3-compatible server.
+router = APIRouter(prefix="/storage-upload", tags=["storage"])
+
+
+@router.put("/{bucket_name}/{key:path}", status_code=status.HTTP_200_OK)
+async def put_object(bucket_name: str, key: str, content_type: str, expires: int, signature: str, request: Request):
+    if storage.STORAGE_BACKEND != "local":
+        raise HTTPException(status_code=404, detail="Not found")
+    if not storage.verify_local_upload(bucket_name, key, content_type, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired upload URL")
+    if request.headers.get("content-type", "").split(";")[0].strip() != content_type:
+        raise HTTPException(status_code=400, detail="Content-Type does not match the signed upload")
+
+    # Spool the body to disk past 1 MB so large uploads don't sit in memory
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > storage.STORAGE_MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="File too large")
+            spool.write(chunk)
+        spool.seek(0)
+        if sniff_image_type(spool.read(SNIFF_BYTES)) != content_type:
+            raise HTTPException(status_code=400, detail="File content is not a supported image")
+        spool.seek(0)
+        await asyncio.to_thread(storage.get_backend().put, bucket_name, key, spool, content_type)
+
+    return {"key": key, "size": size}
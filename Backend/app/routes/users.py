@@ -7,16 +7,17 @@ from hashlib import sha256
 
 from database import get_db
 from models import User, Roles
-from pydantic_schemas import UserCreate, UserResponse
+from pydantic_schemas import UserCreate, UserResponse, UserRoleUpdate
+from utils.auth import AuthenticatedUser, AUTH_ROLE_MANAGERS, get_current_user, get_optional_user, role_managers_only
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    # Verify role exists if role_id is provided
-    # Verify role exists if role_id is provided
-    if user.role_id:
+def create_user(user: UserCreate, db: Session = Depends(get_db),
+                current_user: AuthenticatedUser | None = Depends(get_optional_user)):
+    # Anyone can register, but only role managers may create staff accounts
+    if user.role_id and current_user is not None and current_user.role in AUTH_ROLE_MANAGERS:
         role = db.query(Roles).filter(Roles.role_id == user.role_id).first()
         if not role:
             raise HTTPException(status_code=404, detail=f"Role with id {user.role_id} not found")
@@ -46,7 +47,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 
-@router.get("/{user_id}", response_model=UserResponse)
+@router.get("/{user_id}", response_model=UserResponse, dependencies=[Depends(get_current_user)])
 def get_user(user_id: uuid.UUID, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
@@ -54,7 +55,21 @@ def get_user(user_id: uuid.UUID, db: Session = Depends(get_db)):
     return user
 
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=List[UserResponse], dependencies=[Depends(get_current_user)])
 def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     users = db.query(User).offset(skip).limit(limit).all()
     return users
+
+
+@router.put("/{user_id}/role", response_model=UserResponse, dependencies=[Depends(role_managers_only)])
+def update_user_role(user_id: uuid.UUID, update: UserRoleUpdate, db: Session = Depends(get_db)):
+    user = db.query(User).filter(User.user_id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not db.query(Roles).filter(Roles.role_id == update.role_id).first():
+        raise HTTPException(status_code=404, detail=f"Role with id {update.role_id} not found")
+    # The auth user cache is invalidated by the User mapper event on commit
+    user.role_id = update.role_id
+    db.commit()
+    db.refresh(user)
+    return user
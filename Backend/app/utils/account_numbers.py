@@ -0,0 +1,73 @@
+import os
+import threading
+from typing import Callable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import account_no_block_seq
+from utils.metrics import metrics
+
+# Account number allocation without collisions or retries.
+# Each process reserves a block of ACCOUNT_NO_BLOCK_SIZE numbers with one nextval()
+# on account_no_block_seq and hands them out locally; block b covers payloads
+# ACCOUNT_NO_BASE + b * ACCOUNT_NO_BLOCK_SIZE onwards. nextval() is never rolled
+# back, so no two processes get the same block, and numbers left in a block when
+# a process exits are simply skipped. An account number is the 9-digit payload
+# followed by a Luhn check digit, which catches single-digit typos and most
+# adjacent transpositions when a number is typed in.
+#
+# The block size is part of the numbering: changing it for an existing sequence
+# makes new blocks overlap old ones.
+
+ACCOUNT_NO_BASE = 100_000_000
+ACCOUNT_NO_BLOCK_SIZE = int(os.getenv("ACCOUNT_NO_BLOCK_SIZE", "100"))
+
+
+def luhn_check_digit(payload: str) -> str:
+    total = 0
+    # Doubling starts from the rightmost payload digit, since the check digit is appended after it
+    for i, char in enumerate(reversed(payload)):
+        digit = int(char)
+        if i % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_account_no(account_no: str) -> bool:
+    return len(account_no) == 10 and account_no.isdigit() and luhn_check_digit(account_no[:-1]) == account_no[-1]
+
+
+def reserve_block_from_sequence(db: Session) -> int:
+    return db.scalar(select(account_no_block_seq.next_value()))
+
+
+class AccountNumberAllocator:
+    def __init__(self, block_size: int = ACCOUNT_NO_BLOCK_SIZE,
+                 reserve_block: Callable[[Session], int] = reserve_block_from_sequence):
+        self.block_size = block_size
+        self.reserve_block = reserve_block
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def allocate(self, db: Session) -> str:
+        """Next account number. Only touches the database when the current block is used up."""
+        with self._lock:
+            if self._next >= self._end:
+                block = self.reserve_block(db)
+                self._next = ACCOUNT_NO_BASE + block * self.block_size
+                self._end = self._next + self.block_size
+                metrics.incr("account_no_blocks_reserved_total")
+            payload = self._next
+            self._next += 1
+        if payload >= 10 * ACCOUNT_NO_BASE:
+            raise RuntimeError("Account number space exhausted")
+        payload = str(payload)
+        return payload + luhn_check_digit(payload)
+
+
+account_numbers = AccountNumberAllocator()
@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+from sqlalchemy import event, inspect
+
+from models import Roles, User
+from utils.metrics import metrics
+
+# Bearer token authentication for the API routers.
+# Verifying a JWT signature costs far more than a dict lookup, so decoded claims
+# are cached per token until the token expires. The user and role behind a token
+# are resolved through a short TTL cache rather than a User -> Roles join on every
+# request. Role changes made through the ORM invalidate the cache via the mapper
+# events below, so they apply immediately in this process; other workers and
+# edits made directly in the database are picked up within AUTH_USER_CACHE_TTL.
+
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
+AUTH_CLAIMS_CACHE_SIZE = int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+# Roles allowed to create roles and assign them to users
+AUTH_ROLE_MANAGERS = tuple(role.strip() for role in os.getenv("AUTH_ROLE_MANAGERS", "admin").split(",") if role.strip())
+
+
+class TTLCache:
+    """Thread-safe LRU map whose entries each carry their own expiry (epoch seconds)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class AuthenticatedUser:
+    def __init__(self, user_id: uuid.UUID, email: str, role: str | None):
+        self.user_id = user_id
+        self.email = email
+        self.role = role
+
+
+_claims_cache = TTLCache(AUTH_CLAIMS_CACHE_SIZE)
+_user_cache = TTLCache(AUTH_USER_CACHE_SIZE)
+_bearer = HTTPBearer(auto_error=False)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail,
+                         headers={"WWW-Authenticate": "Bearer"})
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Validated claims of an access token, cached until the token's own expiry."""
+    claims = _claims_cache.get(token)
+    if claims is not None:
+        metrics.incr("auth_claims_cache_total", result="hit")
+        return claims
+
+    metrics.incr("auth_claims_cache_total", result="miss")
+    try:
+        claims = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        raise _unauthorized("Invalid or expired token")
+    if "sub" not in claims or "exp" not in claims:
+        raise _unauthorized("Invalid token")
+    _claims_cache.put(token, claims, float(claims["exp"]))
+    return claims
+
+
+def load_user(user_id: uuid.UUID) -> AuthenticatedUser | None:
+    """User and role name in one query. Opens its own session so cache hits never touch the pool."""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(User.user_id, User.email, Roles.role_name)
+            .outerjoin(Roles, User.role_id == Roles.role_id)
+            .filter(User.user_id == user_id)
+            .first()
+        )
+    finally:
+        db.close()
+    return AuthenticatedUser(row.user_id, row.email, row.role_name) if row else None
+
+
+def resolve_user(user_id: uuid.UUID) -> AuthenticatedUser | None:
+    user = _user_cache.get(user_id)
+    if user is not None:
+        metrics.incr("auth_user_cache_total", result="hit")
+        return user
+    metrics.incr("auth_user_cache_total", result="miss")
+    user = load_user(user_id)
+    if user is not None:
+        _user_cache.put(user_id, user, time.time() + AUTH_USER_CACHE_TTL)
+    return user
+
+
+def invalidate_user(user_id: uuid.UUID):
+    """Call after changing a user's role (or deleting the user)."""
+    _user_cache.pop(user_id)
+
+
+def invalidate_all_users():
+    """Call after changing a role itself, which may affect any user."""
+    _user_cache.clear()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    if inspect(target).was_deleted or inspect(target).attrs.role_id.history.has_changes():
+        invalidate_user(target.user_id)
+
+
+@event.listens_for(Roles, "after_update")
+@event.listens_for(Roles, "after_delete")
+def _role_changed(mapper, connection, target):
+    invalidate_all_users()
+
+
+def get_current_user(credentials: HTTPAuthorizationCredentials | None = Depends(_bearer)) -> AuthenticatedUser:
+    if credentials is None:
+        raise _unauthorized("Not authenticated")
+    claims = decode_token(credentials.credentials)
+    try:
+        user_id = uuid.UUID(claims["sub"])
+    except ValueError:
+        raise _unauthorized("Invalid token")
+    user = resolve_user(user_id)
+    if user is None:
+        raise _unauthorized("User no longer exists")
+    return user
+
+
+def get_optional_user(credentials: HTTPAuthorizationCredentials | None = Depends(_bearer)) -> AuthenticatedUser | None:
+    """Like get_current_user for routes that are also open to anonymous callers (registration)."""
+    if credentials is None:
+        return None
+    return get_current_user(credentials)
+
+
+def require_roles(*roles: str) -> Callable[..., AuthenticatedUser]:
+    """Dependency that only admits users whose role is one of `roles`."""
+
+    def check(user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
+        if user.role not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have access to this resource")
+        return user
+
+    return check
+
+
+# Only these may create roles or give a user anything but the default customer role
+role_managers_only = require_roles(*AUTH_ROLE_MANAGERS)
@@ -0,0 +1,192 @@
+import re
+import string
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from utils.metrics import metrics
+
+# Local parser for OCR correction messages typed in the CONFIRMING_* states,
+# e.g. "dob is 12/03/1990", "pincode 560001", "change name to Ravi Kumar".
+# Returns the updated data when every clause is understood and valid, and None
+# when the message is ambiguous so the caller can fall back to the LLM.
+
+FIELD_SYNONYMS: Dict[str, List[str]] = {
+    "name": ["full name", "name"],
+    "father_name": ["father's name", "fathers name", "father name", "father"],
+    "dob": ["date of birth", "birth date", "birthdate", "birthday", "dob"],
+    "gender": ["gender", "sex"],
+    "adhar_no": ["aadhaar number", "aadhar number", "adhar number", "aadhaar no", "aadhar no", "adhar no",
+                 "aadhaar", "aadhar", "adhar", "uid"],
+    "pan_no": ["pan number", "pan no", "pan card number", "pan"],
+    "address": ["address"],
+    "city": ["city", "town", "village"],
+    "district": ["district"],
+    "state": ["state"],
+    "pincode": ["pin code", "pincode", "postal code", "zip code", "pin", "zip"],
+}
+
+# Words that describe the problem rather than the new value ("name is wrong",
+# "my name spelling should be ..."); free-text values containing them are ambiguous
+META_WORDS = {"wrong", "incorrect", "correct", "missing", "empty", "blank", "different", "mistake", "right",
+              "spelling", "spelt", "spelled", "should", "not", "is", "it", "its", "it's", "instead", "but",
+              "actually", "please", "typo", "change", "update"}
+
+MONTHS = {m.lower(): i for i, m in enumerate(
+    ["January", "February", "March", "April", "May", "June", "July",
+     "August", "September", "October", "November", "December"], start=1)}
+MONTHS.update({name[:3]: number for name, number in list(MONTHS.items())})
+
+PAN_RE = re.compile(r"^[A-Z]{3}[ABCFGHJLPT][A-Z][0-9]{4}[A-Z]$")
+
+# Verhoeff tables
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6], [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8], [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2], [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4], [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2], [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 6, 8, 7, 0], [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5], [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+
+
+def verhoeff_valid(number: str) -> bool:
+    check = 0
+    for i, digit in enumerate(reversed(number)):
+        check = _VERHOEFF_D[check][_VERHOEFF_P[i % 8][int(digit)]]
+    return check == 0
+
+
+def parse_adhar_no(value: str) -> str | None:
+    digits = re.sub(r"[\s-]", "", value)
+    if not re.fullmatch(r"[2-9][0-9]{11}", digits) or not verhoeff_valid(digits):
+        return None
+    return digits
+
+
+def parse_pan_no(value: str) -> str | None:
+    pan = re.sub(r"\s", "", value).upper()
+    return pan if PAN_RE.match(pan) else None
+
+
+def parse_pincode(value: str) -> str | None:
+    pincode = re.sub(r"\s", "", value)
+    return pincode if re.fullmatch(r"[1-9][0-9]{5}", pincode) else None
+
+
+def parse_dob(value: str) -> str | None:
+    """Accepts DD/MM/YYYY (also - or . separated), YYYY-MM-DD and '12 march 1990'. Returns DD/MM/YYYY."""
+    value = value.strip().rstrip(".")
+
+    if match := re.fullmatch(r"(\d{1,2})[/\-.](\d{1,2})[/\-.](\d{4})", value):
+        day, month, year = (int(g) for g in match.groups())
+    elif match := re.fullmatch(r"(\d{4})-(\d{1,2})-(\d{1,2})", value):
+        year, month, day = (int(g) for g in match.groups())
+    elif (match := re.fullmatch(r"(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+),?\s+(\d{4})", value)) and match.group(2) in MONTHS:
+        day, month, year = int(match.group(1)), MONTHS[match.group(2)], int(match.group(3))
+    else:
+        return None
+
+    try:
+        parsed = datetime(year, month, day)
+    except ValueError:
+        return None
+    if not 1900 <= parsed.year <= datetime.now().year:
+        return None
+    return parsed.strftime("%d/%m/%Y")
+
+
+def parse_gender(value: str) -> str | None:
+    return {"male": "Male", "m": "Male", "female": "Female", "f": "Female",
+            "other": "Other", "transgender": "Other"}.get(value.strip())
+
+
+def _has_meta_words(value: str) -> bool:
+    return any(word in META_WORDS for word in re.findall(r"[a-z']+", value))
+
+
+def parse_text(value: str) -> str | None:
+    value = value.strip().strip("\"'").strip()
+    if not value or len(value.split()) > 5 or _has_meta_words(value) or any(ch.isdigit() for ch in value):
+        return None
+    return string.capwords(value)
+
+
+def parse_address(value: str) -> str | None:
+    value = value.strip().strip("\"'").strip()
+    if len(value) < 5 or _has_meta_words(value):
+        return None
+    return string.capwords(value)
+
+
+FIELD_PARSERS = {
+    "name": parse_text,
+    "father_name": parse_text,
+    "dob": parse_dob,
+    "gender": parse_gender,
+    "adhar_no": parse_adhar_no,
+    "pan_no": parse_pan_no,
+    "address": parse_address,
+    "city": parse_text,
+    "district": parse_text,
+    "state": parse_text,
+    "pincode": parse_pincode,
+}
+
+# The separator is captured, so split() alternates clause, separator, clause, ...
+_CLAUSE_SPLIT_RE = re.compile(r"\s*(,|;|\band\b|\balso\b)\s*(?=(?:change|update|set|correct|fix|my|the)?\s*(?:%s)\b)" %
+                              "|".join(re.escape(s) for syns in FIELD_SYNONYMS.values() for s in syns))
+_LEAD_RE = re.compile(r"^(?:please\s+)?(?:change|update|set|correct|fix|make)?\s*(?:my|the)?\s*")
+_CONNECTOR_RE = re.compile(r"^(?:\s*(?:is|was|=|:|to|should be|must be|as|->|it is|it's)\s*)?")
+
+
+def _match_clause(clause: str, fields: List[str]) -> Tuple[str, str] | None:
+    clause = _LEAD_RE.sub("", clause.strip())
+    # Longest synonym first so "father name" wins over "name" and "pin code" over "pin"
+    candidates = sorted(((syn, field) for field in fields for syn in FIELD_SYNONYMS[field]), key=lambda c: -len(c[0]))
+    for synonym, field in candidates:
+        if clause.startswith(synonym) and (len(clause) == len(synonym) or not clause[len(synonym)].isalnum()):
+            rest = clause[len(synonym):]
+            rest = re.sub(r"^\s*(?:number|no\.?)\b", "", rest) if field in ("adhar_no", "pan_no") else rest
+            value = _CONNECTOR_RE.sub("", rest, count=1)
+            return field, value.strip()
+    return None
+
+
+def parse_correction(current_data: Dict[str, Any], message: str) -> Dict[str, Any] | None:
+    """
+    Applies a correction message to current_data without the LLM.
+    Returns the complete updated dict, or None when the message is ambiguous.
+    """
+    fields = [field for field in current_data if field in FIELD_SYNONYMS]
+    message = message.strip().rstrip(".!")
+    if not message:
+        return None
+
+    updates: Dict[str, Any] = {}
+    parts = _CLAUSE_SPLIT_RE.split(message)
+    for index in range(0, len(parts), 2):
+        matched = _match_clause(parts[index], fields)
+        if matched is None:
+            metrics.incr("correction_parse_total", path="llm")
+            return None
+        field, raw_value = matched
+        # Addresses contain commas and words like "village" or "state bank", so a comma
+        # followed by a field name may still be part of the address
+        if field == "address" and index + 1 < len(parts) and parts[index + 1] == ",":
+            metrics.incr("correction_parse_total", path="llm")
+            return None
+        value = FIELD_PARSERS[field](raw_value)
+        if value is None or field in updates:
+            metrics.incr("correction_parse_total", path="llm")
+            return None
+        updates[field] = value
+
+    metrics.incr("correction_parse_total", path="local")
+    updated = dict(current_data)
+    updated.update(updates)
+    return updated
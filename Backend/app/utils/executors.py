@@ -0,0 +1,154 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from utils.metrics import metrics
+
+# Managed executors so async routes never run blocking KYC work on the event loop.
+# - cpu_executor: process pool for DeepFace work. Workers are spawned (TensorFlow is
+#   not fork-safe) and preload the face models in their initializer.
+# - io_executor: thread pool for blocking work such as image decoding and preprocessing.
+# Both have a bounded number of queued tasks (extra tasks are rejected, not queued
+# without limit) and a per-task timeout. A pool left broken by a dead worker (OOM,
+# native crash in DeepFace) is replaced, and the task is reported as busy so the
+# user is asked to retry.
+
+KYC_PROCESS_WORKERS = int(os.getenv("KYC_PROCESS_WORKERS", "2"))
+KYC_PROCESS_MAX_PENDING = int(os.getenv("KYC_PROCESS_MAX_PENDING", "8"))
+KYC_PROCESS_TIMEOUT = float(os.getenv("KYC_PROCESS_TIMEOUT", "60"))
+KYC_THREAD_WORKERS = int(os.getenv("KYC_THREAD_WORKERS", "16"))
+KYC_THREAD_MAX_PENDING = int(os.getenv("KYC_THREAD_MAX_PENDING", "64"))
+KYC_THREAD_TIMEOUT = float(os.getenv("KYC_THREAD_TIMEOUT", "30"))
+
+
+class ExecutorBusyError(RuntimeError):
+    """The executor queue is full (or its pool had to be restarted); the caller should ask the user to retry."""
+
+
+class ExecutorTimeoutError(TimeoutError):
+    """The task did not finish within its timeout."""
+
+
+class ManagedExecutor:
+    def __init__(self, name: str, factory: Callable[[], Executor], max_pending: int, timeout: float,
+                 on_restart: Callable[[], None] | None = None):
+        self.name = name
+        self._factory = factory
+        self._on_restart = on_restart
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory()
+            return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: float | None = None) -> Any:
+        """Runs fn(*args) in the pool. Raises ExecutorBusyError or ExecutorTimeoutError."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                metrics.incr("executor_rejected_total", pool=self.name)
+                raise ExecutorBusyError(f"{self.name} executor is busy")
+            self._pending += 1
+            metrics.gauge("executor_pending", self._pending, pool=self.name)
+
+        task_name = getattr(fn, "__name__", "task")
+        start = time.perf_counter()
+        executor = self.executor
+        try:
+            future = asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args))
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # Process tasks can't be interrupted; the worker finishes in the background
+            metrics.incr("executor_timeout_total", pool=self.name, task=task_name)
+            raise ExecutorTimeoutError(f"{task_name} timed out in the {self.name} executor")
+        except BrokenExecutor as e:
+            # A broken pool rejects every later task, so it is replaced rather than reused
+            metrics.incr("executor_broken_total", pool=self.name, task=task_name)
+            self._replace(executor, e)
+            raise ExecutorBusyError(f"{self.name} executor was restarted")
+        finally:
+            metrics.observe("executor_task_seconds", time.perf_counter() - start, pool=self.name, task=task_name)
+            with self._lock:
+                self._pending -= 1
+                metrics.gauge("executor_pending", self._pending, pool=self.name)
+
+    def _replace(self, broken: Executor, error: Exception):
+        with self._lock:
+            # Tasks that failed together replace the pool once
+            if self._executor is not broken:
+                return
+            self._executor = None
+        print(f"{self.name} executor broken ({error}), starting a new pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+        if self._on_restart is not None:
+            self._on_restart()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def _process_pool() -> Executor:
+    from utils.verification import init_worker
+    return ProcessPoolExecutor(
+        max_workers=KYC_PROCESS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    )
+
+
+def _thread_pool() -> Executor:
+    return ThreadPoolExecutor(max_workers=KYC_THREAD_WORKERS, thread_name_prefix="kyc-io")
+
+
+# A replaced process pool loads the face models again before taking requests
+cpu_executor = ManagedExecutor("cpu", _process_pool, KYC_PROCESS_MAX_PENDING, KYC_PROCESS_TIMEOUT,
+                               on_restart=lambda: start_warm_up())
+io_executor = ManagedExecutor("io", _thread_pool, KYC_THREAD_MAX_PENDING, KYC_THREAD_TIMEOUT)
+
+
+def warm_up_process_pool(started_at: float | None = None):
+    """
+    Starts the process pool workers (each loads the face models in its initializer)
+    and marks the face models ready once every worker has answered.
+    """
+    from utils import verification
+
+    verification.warmup_status["state"] = "warming"
+    start = time.perf_counter()
+    try:
+        futures = [cpu_executor.executor.submit(verification.warm_up) for _ in range(KYC_PROCESS_WORKERS)]
+        states = [future.result() for future in futures]
+        verification.warmup_status["state"] = "ready" if all(state == "ready" for state in states) else "failed"
+        metrics.gauge("face_model_warmup_seconds", time.perf_counter() - start)
+        if started_at is not None:
+            metrics.gauge("app_cold_start_seconds", time.perf_counter() - started_at)
+        print(f"Process pool warmed up: {states}")
+    except Exception as e:
+        verification.warmup_status["state"] = "failed"
+        verification.warmup_status["error"] = str(e)
+        print(f"Process pool warm-up failed: {e}")
+    finally:
+        verification.face_models_ready.set()
+
+
+def start_warm_up(started_at: float | None = None):
+    threading.Thread(target=warm_up_process_pool, args=(started_at,), name="kyc-warmup", daemon=True).start()
+
+
+def shutdown():
+    cpu_executor.shutdown()
+    io_executor.shutdown()
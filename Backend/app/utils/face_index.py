@@ -0,0 +1,172 @@
+import json
+import os
+import sys
+import threading
+from typing import List, Tuple
+
+import numpy as np
+
+from utils.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within one process
+    fcntl = None
+
+# Store of approved applicants' face embeddings for duplicate-identity checks.
+# Embeddings are L2-normalised float32 vectors appended to a raw matrix file
+# (face_index.f32) that is memory-mapped for search; the matching application
+# and Adhar numbers are appended to face_index.jsonl in the same order. A
+# similarity scan over the whole matrix is a single matrix-vector product.
+# Appends hold an exclusive lock on the keys file and take the row count from
+# it, so several threads or API workers can add to the same files; each worker
+# reloads before searching once the keys file has grown.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+FACE_INDEX_DIR = os.getenv("FACE_INDEX_DIR", os.path.join(DATA_DIR, "face_index"))
+# Cosine similarity at or above which two applicants are treated as the same person
+FACE_DUPLICATE_THRESHOLD = float(os.getenv("FACE_DUPLICATE_THRESHOLD", "0.70"))
+# Must match FACE_MODEL_NAME (512 for Facenet512, 128 for Facenet/SFace, 4096 for VGG-Face)
+EMBEDDING_DIM = int(os.getenv("FACE_EMBEDDING_DIM", "512"))
+
+
+class FaceIndex:
+    def __init__(self, index_dir: str = FACE_INDEX_DIR, threshold: float = FACE_DUPLICATE_THRESHOLD,
+                 dim: int = EMBEDDING_DIM):
+        self.index_dir = index_dir
+        self.threshold = threshold
+        self.dim = dim
+        self.matrix: np.ndarray = np.zeros((0, dim), dtype=np.float32)
+        self.keys: List[Tuple[str, str]] = []  # (application_no, adhar_no) per row
+        self._loaded = False
+        self._keys_size = 0  # size of the keys file when it was last loaded
+        self._lock = threading.Lock()
+
+    @property
+    def matrix_path(self) -> str:
+        return os.path.join(self.index_dir, "face_index.f32")
+
+    @property
+    def keys_path(self) -> str:
+        return os.path.join(self.index_dir, "face_index.jsonl")
+
+    def load(self):
+        """Memory-maps the embedding matrix. Rows without a key (interrupted append) are ignored."""
+        with self._lock:
+            self._load_locked()
+        print(f"Face index loaded: {len(self.keys)} embeddings")
+
+    def _load_locked(self):
+        keys: List[Tuple[str, str]] = []
+        keys_size = 0
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path) as f:
+                content = f.read()
+            keys_size = len(content.encode())
+            # A line without its newline is an append still in progress
+            keys = [tuple(json.loads(line)) for line in content.split("\n")[:-1] if line.strip()]
+
+        rows = 0
+        if os.path.exists(self.matrix_path):
+            rows = os.path.getsize(self.matrix_path) // (self.dim * 4)
+        rows = min(rows, len(keys))
+
+        if rows:
+            self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        else:
+            self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self.keys = keys[:rows]
+        self._keys_size = keys_size
+        self._loaded = True
+        metrics.gauge("face_index_size", rows)
+
+    def _stale(self) -> bool:
+        """True once another thread or worker has appended to the index files."""
+        try:
+            return os.path.getsize(self.keys_path) != self._keys_size
+        except OSError:
+            return False
+
+    def add(self, application_no: str, adhar_no: str, embedding: np.ndarray):
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(self.keys_path, "a+") as keys_file:
+                # Held until the keys file is closed; other workers append to the same files
+                if fcntl is not None:
+                    fcntl.flock(keys_file, fcntl.LOCK_EX)
+                keys_file.seek(0)
+                content = keys_file.read()
+                rows = content.count("\n")
+                # Drop a key line cut short by an interrupted append
+                if not content.endswith("\n"):
+                    keys_file.truncate(len(content[:content.rfind("\n") + 1].encode()))
+                # Truncate any partial row left by an interrupted append before adding the new one
+                with open(self.matrix_path, "ab") as f:
+                    f.truncate(rows * self.dim * 4)
+                    f.write(embedding.tobytes())
+                keys_file.write(json.dumps([str(application_no), adhar_no]) + "\n")
+            self._load_locked()
+
+    def search(self, embedding: np.ndarray, k: int = 5) -> List[Tuple[str, str, float]]:
+        """Returns up to k (application_no, adhar_no, similarity) tuples, best first."""
+        with self._lock:
+            if not self._loaded or self._stale():
+                self._load_locked()
+            matrix, keys = self.matrix, self.keys
+        if not keys:
+            return []
+        scores = matrix @ np.asarray(embedding, dtype=np.float32)
+        k = min(k, len(keys))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(keys[i][0], keys[i][1], float(scores[i])) for i in top]
+
+    def find_duplicate(self, embedding: np.ndarray, adhar_no: str) -> Tuple[str, float] | None:
+        """
+        Returns (application_no, similarity) of an approved applicant with the same face
+        but a different Adhar number, or None.
+        """
+        for application_no, other_adhar_no, similarity in self.search(embedding):
+            if similarity < self.threshold:
+                break
+            if other_adhar_no != adhar_no:
+                metrics.incr("face_duplicate_total")
+                return application_no, similarity
+        return None
+
+
+face_index = FaceIndex()
+
+
+def rebuild_from_database() -> int:
+    """Rewrites the index from approved applications that have a stored embedding."""
+    from database import SessionLocal
+    from models import ApplicationTable
+
+    db = SessionLocal()
+    try:
+        applications = db.query(ApplicationTable.application_no, ApplicationTable.adhar_card_no,
+                                 ApplicationTable.face_embedding).filter(
+            ApplicationTable.application_status == "approved",
+            ApplicationTable.face_embedding.isnot(None)
+        ).all()
+    finally:
+        db.close()
+
+    os.makedirs(face_index.index_dir, exist_ok=True)
+    with open(face_index.matrix_path, "wb") as matrix_file, open(face_index.keys_path, "w") as keys_file:
+        for application_no, adhar_no, embedding in applications:
+            matrix_file.write(embedding)
+            keys_file.write(json.dumps([str(application_no), adhar_no]) + "\n")
+    face_index.load()
+    return len(applications)
+
+
+if __name__ == "__main__":
+    # Rebuild after restoring the database or losing the index files:
+    #   python -m utils.face_index rebuild
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        print(f"Indexed {rebuild_from_database()} approved applicants")
+    else:
+        face_index.load()
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+import numpy as np
+
+from utils.metrics import metrics
+
+# Semantic cache of vetted answers for general banking questions.
+# Questions are embedded with a hashed word/char n-gram vectorizer (CPU only, no
+# model download) and matched with a cosine similarity scan over a float32
+# matrix that is memory-mapped from disk. Misses are appended to a review queue;
+# reviewed entries are added to data/faq.json and the index is rebuilt.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+FAQ_SOURCE_PATH = os.getenv("FAQ_SOURCE_PATH", os.path.join(DATA_DIR, "faq.json"))
+FAQ_INDEX_DIR = os.getenv("FAQ_INDEX_DIR", DATA_DIR)
+FAQ_REVIEW_PATH = os.getenv("FAQ_REVIEW_PATH", os.path.join(DATA_DIR, "faq_review_queue.jsonl"))
+FAQ_SIMILARITY_THRESHOLD = float(os.getenv("FAQ_SIMILARITY_THRESHOLD", "0.65"))
+FAQ_VECTOR_DIM = 4096
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _features(text: str) -> List[str]:
+    words = _TOKEN_RE.findall(text.lower())
+    features = [f"w:{w}" for w in words]
+    features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return features
+
+
+def vectorize(text: str, dim: int = FAQ_VECTOR_DIM) -> np.ndarray:
+    """Hashed n-gram embedding, L2-normalised float32 vector."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in _features(text):
+        h = zlib.crc32(feature.encode())
+        # Word features carry more meaning than character trigrams
+        weight = 0.5 if feature.startswith("c:") else 1.0
+        vector[h % dim] += weight if (h >> 31) & 1 else -weight
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def _source_fingerprint(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_index(source_path: str = FAQ_SOURCE_PATH, index_dir: str = FAQ_INDEX_DIR) -> int:
+    """Embeds every question variant in the FAQ source and writes the index files. Returns row count."""
+    with open(source_path) as f:
+        entries = json.load(f)
+
+    rows: List[np.ndarray] = []
+    answer_ids: List[int] = []
+    for entry_id, entry in enumerate(entries):
+        for question in entry["questions"]:
+            rows.append(vectorize(question))
+            answer_ids.append(entry_id)
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "faq_index.npy"), np.vstack(rows).astype(np.float32))
+    with open(os.path.join(index_dir, "faq_index.json"), "w") as f:
+        json.dump({
+            "fingerprint": _source_fingerprint(source_path),
+            "answer_ids": answer_ids,
+            "answers": [entry["answer"] for entry in entries],
+        }, f)
+    print(f"FAQ index built with {len(rows)} questions")
+    return len(rows)
+
+
+class FAQCache:
+    def __init__(self, source_path: str = FAQ_SOURCE_PATH, index_dir: str = FAQ_INDEX_DIR,
+                 threshold: float = FAQ_SIMILARITY_THRESHOLD):
+        self.source_path = source_path
+        self.index_dir = index_dir
+        self.threshold = threshold
+        self.matrix: np.ndarray | None = None
+        self.answer_ids: List[int] = []
+        self.answers: List[str] = []
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Loads the index as a memory-mapped array, rebuilding it first if the FAQ source changed."""
+        matrix_path = os.path.join(self.index_dir, "faq_index.npy")
+        meta_path = os.path.join(self.index_dir, "faq_index.json")
+
+        stale = not (os.path.exists(matrix_path) and os.path.exists(meta_path))
+        if not stale:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            stale = meta.get("fingerprint") != _source_fingerprint(self.source_path)
+        if stale:
+            build_index(self.source_path, self.index_dir)
+            with open(meta_path) as f:
+                meta = json.load(f)
+
+        with self._lock:
+            self.matrix = np.load(matrix_path, mmap_mode="r")
+            self.answer_ids = meta["answer_ids"]
+            self.answers = meta["answers"]
+        print(f"FAQ cache loaded: {len(self.answer_ids)} questions, {len(self.answers)} answers")
+
+    def search(self, message: str) -> Tuple[str | None, float]:
+        if self.matrix is None:
+            self.load()
+        scores = self.matrix @ vectorize(message)
+        best = int(np.argmax(scores))
+        return self.answers[self.answer_ids[best]], float(scores[best])
+
+    def lookup(self, message: str) -> str | None:
+        """Returns a vetted answer if the message is close enough to a known question."""
+        try:
+            answer, score = self.search(message)
+        except Exception as e:
+            print(f"FAQ cache lookup failed: {e}")
+            return None
+
+        if score >= self.threshold:
+            metrics.incr("faq_cache_total", result="hit")
+            return answer
+
+        metrics.incr("faq_cache_total", result="miss")
+        self._record_miss(message, score)
+        return None
+
+    def _record_miss(self, message: str, score: float):
+        try:
+            with open(FAQ_REVIEW_PATH, "a") as f:
+                f.write(json.dumps({
+                    "message": message,
+                    "best_score": round(score, 3),
+                    "at": datetime.now(timezone.utc).isoformat(),
+                }) + "\n")
+        except OSError as e:
+            print(f"Could not record FAQ miss: {e}")
+
+
+faq_cache = FAQCache()
+
+
+if __name__ == "__main__":
+    # Rebuild after adding reviewed entries to data/faq.json:
+    #   python -m utils.faq_cache build
+    #   python -m utils.faq_cache query "what documents do i need"
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        answer, score = faq_cache.search(" ".join(sys.argv[2:]))
+        print(f"score={score:.3f} threshold={faq_cache.threshold}\n{answer}")
+    else:
+        build_index()
@@ -0,0 +1,127 @@
+import hashlib
+import math
+import os
+import threading
+from typing import Dict, Iterable
+
+from utils.metrics import metrics
+
+# In-process Bloom filters of the Adhar and PAN numbers the bank already knows
+# (applications plus registered customers), so duplicate checks on upload only
+# query the database when a number might have been seen. A miss is definite; a
+# hit is a false positive with probability ~KNOWN_IDS_FPR while the filter holds
+# at most KNOWN_IDS_CAPACITY numbers, and degrades gracefully beyond that.
+# Until the filters are loaded every lookup reports a possible hit, so callers
+# fall back to the database.
+#
+# The filters assume a single API process: numbers are added only in the worker
+# that saved them, so with several workers another worker's filter would report
+# a definite miss for them and skip the duplicate check. When WEB_CONCURRENCY is
+# above 1 the filters are therefore never loaded and every lookup goes to the
+# database; KNOWN_IDS_ENABLED overrides the choice either way.
+
+KNOWN_IDS_CAPACITY = int(os.getenv("KNOWN_IDS_CAPACITY", "1000000"))
+KNOWN_IDS_FPR = float(os.getenv("KNOWN_IDS_FPR", "0.01"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+KNOWN_IDS_ENABLED = os.getenv("KNOWN_IDS_ENABLED", "true" if WEB_CONCURRENCY <= 1 else "false").lower() == "true"
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, fpr: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(fpr) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: str) -> Iterable[int]:
+        # Double hashing: k positions from two independent 64-bit halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def estimated_fpr(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def stats(self) -> Dict[str, float]:
+        return {"items": self.count, "bytes": len(self.bits), "hashes": self.hashes,
+                "estimated_fpr": self.estimated_fpr()}
+
+
+class IdentityFilter:
+    def __init__(self, capacity: int = KNOWN_IDS_CAPACITY, fpr: float = KNOWN_IDS_FPR, enabled: bool = KNOWN_IDS_ENABLED):
+        self.capacity = capacity
+        self.fpr = fpr
+        self.enabled = enabled
+        self.filters = {"adhar": BloomFilter(capacity, fpr), "pan": BloomFilter(capacity, fpr)}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, db):
+        """Builds both filters from applications and issued Adhar/PAN details, then swaps them in."""
+        from models import AdharDetails, ApplicationTable, PanDetails
+
+        if not self.enabled:
+            print("Identity filter disabled (several workers), duplicate checks use the database")
+            return
+
+        adhar_nos = {row[0] for row in db.query(ApplicationTable.adhar_card_no).yield_per(10000) if row[0]}
+        adhar_nos |= {row[0] for row in db.query(AdharDetails.adhar_no).yield_per(10000) if row[0]}
+        pan_nos = {row[0] for row in db.query(ApplicationTable.pan_card_no).yield_per(10000) if row[0]}
+        pan_nos |= {row[0] for row in db.query(PanDetails.pan_no).yield_per(10000) if row[0]}
+
+        # Leave room to grow so the false positive rate holds until the next restart
+        capacity = max(self.capacity, 2 * max(len(adhar_nos), len(pan_nos)))
+        filters = {"adhar": BloomFilter(capacity, self.fpr), "pan": BloomFilter(capacity, self.fpr)}
+        for value in adhar_nos:
+            filters["adhar"].add(value)
+        for value in pan_nos:
+            filters["pan"].add(value)
+
+        with self._lock:
+            self.filters = filters
+            self._loaded = True
+        self._record_stats()
+        print(f"Identity filter loaded: {len(adhar_nos)} Adhar, {len(pan_nos)} PAN numbers")
+
+    def add(self, adhar_no: str | None = None, pan_no: str | None = None):
+        with self._lock:
+            if adhar_no:
+                self.filters["adhar"].add(adhar_no)
+            if pan_no:
+                self.filters["pan"].add(pan_no)
+        self._record_stats()
+
+    def might_contain(self, kind: str, value: str) -> bool:
+        """False means the number is definitely unknown; True means the database has to be asked."""
+        if not self._loaded:
+            return True
+        seen = value in self.filters[kind]
+        metrics.incr("identity_filter_checks_total", kind=kind, result="maybe" if seen else "miss")
+        return seen
+
+    def might_have_adhar(self, adhar_no: str) -> bool:
+        return self.might_contain("adhar", adhar_no)
+
+    def might_have_pan(self, pan_no: str) -> bool:
+        return self.might_contain("pan", pan_no)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {kind: bloom.stats() for kind, bloom in self.filters.items()}
+
+    def _record_stats(self):
+        for kind, stats in self.stats().items():
+            for name, value in stats.items():
+                metrics.gauge(f"identity_filter_{name}", value, kind=kind)
+
+
+identity_filter = IdentityFilter()
@@ -0,0 +1,124 @@
+import io
+import os
+from typing import Tuple
+
+from PIL import Image, ImageFilter, ImageOps, ImageStat
+
+# Pillow preprocessing applied to ID card photos before they are sent to Gemini:
+# EXIF orientation, downsampling, crop to the card region and compact re-encoding.
+# Images that are clearly too blurry or flat are rejected locally, before any
+# network call.
+
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "1280"))
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "80"))
+OCR_MIN_SHARPNESS = float(os.getenv("OCR_MIN_SHARPNESS", "200"))
+OCR_MIN_CONTRAST = float(os.getenv("OCR_MIN_CONTRAST", "20"))
+
+# Quality checks and card detection run on a small copy so thresholds don't depend on resolution
+ANALYSIS_SIDE = 512
+CARD_MIN_AREA_RATIO = 0.2
+CARD_MARGIN_RATIO = 0.03
+
+
+class ImageQualityError(ValueError):
+    """The image is too blurry or has too little contrast to be read."""
+
+
+class PreparedImage:
+    def __init__(self, data: bytes, mime_type: str, size: Tuple[int, int], original_bytes: int):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.original_bytes = original_bytes
+
+    def as_blob(self) -> dict:
+        """Inline image part accepted by generate_content."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def sharpness(gray: Image.Image) -> float:
+    """Variance of the Laplacian; low values mean a blurry image."""
+    laplacian = gray.filter(ImageFilter.Kernel((3, 3), [0, 1, 0, 1, -4, 1, 0, 1, 0], scale=1, offset=128))
+    return ImageStat.Stat(laplacian).var[0]
+
+
+def contrast(gray: Image.Image) -> float:
+    return ImageStat.Stat(gray).stddev[0]
+
+
+def detect_card_box(image: Image.Image) -> Tuple[int, int, int, int] | None:
+    """
+    Finds the bounding box of the edge-dense region (the card) on a small copy.
+    Returns None when no clear card region is found, so the image is kept whole.
+    """
+    small = image.copy()
+    small.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE))
+    edges = small.convert("L").filter(ImageFilter.FIND_EDGES)
+    mask = edges.point(lambda value: 255 if value > 40 else 0).filter(ImageFilter.MedianFilter(5))
+    box = mask.getbbox()
+    if box is None:
+        return None
+
+    scale_x = image.width / small.width
+    scale_y = image.height / small.height
+    left, top, right, bottom = box
+    margin_x = int((right - left) * CARD_MARGIN_RATIO)
+    margin_y = int((bottom - top) * CARD_MARGIN_RATIO)
+    box = (
+        max(0, int((left - margin_x) * scale_x)),
+        max(0, int((top - margin_y) * scale_y)),
+        min(image.width, int((right + margin_x) * scale_x)),
+        min(image.height, int((bottom + margin_y) * scale_y)),
+    )
+
+    area_ratio = ((box[2] - box[0]) * (box[3] - box[1])) / (image.width * image.height)
+    if area_ratio < CARD_MIN_AREA_RATIO or area_ratio > 0.95:
+        return None
+    return box
+
+
+def check_quality(image: Image.Image):
+    gray = image.convert("L")
+    gray.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE))
+    if contrast(gray) < OCR_MIN_CONTRAST:
+        raise ImageQualityError("The image is too dark or washed out.")
+    if sharpness(gray) < OCR_MIN_SHARPNESS:
+        raise ImageQualityError("The image looks blurry.")
+
+
+def preprocess_for_ocr(image_bytes: bytes) -> PreparedImage:
+    """
+    Normalises an uploaded ID card photo for OCR.
+    Raises ImageQualityError for images that are too blurry or low-contrast.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    # Let the JPEG decoder downscale while decoding when the photo is much larger than needed
+    image.draft("RGB", (OCR_MAX_SIDE, OCR_MAX_SIDE))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    image.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
+
+    box = detect_card_box(image)
+    if box is not None:
+        image = image.crop(box)
+
+    check_quality(image)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    return PreparedImage(buffer.getvalue(), "image/jpeg", image.size, len(image_bytes))
+
+
+def downscale(image_bytes: bytes, max_side: int = OCR_MAX_SIDE) -> bytes:
+    """Smaller JPEG copy of an uploaded photo (orientation applied), enough for OCR and face matching."""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("RGB", (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
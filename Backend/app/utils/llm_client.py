@@ -0,0 +1,334 @@
+import asyncio
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List
+
+from utils.llm_scheduler import AdmissionScheduler, QueueBudgetExceeded
+
+# Process-wide async Gemini client.
+# All LLM calls run on one background event loop so that sync routes (threadpool)
+# and async routes (uvicorn loop) share the same model handles, concurrency limit
+# and circuit breaker.
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+
+class LLMError(Exception):
+    """Base error for failed LLM calls."""
+
+
+class LLMTimeoutError(LLMError):
+    """The call did not finish within its deadline."""
+
+
+class LLMUnavailableError(LLMError):
+    """The circuit breaker is open, the call was not attempted."""
+
+
+class LLMShedError(LLMError):
+    """The call was shed by admission control after exceeding its queue budget."""
+
+
+class GeminiTransport:
+    """Talks to Gemini through google-generativeai, reusing one model handle per model name."""
+
+    def __init__(self, api_key: str | None = GEMINI_API_KEY):
+        import google.generativeai as genai
+
+        self._genai = genai
+        if api_key:
+            genai.configure(api_key=api_key)
+        else:
+            print("WARNING: GEMINI_API_KEY not set in environment variables")
+        self._models: Dict[str, Any] = {}
+
+        try:
+            from google.api_core import exceptions as google_exceptions
+            self._transient_errors = (
+                google_exceptions.ServiceUnavailable,
+                google_exceptions.TooManyRequests,
+                google_exceptions.InternalServerError,
+                google_exceptions.DeadlineExceeded,
+                ConnectionError,
+            )
+        except ImportError:
+            self._transient_errors = (ConnectionError,)
+
+    def _model(self, model_name: str):
+        if model_name not in self._models:
+            self._models[model_name] = self._genai.GenerativeModel(model_name)
+        return self._models[model_name]
+
+    async def generate(self, model_name: str, contents: Any) -> str:
+        response = await self._model(model_name).generate_content_async(contents)
+        return response.text
+
+    async def stream(self, model_name: str, contents: Any) -> AsyncIterator[str]:
+        response = await self._model(model_name).generate_content_async(contents, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def is_transient(self, error: Exception) -> bool:
+        return isinstance(error, self._transient_errors)
+
+
+class FakeTransport:
+    """
+    Local stand-in for tests and offline development.
+    `responder` maps the call contents to the reply text; `failures` makes the
+    first N calls raise a transient ConnectionError.
+    """
+
+    def __init__(self, responder: Callable[[Any], str] | None = None, latency: float = 0.0, failures: int = 0):
+        self.responder = responder or (lambda contents: "{}")
+        self.latency = latency
+        self.failures = failures
+        self.calls: List[Any] = []
+
+    async def generate(self, model_name: str, contents: Any) -> str:
+        self.calls.append(contents)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("fake transient failure")
+        return self.responder(contents)
+
+    async def stream(self, model_name: str, contents: Any) -> AsyncIterator[str]:
+        text = await self.generate(model_name, contents)
+        for word in text.split(" "):
+            yield word + " "
+
+    def is_transient(self, error: Exception) -> bool:
+        return isinstance(error, ConnectionError)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive transient failures and fails fast until
+    `reset_seconds` have passed, then lets a single probe call through.
+    """
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release_probe(self):
+        """Ends a half-open probe that proved nothing either way (non-transient error, cancellation)."""
+        with self._lock:
+            self.probing = False
+
+
+class LLMClient:
+    def __init__(self, transport=None, max_concurrency: int = LLM_MAX_CONCURRENCY, breaker: CircuitBreaker | None = None,
+                 scheduler: AdmissionScheduler | None = None):
+        self._transport = transport
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker or CircuitBreaker()
+        self.scheduler = scheduler or AdmissionScheduler()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = GeminiTransport()
+        return self._transport
+
+    def set_transport(self, transport):
+        self._transport = transport
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._loop = loop
+            return self._loop
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+    def _wrap_error(self, error: Exception) -> LLMError:
+        if isinstance(error, LLMError):
+            return error
+        if isinstance(error, QueueBudgetExceeded):
+            return LLMShedError(str(error))
+        if isinstance(error, TimeoutError):
+            return LLMTimeoutError("LLM call timed out")
+        return LLMError(f"{type(error).__name__}: {error}")
+
+    async def _admit(self, priority: str):
+        try:
+            await self.scheduler.admit(priority)
+        except QueueBudgetExceeded as e:
+            raise LLMShedError(str(e)) from e
+
+    async def _call(self, contents: Any, model_name: str, timeout: float, retries: int, priority: str) -> str:
+        for attempt in range(retries + 1):
+            # Admission first: a call shed while queued must not hold the half-open probe.
+            # The read-only state check keeps failing fast while the breaker is open.
+            if self.breaker.state == "open":
+                raise LLMUnavailableError("LLM circuit breaker is open")
+            await self._admit(priority)
+            if not self.breaker.allow():
+                raise LLMUnavailableError("LLM circuit breaker is open")
+            recorded = False
+            try:
+                async with self._semaphore:
+                    async with asyncio.timeout(timeout):
+                        text = await self.transport.generate(model_name, contents)
+                self.breaker.record_success()
+                recorded = True
+                return text
+            except Exception as e:
+                transient = isinstance(e, TimeoutError) or self.transport.is_transient(e)
+                if not transient:
+                    raise self._wrap_error(e) from e
+                self.breaker.record_failure()
+                recorded = True
+                print(f"LLM call failed (attempt {attempt + 1}/{retries + 1}): {type(e).__name__}: {e}")
+                if attempt == retries:
+                    raise self._wrap_error(e) from e
+            finally:
+                # Otherwise a half-open probe would stay claimed and the breaker never close
+                if not recorded:
+                    self.breaker.release_probe()
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def _stream(self, contents: Any, model_name: str, timeout: float, retries: int, priority: str, out: queue.Queue):
+        # Retries are only attempted before the first chunk has been delivered
+        try:
+            for attempt in range(retries + 1):
+                if self.breaker.state == "open":
+                    raise LLMUnavailableError("LLM circuit breaker is open")
+                await self._admit(priority)
+                if not self.breaker.allow():
+                    raise LLMUnavailableError("LLM circuit breaker is open")
+                delivered = False
+                recorded = False
+                try:
+                    async with self._semaphore:
+                        async with asyncio.timeout(timeout):
+                            async for chunk in self.transport.stream(model_name, contents):
+                                delivered = True
+                                out.put(chunk)
+                    self.breaker.record_success()
+                    recorded = True
+                    return
+                except Exception as e:
+                    transient = isinstance(e, TimeoutError) or self.transport.is_transient(e)
+                    if not transient:
+                        raise self._wrap_error(e) from e
+                    self.breaker.record_failure()
+                    recorded = True
+                    if delivered or attempt == retries:
+                        raise self._wrap_error(e) from e
+                finally:
+                    if not recorded:
+                        self.breaker.release_probe()
+                await asyncio.sleep(self._backoff(attempt))
+        except Exception as e:
+            out.put(self._wrap_error(e))
+        finally:
+            out.put(None)
+
+    async def generate(self, contents: Any, model_name: str = GEMINI_MODEL_NAME,
+                       timeout: float = LLM_TIMEOUT_SECONDS, retries: int = LLM_MAX_RETRIES,
+                       priority: str = "chat") -> str:
+        """Awaitable from any event loop. Raises LLMError subclasses on failure."""
+        future = asyncio.run_coroutine_threadsafe(
+            self._call(contents, model_name, timeout, retries, priority), self._ensure_loop()
+        )
+        return await asyncio.wrap_future(future)
+
+    def generate_sync(self, contents: Any, model_name: str = GEMINI_MODEL_NAME,
+                      timeout: float = LLM_TIMEOUT_SECONDS, retries: int = LLM_MAX_RETRIES,
+                       priority: str = "chat") -> str:
+        """Blocking variant for sync routes running in the threadpool."""
+        future = asyncio.run_coroutine_threadsafe(
+            self._call(contents, model_name, timeout, retries, priority), self._ensure_loop()
+        )
+        return future.result()
+
+    def stream_sync(self, contents: Any, model_name: str = GEMINI_MODEL_NAME,
+                    timeout: float = LLM_TIMEOUT_SECONDS, retries: int = LLM_MAX_RETRIES,
+                       priority: str = "chat") -> Iterator[str]:
+        """Blocking iterator over streamed text chunks."""
+        out: queue.Queue = queue.Queue()
+        asyncio.run_coroutine_threadsafe(
+            self._stream(contents, model_name, timeout, retries, priority, out), self._ensure_loop()
+        )
+        while True:
+            item = out.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+llm_client = LLMClient(transport=FakeTransport() if os.getenv("LLM_TRANSPORT") == "fake" else None)
+
+
+def parse_json_response(text: str) -> Any:
+    """Strips markdown code fences from a model reply and parses it as JSON."""
+    json_text = text.strip()
+    if json_text.startswith("```json"):
+        json_text = json_text[7:]
+    if json_text.startswith("```"):
+        json_text = json_text[3:]
+    if json_text.endswith("```"):
+        json_text = json_text[:-3]
+    return json.loads(json_text.strip())
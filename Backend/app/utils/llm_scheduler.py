@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List
+
+from utils.metrics import metrics
+
+# Priority admission control in front of every LLM call.
+# Waiting calls are ordered by class priority (lower runs first), a global token
+# bucket sized to our Gemini quota paces admissions, and classes with a queue
+# budget are shed once they have waited longer than that budget.
+
+# class name -> priority
+PRIORITY_CLASSES: Dict[str, int] = {
+    "kyc": 0,         # document extraction, blocks onboarding
+    "correction": 1,  # OCR corrections in the CONFIRMING_* states
+    "chat": 2,        # free-form query engine fallback
+}
+
+# class name -> max seconds in queue before the call is shed (None = never shed)
+QUEUE_BUDGETS: Dict[str, float | None] = {
+    "kyc": None,
+    "correction": float(os.getenv("LLM_CORRECTION_QUEUE_BUDGET", "20")),
+    "chat": float(os.getenv("LLM_CHAT_QUEUE_BUDGET", "5")),
+}
+
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "60"))
+LLM_BURST = float(os.getenv("LLM_BURST", "10"))
+
+
+class QueueBudgetExceeded(Exception):
+    """The call waited longer than its class budget and was dropped."""
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is now), without taking it."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def try_take(self) -> float:
+        """Takes one token and returns 0, or returns the seconds until one is available."""
+        wait = self.wait_time()
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+
+class AdmissionScheduler:
+    """
+    Must be used from a single event loop (the LLM client loop).
+    """
+
+    def __init__(self, bucket: TokenBucket | None = None, budgets: Dict[str, float | None] | None = None):
+        self.bucket = bucket or TokenBucket(LLM_RATE_PER_MINUTE / 60.0, LLM_BURST)
+        self.budgets = budgets if budgets is not None else QUEUE_BUDGETS
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def admit(self, priority_class: str):
+        """Waits until the call may proceed. Raises QueueBudgetExceeded if it was shed."""
+        if priority_class not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown LLM priority class: {priority_class}")
+        self._ensure_dispatcher()
+
+        enqueued_at = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (PRIORITY_CLASSES[priority_class], next(self._seq), enqueued_at, priority_class, waiter))
+        metrics.gauge("llm_queue_depth", self._depth(priority_class), cls=priority_class)
+        self._wakeup.set()
+
+        try:
+            await waiter
+        finally:
+            waited = time.monotonic() - enqueued_at
+            metrics.observe("llm_queue_wait_seconds", waited, cls=priority_class)
+            metrics.gauge("llm_queue_depth", self._depth(priority_class), cls=priority_class)
+
+    def _depth(self, priority_class: str) -> int:
+        return sum(1 for item in self._queue if item[3] == priority_class and not item[4].done())
+
+    def _shed_expired(self) -> float | None:
+        """Sheds waiters over budget and returns the seconds until the next budget expires."""
+        now = time.monotonic()
+        next_expiry = None
+        kept = []
+        for item in self._queue:
+            _, _, enqueued_at, priority_class, waiter = item
+            if waiter.done():
+                continue
+            budget = self.budgets.get(priority_class)
+            if budget is not None:
+                remaining = enqueued_at + budget - now
+                if remaining <= 0:
+                    waiter.set_exception(QueueBudgetExceeded(f"{priority_class} call shed after {now - enqueued_at:.1f}s in queue"))
+                    metrics.incr("llm_shed_total", cls=priority_class)
+                    continue
+                next_expiry = remaining if next_expiry is None else min(next_expiry, remaining)
+            kept.append(item)
+        if len(kept) != len(self._queue):
+            heapq.heapify(kept)
+            self._queue = kept
+        return next_expiry
+
+    async def _dispatch(self):
+        while True:
+            next_expiry = self._shed_expired()
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            wait = self.bucket.try_take()
+            if wait == 0:
+                _, _, _, priority_class, waiter = heapq.heappop(self._queue)
+                if waiter.done():
+                    # Cancelled by its caller; give the token back
+                    self.bucket.tokens += 1
+                else:
+                    waiter.set_result(None)
+                    metrics.incr("llm_admitted_total", cls=priority_class)
+                continue
+
+            if next_expiry is not None:
+                wait = min(wait, next_expiry)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
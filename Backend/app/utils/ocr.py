@@ -1,18 +1,23 @@
-import google.generativeai as genai
-from PIL import Image
-import io
 import json
-import os
 from typing import Optional, Dict, Any
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
-    print("WARNING: GEMINI_API_KEY not set in environment variables")
+from utils.llm_client import llm_client, parse_json_response, LLMError
+from utils.image_preprocess import preprocess_for_ocr, ImageQualityError
+from utils.ocr_cache import ocr_cache, cache_key
+from utils.executors import io_executor
 
-def extract_adhar_front(image_bytes: bytes) -> Dict[str, Optional[str]]:
+# Bump a version whenever its prompt changes so cached extractions are not reused
+ADHAR_FRONT_PROMPT_VERSION = "adhar_front:v1"
+ADHAR_BACK_PROMPT_VERSION = "adhar_back:v1"
+PAN_PROMPT_VERSION = "pan:v1"
+
+
+def is_cacheable(data: Any, validity_field: str) -> bool:
+    # Only extractions the model vouched for are cached; a "not a card" or malformed reply gets another try
+    return isinstance(data, dict) and data.get(validity_field) is True
+
+
+async def extract_adhar_front(image_bytes: bytes) -> Dict[str, Optional[str]]:
     """
     Extract identity data from Adhar card front using Gemini Vision.
     
@@ -20,8 +25,13 @@ def extract_adhar_front(image_bytes: bytes) -> Dict[str, Optional[str]]:
         dict with keys: name, dob, gender, adhar_no
     """
     try:
-        image = Image.open(io.BytesIO(image_bytes))
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        image = await io_executor.run(preprocess_for_ocr, image_bytes)
+        
+        key = cache_key(image.data, ADHAR_FRONT_PROMPT_VERSION)
+        cached = ocr_cache.get(key)
+        if cached is not None:
+            print("OCR cache hit for Adhar Front")
+            return cached
         
         prompt = """
 You are an OCR system specialized in reading Indian Aadhaar cards (Front Side).
@@ -44,17 +54,24 @@ Rules:
 - Return ONLY valid JSON, no other text
 """
         
-        response = model.generate_content([prompt, image])
-        json_text = response.text.strip().replace('```json', '').replace('```', '').strip()
-        data = json.loads(json_text)
+        response_text = await llm_client.generate([prompt, image.as_blob()], priority="kyc")
+        data = parse_json_response(response_text)
         print(f"Gemini extracted Adhar Front data: {data}")
+        if is_cacheable(data, "is_adhar_card"):
+            ocr_cache.put(key, data)
         return data
         
+    except ImageQualityError as e:
+        print(f"Adhar Front image rejected before OCR: {e}")
+        return {"error": "low_quality", "reason": str(e)}
+    except LLMError as e:
+        print(f"Gemini Adhar Front call failed: {type(e).__name__}: {e}")
+        return {"error": "network_error"}
     except Exception as e:
         print(f"Error in Gemini Adhar Front extraction: {e}")
         return {"error": "network_error"}
 
-def extract_adhar_back(image_bytes: bytes) -> Dict[str, Optional[str]]:
+async def extract_adhar_back(image_bytes: bytes) -> Dict[str, Optional[str]]:
     """
     Extract address data from Adhar card back using Gemini Vision.
     
@@ -62,8 +79,13 @@ def extract_adhar_back(image_bytes: bytes) -> Dict[str, Optional[str]]:
         dict with keys: address, city, district, state, pincode
     """
     try:
-        image = Image.open(io.BytesIO(image_bytes))
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        image = await io_executor.run(preprocess_for_ocr, image_bytes)
+        
+        key = cache_key(image.data, ADHAR_BACK_PROMPT_VERSION)
+        cached = ocr_cache.get(key)
+        if cached is not None:
+            print("OCR cache hit for Adhar Back")
+            return cached
         
         prompt = """
 You are an OCR system specialized in reading Indian Aadhaar cards (Back Side).
@@ -86,17 +108,24 @@ Rules:
 - Return ONLY valid JSON, no other text
 """
         
-        response = model.generate_content([prompt, image])
-        json_text = response.text.strip().replace('```json', '').replace('```', '').strip()
-        data = json.loads(json_text)
+        response_text = await llm_client.generate([prompt, image.as_blob()], priority="kyc")
+        data = parse_json_response(response_text)
         print(f"Gemini extracted Adhar Back data: {data}")
+        if is_cacheable(data, "is_adhar_back"):
+            ocr_cache.put(key, data)
         return data
         
+    except ImageQualityError as e:
+        print(f"Adhar Back image rejected before OCR: {e}")
+        return {"error": "low_quality", "reason": str(e)}
+    except LLMError as e:
+        print(f"Gemini Adhar Back call failed: {type(e).__name__}: {e}")
+        return {"error": "network_error"}
     except Exception as e:
         print(f"Error in Gemini Adhar Back extraction: {e}")
         return {"error": "network_error"}
 
-def extract_pan_data(image_bytes: bytes) -> Dict[str, Optional[str]]:
+async def extract_pan_data(image_bytes: bytes) -> Dict[str, Optional[str]]:
     """
     Extract data from PAN card using Gemini Vision.
     
@@ -104,11 +133,14 @@ def extract_pan_data(image_bytes: bytes) -> Dict[str, Optional[str]]:
         dict with keys: name, dob, father_name, pan_no
     """
     try:
-        # Load image
-        image = Image.open(io.BytesIO(image_bytes))
+        # Load, orient, crop and compress the image
+        image = await io_executor.run(preprocess_for_ocr, image_bytes)
         
-        # Use Gemini 2.5 Flash
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        key = cache_key(image.data, PAN_PROMPT_VERSION)
+        cached = ocr_cache.get(key)
+        if cached is not None:
+            print("OCR cache hit for PAN")
+            return cached
         
         prompt = """
 You are an OCR system specialized in reading Indian PAN cards.
@@ -131,23 +163,21 @@ Rules:
 - Return ONLY valid JSON, no other text
 """
         
-        response = model.generate_content([prompt, image])
-        
-        # Parse JSON response
-        json_text = response.text.strip()
-        # Remove markdown code blocks if present
-        if json_text.startswith("```json"):
-            json_text = json_text[7:]
-        if json_text.startswith("```"):
-            json_text = json_text[3:]
-        if json_text.endswith("```"):
-            json_text = json_text[:-3]
-        json_text = json_text.strip()
+        response_text = await llm_client.generate([prompt, image.as_blob()], priority="kyc")
         
-        data = json.loads(json_text)
+        # Parse JSON response (markdown code blocks are stripped)
+        data = parse_json_response(response_text)
         print(f"Gemini extracted PAN data: {data}")
+        if is_cacheable(data, "is_pan_card"):
+            ocr_cache.put(key, data)
         return data
         
+    except ImageQualityError as e:
+        print(f"PAN image rejected before OCR: {e}")
+        return {"error": "low_quality", "reason": str(e)}
+    except LLMError as e:
+        print(f"Gemini PAN call failed: {type(e).__name__}: {e}")
+        return {"error": "network_error"}
     except Exception as e:
         print(f"Error in Gemini PAN extraction: {e}")
         return {"error": "network_error"}
@@ -157,8 +187,6 @@ def interpret_correction(current_data: Dict[str, Any], user_message: str) -> Dic
     Uses Gemini to interpret a user's correction message and update the current data dictionary.
     """
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
         prompt = f"""
         You are a helpful assistant correcting OCR data based on user feedback.
         
@@ -175,18 +203,12 @@ def interpret_correction(current_data: Dict[str, Any], user_message: str) -> Dic
         5. Return ONLY the JSON object, no markdown formatting.
         """
         
-        response = model.generate_content(prompt)
-        json_text = response.text.strip()
-        if json_text.startswith("```json"):
-            json_text = json_text[7:]
-        if json_text.startswith("```"):
-            json_text = json_text[3:]
-        if json_text.endswith("```"):
-            json_text = json_text[:-3]
-        json_text = json_text.strip()
-        
-        updated_data = json.loads(json_text)
+        response_text = llm_client.generate_sync(prompt, priority="correction")
+        updated_data = parse_json_response(response_text)
         return updated_data
+    except LLMError as e:
+        print(f"LLM call failed while interpreting correction: {type(e).__name__}: {e}")
+        return {"error": "network_error"}
     except Exception as e:
         print(f"Error interpreting correction: {e}")
         return {"error": "network_error"}
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+from utils.metrics import metrics
+
+# Content-addressed cache for OCR extraction results.
+# Keys are a hash of the normalised (preprocessed) image bytes plus the prompt
+# version, so re-uploads of the same document skip the Gemini call and prompt
+# changes invalidate old entries. A bounded LRU sits in front of an on-disk tier
+# whose entries expire after OCR_CACHE_TTL_SECONDS; expired files are deleted at
+# startup and then at most every OCR_CACHE_PURGE_INTERVAL_SECONDS, from put().
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join(DATA_DIR, "ocr_cache"))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "256"))
+# Extracted data is personal information, keep it only as long as an onboarding session
+OCR_CACHE_TTL_SECONDS = int(os.getenv("OCR_CACHE_TTL_SECONDS", str(24 * 3600)))
+OCR_CACHE_PURGE_INTERVAL_SECONDS = int(os.getenv("OCR_CACHE_PURGE_INTERVAL_SECONDS", "3600"))
+
+
+def cache_key(image_bytes: bytes, prompt_version: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(prompt_version.encode())
+    digest.update(b"\0")
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    def __init__(self, cache_dir: str = OCR_CACHE_DIR, max_entries: int = OCR_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = OCR_CACHE_TTL_SECONDS, purge_interval: int = OCR_CACHE_PURGE_INTERVAL_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.purge_interval = purge_interval
+        self._last_purge = time.time()
+        self._memory: OrderedDict[str, tuple[float, Dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, stored_at: float, data: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = (stored_at, data)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    metrics.incr("ocr_cache_total", result="memory_hit")
+                    return dict(entry[1])
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            if now - entry["stored_at"] < self.ttl_seconds:
+                self._remember(key, entry["stored_at"], entry["data"])
+                metrics.incr("ocr_cache_total", result="disk_hit")
+                return dict(entry["data"])
+            os.unlink(path)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        metrics.incr("ocr_cache_total", result="miss")
+        return None
+
+    def put(self, key: str, data: Dict[str, Any]):
+        stored_at = time.time()
+        self._remember(key, stored_at, data)
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"stored_at": stored_at, "data": data}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write OCR cache entry: {e}")
+
+        with self._lock:
+            purge_due = stored_at - self._last_purge >= self.purge_interval
+            if purge_due:
+                self._last_purge = stored_at
+        if purge_due:
+            threading.Thread(target=self.purge_expired, name="ocr-cache-purge", daemon=True).start()
+
+    def purge_expired(self) -> int:
+        """Removes expired disk entries. Returns the number removed."""
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except OSError:
+                    pass
+        metrics.incr("ocr_cache_purged_total", removed)
+        return removed
+
+
+ocr_cache = OCRCache()
@@ -1,18 +1,20 @@
-import google.generativeai as genai
-import os
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import uuid
 import json
+from typing import Iterator
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+from utils.llm_client import llm_client, LLMUnavailableError, LLMShedError
+from utils.response_renderer import render_rows
 
-def process_user_query(user_id: uuid.UUID, message: str, db: Session) -> str:
+UNAVAILABLE_MESSAGE = "Our assistant is temporarily unavailable. Please try again in a little while."
+BUSY_MESSAGE = "I'm handling a lot of requests right now. Please ask me again in a minute, or say 'open account' to continue with your application."
+
+def _prepare_answer(user_id: uuid.UUID, message: str, db: Session) -> tuple[str | None, str | None]:
     """
-    Translates a natural language query into SQL, executes it, and returns a natural language response.
-    Restricted to the specific user_id.
+    Generates and executes the SQL for a user query.
+    Returns (final_text, None) when the answer is already known, otherwise (None, nl_prompt)
+    for the natural language rendering step.
     """
     
     # 1. Construct the schema context
@@ -71,41 +73,81 @@ def process_user_query(user_id: uuid.UUID, message: str, db: Session) -> str:
     5. If the query is unrelated to the database or cannot be answered, return "NO_QUERY".
     """
     
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    response_text = llm_client.generate_sync(sql_prompt)
+    sql_query = response_text.strip().replace("```sql", "").replace("```", "").strip()
     
-    try:
-        response = model.generate_content(sql_prompt)
-        sql_query = response.text.strip().replace("```sql", "").replace("```", "").strip()
-        
-        if sql_query == "NO_QUERY":
-            return "I apologize, but I am a banking assistant and can only help with your account, application, or transactions. Is there anything banking-related I can assist you with?"
-            
-        print(f"Generated SQL: {sql_query}")
+    if sql_query == "NO_QUERY":
+        return "I apologize, but I am a banking assistant and can only help with your account, application, or transactions. Is there anything banking-related I can assist you with?", None
         
-        # 3. Execute SQL
-        # Safety check: ensure it's a SELECT or WITH
-        if not (sql_query.lower().startswith("select") or sql_query.lower().startswith("with")):
-             return "I cannot execute this type of query."
+    print(f"Generated SQL: {sql_query}")
+    
+    # 3. Execute SQL
+    # Safety check: ensure it's a SELECT or WITH
+    if not (sql_query.lower().startswith("select") or sql_query.lower().startswith("with")):
+         return "I cannot execute this type of query.", None
 
-        result = db.execute(text(sql_query))
-        rows = result.fetchall()
-        columns = result.keys()
-        
-        data = [dict(zip(columns, row)) for row in rows]
+    result = db.execute(text(sql_query))
+    rows = result.fetchall()
+    columns = list(result.keys())
+    
+    # Small results are formatted locally, skipping the second LLM call
+    rendered = render_rows(columns, rows)
+    if rendered is not None:
+        return rendered, None
+    
+    data = [dict(zip(columns, row)) for row in rows]
+    
+    # 4. Prompt for the Natural Language Response
+    nl_prompt = f"""
+    User Query: "{message}"
+    SQL Query Executed: "{sql_query}"
+    Data Retrieved: {json.dumps(data, default=str)}
+    
+    Generate a helpful, natural language response for the user based on this data.
+    If no data was found, explain that politely.
+    """
+    return None, nl_prompt
+
+
+def process_user_query(user_id: uuid.UUID, message: str, db: Session) -> str:
+    """
+    Translates a natural language query into SQL, executes it, and returns a natural language response.
+    Restricted to the specific user_id.
+    """
+    try:
+        final_text, nl_prompt = _prepare_answer(user_id, message, db)
+        if final_text is not None:
+            return final_text
         
-        # 4. Generate Natural Language Response
-        nl_prompt = f"""
-        User Query: "{message}"
-        SQL Query Executed: "{sql_query}"
-        Data Retrieved: {json.dumps(data, default=str)}
+        nl_response = llm_client.generate_sync(nl_prompt)
+        return nl_response.strip()
         
-        Generate a helpful, natural language response for the user based on this data.
-        If no data was found, explain that politely.
-        """
+    except LLMUnavailableError:
+        return UNAVAILABLE_MESSAGE
+    except LLMShedError:
+        return BUSY_MESSAGE
+    except Exception as e:
+        print(f"Query Engine Error: {e}")
+        return "I encountered an error while processing your request."
+
+
+def stream_user_query(user_id: uuid.UUID, message: str, db: Session) -> Iterator[str]:
+    """
+    Streaming variant of process_user_query.
+    Yields text chunks of the natural language response as Gemini produces them.
+    """
+    try:
+        final_text, nl_prompt = _prepare_answer(user_id, message, db)
+        if final_text is not None:
+            yield final_text
+            return
         
-        nl_response = model.generate_content(nl_prompt)
-        return nl_response.text.strip()
+        yield from llm_client.stream_sync(nl_prompt)
         
+    except LLMUnavailableError:
+        yield UNAVAILABLE_MESSAGE
+    except LLMShedError:
+        yield BUSY_MESSAGE
     except Exception as e:
         print(f"Query Engine Error: {e}")
-        return "I encountered an error while processing your request."
+        yield "I encountered an error while processing your request."
@@ -0,0 +1,213 @@
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException
+
+from utils import auth
+from utils.llm_scheduler import TokenBucket
+from utils.metrics import metrics
+
+# Request rate limiting and backpressure for the whole API (ASGI middleware).
+# Every client has a general token bucket, and expensive or abuse-prone routes
+# have a tighter bucket of their own per client; a client is the user id from a
+# valid bearer token, otherwise the client IP. A request takes a token from every
+# bucket that applies or from none of them, so rejected requests don't use up the
+# general budget. Over limit -> 429 with Retry-After.
+# Independently, a cap on requests in flight in this process turns overload into
+# fast 503s instead of a growing threadpool queue.
+# Buckets live in process memory by default; with several workers set
+# RATE_LIMIT_BACKEND=redis so they share one set of buckets. If Redis is
+# unreachable requests are let through (fail open) rather than failing with 500s.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory|redis
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_REDIS_TIMEOUT = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT", "0.25"))
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "120"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "30"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "64"))
+# Buckets kept per process by the memory backend; idle ones are evicted first
+RATE_LIMIT_MAX_BUCKETS = 100_000
+
+# (bucket key, requests per minute, burst)
+BucketSpec = Tuple[str, float, float]
+
+# route prefix -> (requests per minute, burst) per client
+ROUTE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "/auth/login": (float(os.getenv("RATE_LIMIT_LOGIN_PER_MINUTE", "10")), 5),
+    "/chatbot/chat": (float(os.getenv("RATE_LIMIT_CHAT_PER_MINUTE", "30")), 10),
+    "/chatbot/upload": (float(os.getenv("RATE_LIMIT_UPLOAD_PER_MINUTE", "20")), 5),
+}
+
+# Probes and monitoring are never limited
+EXEMPT_PATHS = ("/health", "/ready", "/metrics")
+
+
+class MemoryRateLimitBackend:
+    """Token buckets in this process. Only safe with a single worker."""
+
+    def __init__(self, max_buckets: int = RATE_LIMIT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def _bucket(self, key: str, per_minute: float, burst: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(per_minute / 60.0, burst)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket
+
+    async def take(self, specs: List[BucketSpec]) -> float:
+        """
+        Takes one token from every bucket and returns 0, or takes none and returns the
+        seconds until all of them have one. No await in between, so this is atomic.
+        """
+        buckets = [self._bucket(*spec) for spec in specs]
+        wait = max(bucket.wait_time() for bucket in buckets)
+        if not wait:
+            for bucket in buckets:
+                bucket.try_take()
+        return wait
+
+
+# Atomic refill-and-take on Redis hashes {tokens, updated_at}, one per key with
+# ARGV = now, then rate and capacity per key. Takes a token from every bucket only
+# if all of them have one; returns the seconds to wait
+_REDIS_TAKE = """
+local now = tonumber(ARGV[1])
+local tokens, wait = {}, 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'updated_at')
+    local available = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - updated_at) * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    if wait == 0 then
+        tokens[i] = tokens[i] - 1
+    end
+    redis.call('HSET', key, 'tokens', tokens[i], 'updated_at', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend:
+    """Token buckets shared by every worker through Redis (needs the `redis` package)."""
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL, timeout: float = RATE_LIMIT_REDIS_TIMEOUT):
+        import redis.asyncio as redis
+        from redis.exceptions import ConnectionError, TimeoutError
+
+        # Short timeouts so an unreachable Redis costs each request little before failing open
+        self.client = redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.script = self.client.register_script(_REDIS_TAKE)
+        self.unavailable_errors = (ConnectionError, TimeoutError)
+
+    async def take(self, specs: List[BucketSpec]) -> float:
+        args = [time.time()]
+        for _, per_minute, burst in specs:
+            args += [per_minute / 60.0, burst]
+        try:
+            wait = await self.script(keys=[f"ratelimit:{key}" for key, _, _ in specs], args=args)
+        except self.unavailable_errors as e:
+            metrics.incr("rate_limit_backend_errors_total", backend="redis")
+            print(f"Rate limit backend unavailable, letting the request through: {type(e).__name__}: {e}")
+            return 0.0
+        return float(wait)
+
+
+def create_backend():
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend()
+    return MemoryRateLimitBackend()
+
+
+def client_key(scope) -> str:
+    """User id from a valid bearer token (cached by utils.auth), otherwise the client IP."""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    return "user:" + auth.decode_token(token)["sub"]
+                except HTTPException:
+                    pass
+            break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+async def _reject(send, status_code: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """Plain ASGI middleware so streaming responses (chat) pass through untouched."""
+
+    def __init__(self, app, backend=None, max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+                 per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST,
+                 route_limits: Dict[str, Tuple[float, float]] | None = None):
+        self.app = app
+        self.backend = backend or create_backend()
+        self.max_concurrent = max_concurrent
+        self.per_minute = per_minute
+        self.burst = burst
+        self.route_limits = route_limits if route_limits is not None else ROUTE_LIMITS
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        client = client_key(scope)
+        specs = [(client, self.per_minute, self.burst)]
+        for prefix, (per_minute, burst) in self.route_limits.items():
+            if path.startswith(prefix):
+                specs.append((f"{client}:{prefix}", per_minute, burst))
+                break
+        wait = await self.backend.take(specs)
+        if wait:
+            metrics.incr("rate_limited_total", reason="rate")
+            await _reject(send, 429, "Too many requests, slow down", wait)
+            return
+
+        if self.in_flight >= self.max_concurrent:
+            metrics.incr("rate_limited_total", reason="concurrency")
+            await _reject(send, 503, "Server is busy, try again shortly", 1)
+            return
+
+        self.in_flight += 1
+        metrics.gauge("requests_in_flight", self.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            metrics.gauge("requests_in_flight", self.in_flight)
@@ -0,0 +1,102 @@
+import os
+import uuid
+from datetime import date, datetime
+from typing import Any, List, Sequence
+
+from utils.metrics import metrics
+
+# Deterministic rendering of small query results so the query engine can skip
+# the second LLM call. Larger or nested result sets return None and are left
+# to the LLM.
+
+RENDER_MAX_ROWS = int(os.getenv("RENDER_MAX_ROWS", "5"))
+RENDER_MAX_COLUMNS = int(os.getenv("RENDER_MAX_COLUMNS", "6"))
+RENDER_MAX_VALUE_LENGTH = 120
+
+COLUMN_LABELS = {
+    "application_no": "Application number",
+    "application_status": "Application status",
+    "adhar_card_no": "Aadhaar number",
+    "aadhar_card_no": "Aadhaar number",
+    "pan_card_no": "PAN number",
+    "kyc_status": "KYC status",
+    "account_no": "Account number",
+    "current_balance": "Current balance",
+    "status_flag": "Account status",
+    "mobile_no": "Mobile number",
+    "dob": "Date of birth",
+    "mode_of_transaction": "Mode",
+    "reason_of_transaction": "Reason",
+}
+
+AMOUNT_COLUMNS = {"current_balance", "amount", "balance", "total", "sum"}
+
+
+def column_label(column: str) -> str:
+    if column in COLUMN_LABELS:
+        return COLUMN_LABELS[column]
+    return column.replace("_", " ").strip().capitalize()
+
+
+def format_value(column: str, value: Any) -> str:
+    if value is None:
+        return "Not available"
+    if isinstance(value, bool):
+        if column == "kyc_status":
+            return "Verified" if value else "Pending"
+        return "Yes" if value else "No"
+    if isinstance(value, (int, float)) and (column in AMOUNT_COLUMNS or column.endswith("_amount") or column.endswith("_balance")):
+        return f"₹{value:,.2f}"
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    text = str(value)
+    if column.endswith("status"):
+        return text.capitalize()
+    return text
+
+
+def _is_simple(value: Any) -> bool:
+    if isinstance(value, (dict, list, tuple, set, bytes)):
+        return False
+    return len(str(value)) <= RENDER_MAX_VALUE_LENGTH
+
+
+def render_rows(columns: Sequence[str], rows: List[Sequence[Any]]) -> str | None:
+    """
+    Formats a query result without the LLM.
+    Returns None when the result is too large or complex and should be rendered by the LLM.
+    """
+    columns = list(columns)
+
+    if not rows:
+        metrics.incr("query_render_total", path="empty")
+        return "I couldn't find any records matching your request."
+
+    if len(rows) > RENDER_MAX_ROWS or len(columns) > RENDER_MAX_COLUMNS:
+        metrics.incr("query_render_total", path="llm")
+        return None
+    if not all(_is_simple(value) for row in rows for value in row):
+        metrics.incr("query_render_total", path="llm")
+        return None
+
+    if len(rows) == 1 and len(columns) == 1:
+        metrics.incr("query_render_total", path="single_value")
+        return f"Your {column_label(columns[0]).lower()} is {format_value(columns[0], rows[0][0])}."
+
+    if len(rows) == 1:
+        metrics.incr("query_render_total", path="single_row")
+        lines = [f"{column_label(col)}: {format_value(col, val)}" for col, val in zip(columns, rows[0])]
+        return "Here are the details I found:\n\n" + "\n".join(lines)
+
+    metrics.incr("query_render_total", path="few_rows")
+    lines = []
+    for index, row in enumerate(rows, start=1):
+        fields = ", ".join(f"{column_label(col)}: {format_value(col, val)}" for col, val in zip(columns, row))
+        lines.append(f"{index}. {fields}")
+    return f"I found {len(rows)} records:\n\n" + "\n".join(lines)
@@ -1,44 +1,452 @@
-import boto3
-from botocore.client import Config
+import hashlib
+import hmac
+import io
+import os
+import queue
+import random
+import re
+import shutil
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from typing import BinaryIO, Callable, Dict, List
+
+from utils.metrics import metrics
+
+# Object storage for KYC artifacts behind one interface with two backends:
+# - "s3": any S3-compatible endpoint (Supabase in production, MinIO locally)
+# - "local": a directory on disk, served by the API under /storage
+# Objects are keyed by the SHA-256 of their content, so uploading identical bytes
+# again only checks that the object exists and reuses its URL.
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3")
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", os.path.join(DATA_DIR, "storage"))
+
+# Point STORAGE_ENDPOINT_URL at a local S3-compatible server (e.g. MinIO) for development;
+# STORAGE_PUBLIC_URL_BASE defaults to <endpoint>/<bucket>/<key> path-style URLs there.
+ENDPOINT_URL = os.getenv("STORAGE_ENDPOINT_URL", "https://ujevsibhrnctthptfyoj.storage.supabase.co/storage/v1/s3")
+if STORAGE_BACKEND == "local":
+    _default_public_base = "http://localhost:8000/storage"
+elif "supabase.co" in ENDPOINT_URL:
+    _default_public_base = "https://ujevsibhrnctthptfyoj.supabase.co/storage/v1/object/public"
+else:
+    _default_public_base = ENDPOINT_URL
+PUBLIC_URL_BASE = os.getenv("STORAGE_PUBLIC_URL_BASE", _default_public_base)
+REGION_NAME = os.getenv("STORAGE_REGION", "ap-south-1")
+# No defaults: credentials must never be sent to whatever endpoint happens to be configured
+AWS_ACCESS_KEY_ID = os.getenv("STORAGE_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("STORAGE_SECRET_ACCESS_KEY")
+
+STORAGE_UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", "4"))
+STORAGE_UPLOAD_RETRIES = int(os.getenv("STORAGE_UPLOAD_RETRIES", "3"))
+STORAGE_RETRY_BASE_DELAY = float(os.getenv("STORAGE_RETRY_BASE_DELAY", "0.5"))
+# Objects above the threshold are sent as a streamed multipart upload in chunks of this size
+STORAGE_MULTIPART_THRESHOLD = int(os.getenv("STORAGE_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+STORAGE_MULTIPART_CHUNK = int(os.getenv("STORAGE_MULTIPART_CHUNK", str(8 * 1024 * 1024)))
+# Presigned direct uploads: the client PUTs the image straight to storage and only
+# sends the object key to the API. Local backend URLs point at /storage-upload on the API
+# and are signed with STORAGE_SIGNING_KEY. STORAGE_IMAGE_TRANSFORM_URL, if set, is an
+# image-resizing endpoint (e.g. Supabase's /storage/v1/render/image/public) used to fetch
+# downscaled copies instead of the full object.
+STORAGE_PRESIGN_EXPIRES = int(os.getenv("STORAGE_PRESIGN_EXPIRES", "300"))
+STORAGE_MAX_UPLOAD_BYTES = int(os.getenv("STORAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+STORAGE_SIGNING_KEY = os.getenv("STORAGE_SIGNING_KEY") or os.getenv("JWT_SECRET_KEY") or "local-storage-signing-key"
+STORAGE_API_URL = os.getenv("STORAGE_API_URL", "http://localhost:8000")
+STORAGE_IMAGE_TRANSFORM_URL = os.getenv("STORAGE_IMAGE_TRANSFORM_URL")
+# Settled jobs nobody waited on (abandoned onboarding sessions) are forgotten after this long
+STORAGE_JOB_RETENTION_SECONDS = 24 * 3600
+# Bucket holding the Adhar, PAN and live photo images of applications
+KYC_BUCKET = "kyc-documents"
+
+HASH_CHUNK = 1024 * 1024
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "application/pdf": ".pdf"}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def check_config():
+    """Raises RuntimeError when the selected backend can't work; called once at startup."""
+    if STORAGE_BACKEND not in ("s3", "local"):
+        raise RuntimeError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}, use 's3' or 'local'")
+    if STORAGE_BACKEND == "s3" and not (AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY):
+        raise RuntimeError("STORAGE_BACKEND=s3 needs STORAGE_ACCESS_KEY_ID and STORAGE_SECRET_ACCESS_KEY")
 
-ENDPOINT_URL = "https://ujevsibhrnctthptfyoj.storage.supabase.co/storage/v1/s3"
-REGION_NAME = "ap-south-1"
-AWS_ACCESS_KEY_ID = "39b9d010198aa81a79439ba8b09dfc83"
-AWS_SECRET_ACCESS_KEY = "52423a7c9ea91eca1a3c1224215e9a24c04ffb905aa4497522eb51f4dbc57202"
 
 def get_s3_client():
-    return boto3.client(
-        's3',
-        endpoint_url=ENDPOINT_URL,
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4'),
-        region_name=REGION_NAME
-    )
-
-def upload_file_to_s3(file_obj, bucket_name: str, object_name: str, content_type: str = None):
-    s3 = get_s3_client()
+    """One long-lived client per process; boto3 clients are thread-safe and keep a connection pool."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not (AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY):
+                    raise RuntimeError("STORAGE_ACCESS_KEY_ID and STORAGE_SECRET_ACCESS_KEY must be set for S3 storage")
+                import boto3
+                from botocore.client import Config
+
+                _client = boto3.client(
+                    's3',
+                    endpoint_url=ENDPOINT_URL,
+                    aws_access_key_id=AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    config=Config(
+                        signature_version='s3v4',
+                        max_pool_connections=STORAGE_UPLOAD_WORKERS * 2 + 2,
+                        s3={"addressing_style": "path"},
+                    ),
+                    region_name=REGION_NAME
+                )
+    return _client
+
+
+def content_key(file_obj: BinaryIO | bytes, content_type: str | None = None) -> str:
+    """SHA-256 content address, e.g. 'sha256/ab/ab12...ef.jpg'. Streams are read and rewound."""
+    if isinstance(file_obj, bytes):
+        digest = hashlib.sha256(file_obj)
+    else:
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: file_obj.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+        file_obj.seek(0)
+    hex_digest = digest.hexdigest()
+    return f"sha256/{hex_digest[:2]}/{hex_digest}{EXTENSIONS.get(content_type or '', '')}"
+
+
+class StorageBackend:
+    name = "base"
+
+    def exists(self, bucket_name: str, key: str) -> bool:
+        raise NotImplementedError
+
+    def put(self, bucket_name: str, key: str, file_obj: BinaryIO, content_type: str | None = None):
+        raise NotImplementedError
+
+    def get(self, bucket_name: str, key: str) -> bytes:
+        raise NotImplementedError
+
+    def size(self, bucket_name: str, key: str) -> int | None:
+        """Object size in bytes, or None if it doesn't exist."""
+        raise NotImplementedError
+
+    def presigned_put_url(self, bucket_name: str, key: str, content_type: str, expires_in: int = STORAGE_PRESIGN_EXPIRES) -> str:
+        raise NotImplementedError
+
+    def get_downscaled(self, bucket_name: str, key: str, max_side: int) -> bytes:
+        from utils.image_preprocess import downscale
+
+        return downscale(self.get(bucket_name, key), max_side)
+
+    def url(self, bucket_name: str, key: str) -> str:
+        return f"{PUBLIC_URL_BASE.rstrip('/')}/{bucket_name}/{key}"
+
+
+class LocalStorageBackend(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str = STORAGE_LOCAL_DIR):
+        self.root = root
+
+    def _path(self, bucket_name: str, key: str) -> str:
+        # Keys are relative, "/"-separated and never step out of their bucket
+        parts = key.split("/")
+        if "\\" in bucket_name + key or "/" in bucket_name or any(part in ("", ".", "..") for part in [bucket_name, *parts]):
+            raise ValueError(f"Invalid object key: {key}")
+        bucket_dir = os.path.normpath(os.path.join(self.root, bucket_name))
+        path = os.path.normpath(os.path.join(bucket_dir, *parts))
+        if not path.startswith(bucket_dir + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def exists(self, bucket_name: str, key: str) -> bool:
+        return os.path.exists(self._path(bucket_name, key))
+
+    def put(self, bucket_name: str, key: str, file_obj: BinaryIO, content_type: str | None = None):
+        path = self._path(bucket_name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(file_obj, f, HASH_CHUNK)
+        os.replace(tmp_path, path)
+
+    def get(self, bucket_name: str, key: str) -> bytes:
+        with open(self._path(bucket_name, key), "rb") as f:
+            return f.read()
+
+    def size(self, bucket_name: str, key: str) -> int | None:
+        try:
+            return os.path.getsize(self._path(bucket_name, key))
+        except FileNotFoundError:
+            return None
+
+    def presigned_put_url(self, bucket_name: str, key: str, content_type: str, expires_in: int = STORAGE_PRESIGN_EXPIRES) -> str:
+        expires_at = int(time.time()) + expires_in
+        query = urllib.parse.urlencode({
+            "content_type": content_type,
+            "expires": expires_at,
+            "signature": local_upload_signature(bucket_name, key, content_type, expires_at),
+        })
+        return f"{STORAGE_API_URL.rstrip('/')}/storage-upload/{bucket_name}/{key}?{query}"
+
+
+class S3StorageBackend(StorageBackend):
+    name = "s3"
+
+    def exists(self, bucket_name: str, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            get_s3_client().head_object(Bucket=bucket_name, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put(self, bucket_name: str, key: str, file_obj: BinaryIO, content_type: str | None = None):
+        from boto3.s3.transfer import TransferConfig
+
+        extra_args = {"ContentType": content_type} if content_type else {}
+        # upload_fileobj streams the file; above the threshold it switches to a multipart upload
+        get_s3_client().upload_fileobj(
+            file_obj, bucket_name, key, ExtraArgs=extra_args,
+            Config=TransferConfig(multipart_threshold=STORAGE_MULTIPART_THRESHOLD,
+                                  multipart_chunksize=STORAGE_MULTIPART_CHUNK,
+                                  max_concurrency=4)
+        )
+
+    def get(self, bucket_name: str, key: str) -> bytes:
+        return get_s3_client().get_object(Bucket=bucket_name, Key=key)["Body"].read()
+
+    def size(self, bucket_name: str, key: str) -> int | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            return get_s3_client().head_object(Bucket=bucket_name, Key=key)["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def presigned_put_url(self, bucket_name: str, key: str, content_type: str, expires_in: int = STORAGE_PRESIGN_EXPIRES) -> str:
+        # Signing happens locally, no request to the storage service
+        return get_s3_client().generate_presigned_url(
+            "put_object",
+            Params={"Bucket": bucket_name, "Key": key, "ContentType": content_type},
+            ExpiresIn=expires_in
+        )
+
+    def get_downscaled(self, bucket_name: str, key: str, max_side: int) -> bytes:
+        if not STORAGE_IMAGE_TRANSFORM_URL:
+            return super().get_downscaled(bucket_name, key, max_side)
+        query = urllib.parse.urlencode({"width": max_side, "height": max_side, "resize": "contain"})
+        with urllib.request.urlopen(f"{STORAGE_IMAGE_TRANSFORM_URL.rstrip('/')}/{bucket_name}/{key}?{query}", timeout=30) as response:
+            return response.read()
+
+
+_backend: StorageBackend | None = None
+
+
+def key_from_url(bucket_name: str, url: str | None) -> str | None:
+    """Object key of a URL returned by StorageBackend.url() (or None if it isn't one for this bucket)."""
+    if not url:
+        return None
+    marker = f"/{bucket_name}/"
+    index = url.find(marker)
+    if index < 0:
+        return None
+    return url[index + len(marker):].split("?", 1)[0] or None
+
+
+def get_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        _backend = LocalStorageBackend() if STORAGE_BACKEND == "local" else S3StorageBackend()
+    return _backend
+
+
+def local_upload_signature(bucket_name: str, key: str, content_type: str, expires_at: int) -> str:
+    message = f"{bucket_name}\n{key}\n{content_type}\n{expires_at}".encode()
+    return hmac.new(STORAGE_SIGNING_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_local_upload(bucket_name: str, key: str, content_type: str, expires_at: int, signature: str) -> bool:
+    if expires_at < time.time():
+        return False
+    return hmac.compare_digest(local_upload_signature(bucket_name, key, content_type, expires_at), signature)
+
+
+def incoming_key(user_id, file_type: str, content_type: str) -> str:
+    """Key for a presigned direct upload; scoped to the user and document type so it can be checked later."""
+    return f"incoming/{user_id}/{file_type}/{uuid.uuid4().hex}{EXTENSIONS.get(content_type, '')}"
+
+
+def is_incoming_key(key: str, user_id, file_type: str) -> bool:
+    """True only for a key incoming_key() could have issued to this user and document type."""
+    extensions = "|".join(re.escape(extension) for extension in EXTENSIONS.values())
+    pattern = rf"incoming/{re.escape(str(user_id))}/{re.escape(file_type)}/[0-9a-f]{{32}}(?:{extensions})?"
+    return re.fullmatch(pattern, key) is not None
+
+
+def fetch_image(bucket_name: str, key: str, max_side: int) -> bytes:
+    """
+    Fetches a downscaled copy of a directly uploaded image for OCR and face matching.
+    Raises ValueError if the object is missing or larger than STORAGE_MAX_UPLOAD_BYTES.
+    """
+    backend = get_backend()
+    size = backend.size(bucket_name, key)
+    if size is None:
+        raise ValueError("Uploaded object not found")
+    if size > STORAGE_MAX_UPLOAD_BYTES:
+        raise ValueError("Uploaded object is too large")
+    start = time.perf_counter()
     try:
-        extra_args = {}
-        if content_type:
-            extra_args['ContentType'] = content_type
-        
-        print(f"Uploading {object_name} to bucket {bucket_name}...")
-        s3.upload_fileobj(file_obj, bucket_name, object_name, ExtraArgs=extra_args)
-        
-        # Return public URL
-        # Supabase S3 URL format: https://<project_id>.supabase.co/storage/v1/object/public/<bucket>/<key>
-        # Project ID is ujevsibhrnctthptfyoj
-        url = f"https://ujevsibhrnctthptfyoj.supabase.co/storage/v1/object/public/{bucket_name}/{object_name}"
-        print(f"Upload successful! URL: {url}")
-        return url
+        return backend.get_downscaled(bucket_name, key, max_side)
+    finally:
+        metrics.observe("storage_fetch_seconds", time.perf_counter() - start, backend=backend.name)
+
+
+def store_file(file_obj: BinaryIO, bucket_name: str, content_type: str | None = None, key: str | None = None) -> str:
+    """
+    Stores a stream under its content key and returns the public URL.
+    If an object with the same content already exists nothing is uploaded.
+    """
+    backend = get_backend()
+    key = key or content_key(file_obj, content_type)
+    start = time.perf_counter()
+    try:
+        if backend.exists(bucket_name, key):
+            metrics.incr("storage_put_total", backend=backend.name, result="deduplicated")
+        else:
+            print(f"Uploading {key} to bucket {bucket_name}...")
+            backend.put(bucket_name, key, file_obj, content_type)
+            metrics.incr("storage_put_total", backend=backend.name, result="uploaded")
+        return backend.url(bucket_name, key)
     except Exception as e:
-        print(f"Error uploading to S3: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"Error uploading to storage: {type(e).__name__}: {e}")
         raise Exception(f"Failed to upload file to storage: {str(e)}")
+    finally:
+        metrics.observe("storage_upload_seconds", time.perf_counter() - start, bucket=bucket_name)
+
 
 def list_buckets():
     s3 = get_s3_client()
     response = s3.list_buckets()
     return [bucket['Name'] for bucket in response['Buckets']]
+
+
+class UploadJob:
+    def __init__(self, content: bytes, bucket_name: str, content_type: str | None):
+        self.id = str(uuid.uuid4())
+        self.content = content
+        self.bucket_name = bucket_name
+        self.content_type = content_type
+        self.key = content_key(content, content_type)
+        self.url = get_backend().url(bucket_name, self.key)
+        self.status = "queued"  # queued/uploaded/failed
+        self.error: str | None = None
+        self.attempts = 0
+        self.enqueued_at = time.perf_counter()
+        self.settled_at: float | None = None
+        self.done = threading.Event()
+
+
+class UploadQueue:
+    """
+    Background uploader: callers enqueue the bytes and get the final public URL back
+    immediately. Worker threads upload with retries and run completion callbacks
+    once every job in a group is durable (or has failed for good).
+    """
+
+    def __init__(self, workers: int = STORAGE_UPLOAD_WORKERS, retries: int = STORAGE_UPLOAD_RETRIES):
+        self.workers = workers
+        self.retries = retries
+        self._queue: "queue.Queue[UploadJob]" = queue.Queue()
+        self._jobs: Dict[str, UploadJob] = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self.workers):
+                threading.Thread(target=self._worker, name=f"storage-upload-{i}", daemon=True).start()
+            self._started = True
+
+    def enqueue(self, content: bytes, bucket_name: str, content_type: str | None = None) -> UploadJob:
+        self._start()
+        job = UploadJob(content, bucket_name, content_type)
+        with self._lock:
+            cutoff = time.perf_counter() - STORAGE_JOB_RETENTION_SECONDS
+            for stale_id in [j.id for j in self._jobs.values() if j.settled_at is not None and j.settled_at < cutoff]:
+                del self._jobs[stale_id]
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        metrics.gauge("storage_upload_queue_depth", self._queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> UploadJob | None:
+        return self._jobs.get(job_id)
+
+    def pending_keys(self) -> set:
+        """Keys of jobs still queued or uploading in this process."""
+        with self._lock:
+            return {job.key for job in self._jobs.values() if not job.done.is_set()}
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            metrics.gauge("storage_upload_queue_depth", self._queue.qsize())
+            metrics.observe("storage_upload_queue_wait_seconds", time.perf_counter() - job.enqueued_at)
+            while True:
+                job.attempts += 1
+                try:
+                    # BytesIO shares the bytes buffer instead of copying it
+                    store_file(io.BytesIO(job.content), job.bucket_name, job.content_type, key=job.key)
+                    job.status = "uploaded"
+                    break
+                except Exception as e:
+                    job.error = str(e)
+                    if job.attempts > self.retries:
+                        job.status = "failed"
+                        break
+                    # Full jitter so retries from several workers don't line up
+                    time.sleep(random.uniform(0, STORAGE_RETRY_BASE_DELAY * 2 ** (job.attempts - 1)))
+            metrics.incr("storage_upload_total", result=job.status)
+            # The bytes are no longer needed once the job has settled
+            job.content = b""
+            job.settled_at = time.perf_counter()
+            job.done.set()
+            self._queue.task_done()
+
+    def wait(self, job_ids: List[str], timeout: float | None = None) -> bool:
+        """Blocks until the jobs settle. Returns True if all of them were uploaded (unknown jobs count as failed)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job_id in job_ids:
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not job.done.wait(remaining):
+                return False
+        return all(job_id in self._jobs and self._jobs[job_id].status == "uploaded" for job_id in job_ids)
+
+    def when_durable(self, job_ids: List[str], callback: Callable[[bool], None]):
+        """Calls callback(all_uploaded) from a background thread once every job has settled."""
+        def waiter():
+            durable = self.wait(job_ids)
+            try:
+                callback(durable)
+            except Exception as e:
+                print(f"Upload completion callback failed: {e}")
+            with self._lock:
+                for job_id in job_ids:
+                    self._jobs.pop(job_id, None)
+
+        threading.Thread(target=waiter, name="storage-upload-waiter", daemon=True).start()
+
+
+upload_queue = UploadQueue()
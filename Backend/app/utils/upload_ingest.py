@@ -0,0 +1,140 @@
+import json
+import os
+from typing import Dict, Tuple
+
+from fastapi import UploadFile
+
+from utils.metrics import metrics
+
+# Size-capped, type-checked ingestion of multipart image uploads.
+# Starlette spools each uploaded part to a SpooledTemporaryFile (in memory up to
+# 1 MB, then on disk) while parsing the form. UploadSizeLimitMiddleware caps the
+# request body before any of that: by Content-Length when there is one, and by
+# counting the bytes actually received otherwise (chunked bodies, or a header
+# that lies). Parts are then checked by size and by magic bytes (not the
+# client-supplied Content-Type) before their content is read into memory, exactly once.
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+# Allowance for the multipart boundaries and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+SNIFF_BYTES = 16
+
+
+class UploadRejectedError(ValueError):
+    """The upload is too large or is not a supported image."""
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    """Content type from the leading magic bytes, or None for anything but JPEG/PNG/WebP."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def upload_body_limit(max_files: int = 1) -> int:
+    """Largest request body accepted for a form carrying up to `max_files` images."""
+    return max_files * UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD
+
+
+# Exact request paths of the image upload routes and the body size each accepts
+UPLOAD_ROUTE_LIMITS = {
+    "/chatbot/upload": upload_body_limit(1),
+    "/chatbot/upload/kyc": upload_body_limit(3),
+}
+
+
+class UploadTooLargeError(Exception):
+    """Raised from receive() once a request body passes its route's limit."""
+
+
+async def _reject_too_large(send):
+    body = json.dumps({"detail": f"Upload too large, the limit is {UPLOAD_MAX_BYTES // (1024 * 1024)} MB per file"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    (b"connection", b"close")],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Plain ASGI middleware that answers 413 for upload bodies over their route's limit.
+    The body is counted as the app pulls it from receive(), so form parsing stops at
+    the limit. Whatever the app then makes of the aborted body is replaced by the 413.
+    """
+
+    def __init__(self, app, limits: Dict[str, int] | None = None):
+        self.app = app
+        self.limits = limits if limits is not None else UPLOAD_ROUTE_LIMITS
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            metrics.incr("upload_rejected_total", reason="content_length")
+            await _reject_too_large(send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def counted_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLargeError()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, counted_receive, guarded_send)
+        except UploadTooLargeError:
+            pass
+        if exceeded and not started:
+            metrics.incr("upload_rejected_total", reason="body_size")
+            await _reject_too_large(send)
+
+
+async def read_image_upload(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> Tuple[bytes, str]:
+    """
+    Validates an uploaded image from its spooled file and returns (content, sniffed content type).
+    The returned bytes are the only in-memory copy; OCR, face matching and storage share them.
+    Raises UploadRejectedError.
+    """
+    spool = file.file
+    spool.seek(0, os.SEEK_END)
+    size = spool.tell()
+    if size > max_bytes:
+        metrics.incr("upload_rejected_total", reason="size")
+        raise UploadRejectedError(f"The file is too large, the limit is {max_bytes // (1024 * 1024)} MB.")
+
+    spool.seek(0)
+    content_type = sniff_image_type(spool.read(SNIFF_BYTES))
+    if content_type is None:
+        metrics.incr("upload_rejected_total", reason="type")
+        raise UploadRejectedError("Only JPEG, PNG or WebP photos are accepted.")
+
+    spool.seek(0)
+    content = await file.read()
+    metrics.observe("upload_ingest_bytes", size)
+    return content, content_type
@@ -1,16 +1,117 @@
-from deepface import DeepFace
 import os
-import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from deepface import DeepFace
+import numpy as np
+
+from utils.metrics import metrics
+
+# Compare candidates with `python -m benchmarks.face_models` before changing these.
+# Switching the model changes the embedding space, so stored embeddings and the
+# face index are no longer comparable and have to be regenerated.
+FACE_MODEL_NAME = os.getenv("FACE_MODEL_NAME", "Facenet512")
+FACE_DETECTOR_BACKEND = os.getenv("FACE_DETECTOR_BACKEND", "opencv")
 
-def verify_faces(img1_path: str, img2_path: str) -> bool:
+# DeepFace's cosine distance thresholds per recognition model
+COSINE_THRESHOLDS = {
+    "VGG-Face": 0.68,
+    "Facenet": 0.40,
+    "Facenet512": 0.30,
+    "ArcFace": 0.68,
+    "Dlib": 0.07,
+    "SFace": 0.593,
+    "OpenFace": 0.10,
+    "DeepFace": 0.23,
+    "DeepID": 0.015,
+    "GhostFaceNet": 0.65,
+}
+# Cosine distance at or below which two faces match
+FACE_MATCH_THRESHOLD = float(os.getenv("FACE_MATCH_THRESHOLD", str(COSINE_THRESHOLDS.get(FACE_MODEL_NAME, 0.40))))
+
+# Set once warm_up() has loaded and exercised the face models
+face_models_ready = threading.Event()
+warmup_status = {"state": "pending", "error": None}
+_first_request_recorded = False
+# Timings collected while verify_live_photo runs, usually in a process pool worker
+# whose metrics nobody scrapes; they are returned to the caller to record instead
+_collected = threading.local()
+
+
+def warm_up(started_at: float | None = None):
+    """
+    Loads the recognition model and detector and runs one inference on a blank
+    image so the first live-photo upload doesn't pay for model loading.
+    `started_at` (perf_counter at process start) is used to record the cold start.
+    Safe to call more than once; returns the warm-up state.
+    """
+    if warmup_status["state"] == "ready":
+        return warmup_status["state"]
+    warmup_status["state"] = "warming"
+    start = time.perf_counter()
+    try:
+        DeepFace.build_model(FACE_MODEL_NAME)
+        blank = np.zeros((224, 224, 3), dtype=np.uint8)
+        DeepFace.represent(blank, model_name=FACE_MODEL_NAME, detector_backend="skip", enforce_detection=False)
+        DeepFace.extract_faces(blank, detector_backend=FACE_DETECTOR_BACKEND, enforce_detection=False)
+        elapsed = time.perf_counter() - start
+        metrics.gauge("face_model_warmup_seconds", elapsed)
+        if started_at is not None:
+            metrics.gauge("app_cold_start_seconds", time.perf_counter() - started_at)
+        warmup_status["state"] = "ready"
+        print(f"Face models warmed up in {elapsed:.1f}s")
+    except Exception as e:
+        warmup_status["state"] = "failed"
+        warmup_status["error"] = str(e)
+        print(f"Face model warm-up failed: {e}")
+    finally:
+        # A failed warm-up shouldn't keep the instance out of rotation forever; requests will load lazily
+        face_models_ready.set()
+    return warmup_status["state"]
+
+
+def init_worker():
+    """Process pool initializer: each worker loads the face models once when it starts."""
+    warm_up()
+
+
+def record_timings(timings: List[Tuple[str, float]]):
+    """Records the `timings` returned by verify_live_photo in the process that serves /metrics."""
+    global _first_request_recorded
+    for name, elapsed in timings:
+        metrics.observe(name, elapsed)
+        if name == "face_verify_seconds" and not _first_request_recorded:
+            _first_request_recorded = True
+            metrics.gauge("face_first_verify_seconds", elapsed, warmed=warmup_status["state"] == "ready")
+
+
+def _record_latency(name: str, elapsed: float):
+    timings = getattr(_collected, "timings", None)
+    if timings is not None:
+        timings.append((name, elapsed))
+    else:
+        record_timings([(name, elapsed)])
+
+
+def decode_image(image_bytes: bytes) -> np.ndarray | None:
+    """Decodes uploaded image bytes into a BGR array, the layout DeepFace expects."""
+    import cv2
+    
+    return cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def verify_faces(img1: np.ndarray, img2: np.ndarray) -> bool:
+    start = time.perf_counter()
     try:
         # DeepFace.verify returns a dictionary with 'verified' key
         print("Calling DeepFace.verify...")
         # Using Facenet512 with Cosine metric for better accuracy
         result = DeepFace.verify(
-            img1_path, 
-            img2_path, 
-            model_name="Facenet512", 
+            img1, 
+            img2, 
+            model_name=FACE_MODEL_NAME, 
+            detector_backend=FACE_DETECTOR_BACKEND,
             distance_metric="cosine",
             enforce_detection=False
         )
@@ -19,24 +120,26 @@ def verify_faces(img1_path: str, img2_path: str) -> bool:
     except Exception as e:
         print(f"Error in Face Verification: {e}")
         return False
+    finally:
+        _record_latency("face_verify_seconds", time.perf_counter() - start)
 
-def extract_face_from_image(img_path: str, output_path: str) -> bool:
+def extract_face_from_image(image: np.ndarray) -> np.ndarray | None:
+    """Returns the first detected face as a uint8 BGR array, or None."""
+    start = time.perf_counter()
     try:
-        print(f"Extracting face from {img_path}...")
+        print("Extracting face from image...")
         # extract_faces returns a list of dicts
-        face_objs = DeepFace.extract_faces(img_path = img_path, detector_backend = 'opencv', enforce_detection = False)
+        face_objs = DeepFace.extract_faces(img_path = image, detector_backend = FACE_DETECTOR_BACKEND, enforce_detection = False)
         
         if not face_objs:
             print("No face detected.")
-            return False
+            return None
             
         # Take the first face
         face_img = face_objs[0]["face"]
         
         # face_img is a numpy array (float32, 0-1 or 0-255). DeepFace returns 0-1 usually.
-        # We need to save it.
         import cv2
-        import numpy as np
         
         # Convert to 0-255 uint8
         if face_img.max() <= 1.0:
@@ -44,12 +147,84 @@ def extract_face_from_image(img_path: str, output_path: str) -> bool:
         else:
             face_img = face_img.astype(np.uint8)
             
-        # Convert RGB to BGR for OpenCV
+        # Convert RGB to BGR so the array matches decode_image()
         face_img = cv2.cvtColor(face_img, cv2.COLOR_RGB2BGR)
-        
-        cv2.imwrite(output_path, face_img)
-        print(f"Face extracted to {output_path}")
-        return True
+        print(f"Face extracted with shape {face_img.shape}")
+        return face_img
     except Exception as e:
         print(f"Error in Face Extraction: {e}")
-        return False
+        return None
+    finally:
+        _record_latency("face_extract_seconds", time.perf_counter() - start)
+
+
+def face_embedding(image: np.ndarray, detector_backend: str = FACE_DETECTOR_BACKEND) -> np.ndarray | None:
+    """L2-normalised float32 embedding of the first face in the image, or None."""
+    start = time.perf_counter()
+    try:
+        representations = DeepFace.represent(image, model_name=FACE_MODEL_NAME, detector_backend=detector_backend,
+                                             enforce_detection=False)
+        if not representations:
+            return None
+        embedding = np.asarray(representations[0]["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else None
+    except Exception as e:
+        print(f"Error in Face Embedding: {e}")
+        return None
+    finally:
+        _record_latency("face_embed_seconds", time.perf_counter() - start)
+
+
+def cosine_distance(embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+    """Both embeddings must be L2-normalised, as returned by face_embedding()."""
+    return 1.0 - float(np.dot(embedding1, embedding2))
+
+
+def verify_live_photo(live_bytes: bytes, adhar_bytes: bytes, adhar_embedding: bytes | None = None) -> Dict[str, Any]:
+    """
+    Full live-photo check from raw upload bytes, meant to run in the process pool
+    so only bytes and a small result dict cross the process boundary.
+    Pass back the returned `adhar_embedding` on retries to skip the Adhar face
+    extraction. Embeddings are returned as raw float32 bytes. The result's
+    `timings` have to be passed to record_timings() by the caller.
+    """
+    _collected.timings = []
+    try:
+        result = _verify_live_photo(live_bytes, adhar_bytes, adhar_embedding)
+        result["timings"] = _collected.timings
+        return result
+    finally:
+        _collected.timings = None
+
+
+def _verify_live_photo(live_bytes: bytes, adhar_bytes: bytes, adhar_embedding: bytes | None) -> Dict[str, Any]:
+    live_image = decode_image(live_bytes)
+    if live_image is None:
+        return {"status": "invalid_live_photo", "verified": False}
+
+    if adhar_embedding is None:
+        adhar_image = decode_image(adhar_bytes)
+        adhar_face = extract_face_from_image(adhar_image) if adhar_image is not None else None
+        # The extracted face is already cropped, so detection is skipped
+        adhar_vector = face_embedding(adhar_face, detector_backend="skip") if adhar_face is not None else None
+        if adhar_vector is None:
+            return {"status": "no_adhar_face", "verified": False}
+        adhar_embedding = adhar_vector.tobytes()
+    else:
+        adhar_vector = np.frombuffer(adhar_embedding, dtype=np.float32)
+
+    start = time.perf_counter()
+    live_vector = face_embedding(live_image)
+    if live_vector is None:
+        return {"status": "ok", "verified": False, "adhar_embedding": adhar_embedding, "live_embedding": None}
+    distance = cosine_distance(live_vector, adhar_vector)
+    _record_latency("face_verify_seconds", time.perf_counter() - start)
+    print(f"Face distance: {distance:.3f} (threshold {FACE_MATCH_THRESHOLD})")
+    return {
+        "status": "ok",
+        "verified": distance <= FACE_MATCH_THRESHOLD,
+        "distance": distance,
+        "adhar_embedding": adhar_embedding,
+        "live_embedding": live_vector.tobytes(),
+    }